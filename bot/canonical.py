@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .platforms import platform_for_host
+
+
+class CanonicalUrl(NamedTuple):
+    platform: str
+    content_id: Optional[str]
+    canonical_url: str
+
+    @property
+    def key(self) -> str:
+        """Stable identity for caching, dedup and metrics."""
+        return f"{self.platform}:{self.content_id or self.canonical_url}"
+
+
+# Query parameters that only track the share and never change the content
+TRACKING_PARAMS = frozenset(
+    {
+        "si",
+        "igsh",
+        "igshid",
+        "fbclid",
+        "gclid",
+        "mibextid",
+        "rdid",
+        "feature",
+        "pp",
+        "is_from_webapp",
+        "is_copy_url",
+        "sender_device",
+        "share_app_id",
+        "share_link_id",
+        "share_item_id",
+        "_r",
+        "_t",
+        "xmt",
+    }
+)
+
+_YT_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_DIGITS = re.compile(r"^\d+$")
+
+Parsed = Tuple[Optional[str], Optional[str]]  # (content_id, canonical_url)
+
+
+def _strip_tracking(query: str) -> List[Tuple[str, str]]:
+    return [
+        (k, v)
+        for k, v in parse_qsl(query, keep_blank_values=False)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+
+
+def _segments(path: str) -> List[str]:
+    return [p for p in path.split("/") if p]
+
+
+def _parse_tiktok(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    # /@user/video/ID, /@user/photo/ID, /v/ID.html, /video/ID
+    for i, seg in enumerate(segs[:-1]):
+        if seg in ("video", "photo", "v"):
+            vid = segs[i + 1].split(".", 1)[0]
+            if _DIGITS.match(vid):
+                user = segs[0] if segs[0].startswith("@") else "@"
+                kind = "photo" if seg == "photo" else "video"
+                return vid, f"https://www.tiktok.com/{user}/{kind}/{vid}"
+    # Short links (vt./vm.tiktok.com/CODE) need a redirect to reveal the video
+    # ID, but the code itself is a stable per-share key
+    if host.startswith(("vt.", "vm.")) and len(segs) == 1:
+        return f"short:{segs[0]}", f"https://{host}/{segs[0]}/"
+    return None, None
+
+
+def _parse_douyin(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    modal = query.get("modal_id")
+    if modal and _DIGITS.match(modal):
+        return modal, f"https://www.douyin.com/video/{modal}"
+    for i, seg in enumerate(segs[:-1]):
+        if seg in ("video", "note"):
+            vid = segs[i + 1]
+            if _DIGITS.match(vid):
+                return vid, f"https://www.douyin.com/{seg}/{vid}"
+    if host.startswith("v.") and len(segs) == 1:
+        return f"short:{segs[0]}", f"https://{host}/{segs[0]}/"
+    return None, None
+
+
+def _parse_instagram(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    # /p/CODE, /reel/CODE, /reels/CODE, /tv/CODE, /user/p/CODE, /stories/user/ID
+    if len(segs) >= 3 and segs[0] == "stories" and _DIGITS.match(segs[2]):
+        return f"story:{segs[2]}", f"https://www.instagram.com/stories/{segs[1]}/{segs[2]}/"
+    for i, seg in enumerate(segs[:-1]):
+        if seg in ("p", "reel", "reels", "tv"):
+            code = segs[i + 1]
+            kind = "reel" if seg == "reels" else seg
+            return code, f"https://www.instagram.com/{kind}/{code}/"
+    return None, None
+
+
+def _parse_threads(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    # /@user/post/CODE, /t/CODE
+    if len(segs) >= 3 and segs[1] == "post":
+        return segs[2], f"https://www.threads.net/{segs[0]}/post/{segs[2]}"
+    if len(segs) >= 2 and segs[0] == "t":
+        return segs[1], f"https://www.threads.net/t/{segs[1]}"
+    return None, None
+
+
+def _parse_facebook(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    if host.endswith("fb.watch"):
+        return (f"fbwatch:{segs[0]}", f"https://fb.watch/{segs[0]}/") if segs else (None, None)
+    vid = query.get("v")
+    if vid and _DIGITS.match(vid):
+        return vid, f"https://www.facebook.com/watch/?v={vid}"
+    if len(segs) >= 2 and segs[0] == "reel" and _DIGITS.match(segs[1]):
+        return segs[1], f"https://www.facebook.com/reel/{segs[1]}"
+    # /{page}/videos/ID or /{page}/videos/slug/ID
+    if "videos" in segs:
+        for seg in reversed(segs[segs.index("videos") + 1 :]):
+            if _DIGITS.match(seg):
+                return seg, f"https://www.facebook.com/watch/?v={seg}"
+    fbid = query.get("story_fbid")
+    if fbid and _DIGITS.match(fbid):
+        owner = query.get("id")
+        if owner and _DIGITS.match(owner):
+            return f"story:{fbid}", f"https://www.facebook.com/story.php?story_fbid={fbid}&id={owner}"
+        # Without the owner id the story URL is not resolvable; keep the user's URL
+        return f"story:{fbid}", None
+    # /share/v/CODE, /share/r/CODE: opaque share codes, stable per share
+    if len(segs) >= 3 and segs[0] == "share":
+        return f"share:{segs[1]}:{segs[2]}", f"https://www.facebook.com/share/{segs[1]}/{segs[2]}/"
+    return None, None
+
+
+def _parse_youtube(host: str, segs: List[str], query: Dict[str, str]) -> Parsed:
+    vid: Optional[str] = None
+    if host.endswith("youtu.be"):
+        vid = segs[0] if segs else None
+    elif query.get("v"):
+        vid = query["v"]
+    elif len(segs) >= 2 and segs[0] in ("shorts", "embed", "live", "v"):
+        vid = segs[1]
+    if vid and _YT_ID.match(vid):
+        return vid, f"https://www.youtube.com/watch?v={vid}"
+    return None, None
+
+
+PARSERS: Dict[str, Callable[[str, List[str], Dict[str, str]], Parsed]] = {
+    "tiktok": _parse_tiktok,
+    "douyin": _parse_douyin,
+    "instagram": _parse_instagram,
+    "threads": _parse_threads,
+    "facebook": _parse_facebook,
+    "youtube": _parse_youtube,
+}
+
+
+def canonicalize(url: str) -> Optional[CanonicalUrl]:
+    """Map a supported URL to ``(platform, content_id, canonical_url)``.
+
+    ``content_id`` is the platform's own ID where the URL carries one; share
+    codes (short links, fb.watch) get a prefixed ID such as ``short:CODE``.
+    It is None when nothing in the URL identifies the content, and
+    ``canonical_url`` is then the input with the host lowercased, the
+    fragment dropped and tracking parameters stripped (the same applies
+    when the ID alone cannot rebuild a working URL, e.g. a Facebook story
+    without its owner ``id``).
+    Returns None for unsupported or malformed URLs.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or "").lower()
+    except Exception:
+        return None
+    if parts.scheme not in ("http", "https") or not host:
+        return None
+    platform = platform_for_host(host)
+    if not platform:
+        return None
+
+    params = _strip_tracking(parts.query)
+    content_id, canonical = PARSERS[platform](host, _segments(parts.path), dict(params))
+    if canonical is None:
+        canonical = urlunsplit(("https", host, parts.path or "/", urlencode(params), ""))
+    return CanonicalUrl(platform, content_id, canonical)
+
+
+def content_key(url: str) -> Optional[str]:
+    c = canonicalize(url)
+    return c.key if c else None
+
+
+_URL_IN_TEXT = re.compile(r"(?:https?://|(?<![\w.@/])(?:[a-z0-9-]+\.)+[a-z]{2,}/)\S+", re.IGNORECASE)
+_TRAILING_PUNCT = ".,;:!?)]}>'\"»”’"
+
+
+def extract_supported_urls(text: str, extra: Iterable[str] = ()) -> List[str]:
+    """Find every supported URL in free text, in order of appearance.
+
+    ``extra`` carries URLs Telegram already parsed (``url``/``text_link``
+    entities) and is scanned first. Scheme-less links get ``https://``;
+    duplicates of the same content (by canonical key) are dropped.
+    """
+    seen = set()
+    urls: List[str] = []
+    for raw in (*extra, *(m.group(0) for m in _URL_IN_TEXT.finditer(text or ""))):
+        url = raw.strip().rstrip(_TRAILING_PUNCT)
+        if not url.lower().startswith(("http://", "https://")):
+            url = "https://" + url
+        c = canonicalize(url)
+        if c is None or c.key in seen:
+            continue
+        seen.add(c.key)
+        urls.append(url)
+    return urls
+
+
+def _bench_corpus(n: int) -> List[str]:
+    templates = [
+        "https://www.tiktok.com/@user{i}/video/{id}?is_from_webapp=1&sender_device=pc",
+        "https://vt.tiktok.com/ZS{i}ab/",
+        "https://www.douyin.com/video/{id}",
+        "https://www.douyin.com/discover?modal_id={id}",
+        "https://www.instagram.com/reel/C{i}xYz/?igsh=abc{i}",
+        "https://www.instagram.com/p/B{i}qRs/?utm_source=ig_web_copy_link",
+        "https://www.threads.net/@user{i}/post/C{i}Thr",
+        "https://www.facebook.com/watch/?v={id}&mibextid=abc",
+        "https://www.facebook.com/page{i}/videos/{id}/",
+        "https://fb.watch/a{i}b/",
+        "https://youtu.be/dQw4w9WgXcQ?si=track{i}",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&feature=share&utm_source={i}",
+        "https://m.youtube.com/shorts/abcdefghijk?si={i}",
+        "https://example.com/not/supported/{i}",
+    ]
+    return [templates[i % len(templates)].format(i=i, id=7000000000000000000 + i) for i in range(n)]
+
+
+def _bench(n: int = 200_000) -> None:
+    corpus = _bench_corpus(n)
+    started = time.perf_counter()
+    keys = set()
+    supported = 0
+    for url in corpus:
+        c = canonicalize(url)
+        if c is not None:
+            supported += 1
+            keys.add(c.key)
+    elapsed = time.perf_counter() - started
+    print(f"urls={n} supported={supported} unique_keys={len(keys)} elapsed={elapsed:.3f}s per_url={elapsed / n * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    _bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -1,7 +1,15 @@
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .lanes import DEFAULT_LANES, DEFAULT_SHARED_WORKERS
+from .logs import parse_sample_rates
+from .overload import OverloadSettings, parse_overload, validate_overload
+from .pipelines import PipelineSettings, parse_pipelines
+from .sendqueue import SendLimits
+from .ratelimit import DEFAULT, DEFAULT_TIERS, RateTier, parse_rate_tiers, validate_rate_tiers
 
 try:
     import yaml  # type: ignore
@@ -9,6 +17,10 @@ except Exception:  # pragma: no cover
     yaml = None  # type: ignore
 
 
+class ConfigError(ValueError):
+    pass
+
+
 @dataclass
 class Settings:
     telegram_bot_token: str
@@ -20,6 +32,90 @@ class Settings:
     http_read_timeout: int
     http_total_timeout: int
     endpoints_per_platform: Dict[str, str] = field(default_factory=dict)
+    # Shared HTTP connection pool and startup/periodic warm-up of endpoint hosts
+    http_pool_limit: int = 256
+    http_dns_ttl: int = 300
+    http_keepalive_seconds: int = 60
+    http_warm_connections: int = 2
+    http_warm_interval: int = 45
+    # YouTube adaptive-stream muxing (video-only + audio via ffmpeg pipes)
+    youtube_mux_enabled: bool = False
+    youtube_mux_max_height: int = 1080
+    ffmpeg_path: str = "ffmpeg"
+    mux_memory_limit_bytes: int = 512 * 1024 * 1024
+    mux_cpu_seconds: int = 120
+    # Pre-send recompression for photos Telegram would reject
+    image_recompress_enabled: bool = True
+    image_workers: int = 2
+    photo_max_dimension: int = 2560
+    photo_target_bytes: int = 4 * 1024 * 1024
+    # /batch limits
+    batch_max_urls: int = 100
+    batch_max_file_bytes: int = 256 * 1024
+    # Result cache and inline mode
+    result_cache_ttl: int = 600
+    inline_deadline_seconds: int = 6
+    inline_cache_time: int = 300
+    # Work lanes (config.yml `lanes:`): per-class workers/priority + shared heavy slots
+    lanes: Dict[str, Dict[str, int]] = field(default_factory=lambda: {k: dict(v) for k, v in DEFAULT_LANES.items()})
+    lanes_shared_workers: int = DEFAULT_SHARED_WORKERS
+    # Per-platform downloader pipelines (config.yml `pipelines:`), "default" always present
+    pipelines: Dict[str, PipelineSettings] = field(default_factory=lambda: {"default": PipelineSettings()})
+    # Concurrent update handling: running handlers / updates held in memory
+    update_concurrency: int = 64
+    update_backlog: int = 512
+    # Durable link job queue (SQLite) and shutdown behaviour
+    job_queue_path: str = "data/jobs.sqlite3"
+    job_workers: int = 8
+    job_max_pending: int = 200
+    job_max_attempts: int = 3
+    shutdown_drain_seconds: int = 30
+    drop_pending_updates: bool = False
+    # Logging: format (text/json), optional rotated file, per-event sampling rates
+    log_level: str = "INFO"
+    log_format: str = "text"
+    log_file: str = ""
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backups: int = 5
+    log_sample_rates: Dict[str, float] = field(default_factory=dict)
+    # Outgoing Telegram message rates enforced by the send scheduler
+    send_limits: SendLimits = field(default_factory=SendLimits)
+    # Per-user link rate tiers (config.yml `rate_limits:`); admin/trusted by user id
+    rate_tiers: Dict[str, RateTier] = field(default_factory=lambda: dict(DEFAULT_TIERS))
+    trusted_user_ids: Tuple[int, ...] = ()
+    # Record sanitized downloader API responses here (replay corpus); empty = off
+    record_dir: str = ""
+    # Event loop lag watchdog: stalls above the threshold are logged with their stack
+    loop_watchdog_enabled: bool = False
+    loop_lag_threshold_ms: int = 100
+    # Load shedding thresholds (config.yml `overload:`)
+    overload: OverloadSettings = field(default_factory=OverloadSettings)
+    # Process-wide budget for in-flight media buffers; 0 = half the container limit
+    memory_budget_bytes: int = 0
+    memory_wait_seconds: int = 30
+    # On-disk media byte cache (repeat deliveries skip the CDN)
+    media_cache_enabled: bool = False
+    media_cache_dir: str = "data/media-cache"
+    media_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
+    # Images per carousel page, by platform ("default" for the rest); 0 = all at once
+    carousel_page_size: Dict[str, int] = field(default_factory=lambda: {"default": 0})
+    # Speculative MP3 download for fresh "Download MP3" buttons (spare capacity only)
+    mp3_prefetch_enabled: bool = False
+    mp3_prefetch_ttl: int = 600
+    mp3_prefetch_max_bytes: int = 64 * 1024 * 1024
+    # Telegram user ids allowed to run admin commands (/reload)
+    admin_user_ids: Tuple[int, ...] = ()
+
+
+def endpoint_urls(settings: Settings) -> List[str]:
+    """Every downloader API endpoint the bot may call, primary and fallback."""
+    urls = [settings.downloader_api_base_url, *settings.endpoints_per_platform.values()]
+    for pipeline in settings.pipelines.values():
+        urls.extend(pipeline.fallback_endpoints)
+    audio = os.getenv("DOWNLOADER_API_BASE_URL_AUDIO")
+    if audio:
+        urls.append(audio)
+    return [u for u in urls if u]
 
 
 def getenv_int(name: str, default: int) -> int:
@@ -29,17 +125,46 @@ def getenv_int(name: str, default: int) -> int:
         return default
 
 
-def _load_yaml_config() -> tuple[str, Dict[str, str]]:
+def getenv_bool(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None or val.strip() == "":
+        return default
+    return val.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def getenv_ids(name: str) -> Tuple[int, ...]:
+    ids = []
+    for part in (os.getenv(name) or "").replace(";", ",").split(","):
+        part = part.strip()
+        if part.lstrip("-").isdigit():
+            ids.append(int(part))
+    return tuple(ids)
+
+
+def _load_yaml_config(strict: bool = False) -> tuple[str, Dict[str, str], Dict[str, Any]]:
     """Load endpoints from config.yml if present.
-    Returns (default_base_url, per_platform_map).
+    Returns (default_base_url, per_platform_map, raw_config). With ``strict``
+    an unreadable or invalid file raises ConfigError instead of falling
+    back to env-only settings.
     """
     default_url = os.getenv("DOWNLOADER_API_BASE_URL", "")
     per_platform: Dict[str, str] = {}
+    data: Dict[str, Any] = {}
     cfg_path = Path("config.yml")
+    if strict and cfg_path.exists() and yaml is None:
+        raise ConfigError("PyYAML is not installed")
     if cfg_path.exists() and yaml is not None:
         try:
             with cfg_path.open("r", encoding="utf-8") as f:
                 data = yaml.safe_load(f) or {}
+            if not isinstance(data, dict):
+                if strict:
+                    raise ConfigError("config.yml must be a mapping")
+                data = {}
+            if strict:
+                errors = validate_config(data)
+                if errors:
+                    raise ConfigError("; ".join(errors))
             endpoints = (data.get("endpoints") or {}) if isinstance(data, dict) else {}
             # Support either 'default' or 'default_base_url'
             default_url = endpoints.get("default") or endpoints.get("default_base_url") or default_url
@@ -49,22 +174,243 @@ def _load_yaml_config() -> tuple[str, Dict[str, str]]:
                 for k, v in per.items():
                     if isinstance(k, str) and isinstance(v, str) and v:
                         per_platform[k.lower()] = v
-        except Exception:
+        except ConfigError:
+            raise
+        except Exception as e:
+            if strict:
+                raise ConfigError(f"config.yml: {e}") from e
             # Ignore YAML errors and fallback to env-only
-            pass
-    return default_url, per_platform
+            data = {}
+    return default_url, per_platform, data
+
+
+def _is_http_url(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    parsed = urlparse(value)
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def _check_int(errors: List[str], where: str, value: Any, minimum: int) -> None:
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        errors.append(f"{where} must be an integer >= {minimum}")
+
+
+def validate_config(data: Dict[str, Any]) -> List[str]:
+    """Strict check of config.yml used before a hot reload is applied."""
+    errors: List[str] = []
+    endpoints = data.get("endpoints") or {}
+    if not isinstance(endpoints, dict):
+        errors.append("endpoints must be a mapping")
+        endpoints = {}
+    for key in ("default", "default_base_url"):
+        if key in endpoints and not _is_http_url(endpoints[key]):
+            errors.append(f"endpoints.{key} must be an http(s) URL")
+    per = endpoints.get("per_platform") or {}
+    if not isinstance(per, dict):
+        errors.append("endpoints.per_platform must be a mapping")
+        per = {}
+    for name, url in per.items():
+        if url and not _is_http_url(url):
+            errors.append(f"endpoints.per_platform.{name} must be an http(s) URL")
 
+    lanes = data.get("lanes") or {}
+    if not isinstance(lanes, dict):
+        errors.append("lanes must be a mapping")
+        lanes = {}
+    for name, spec in lanes.items():
+        if name == "shared_workers":
+            _check_int(errors, "lanes.shared_workers", spec, 1)
+        elif not isinstance(spec, dict):
+            errors.append(f"lanes.{name} must be a mapping")
+        else:
+            if "workers" in spec:
+                _check_int(errors, f"lanes.{name}.workers", spec["workers"], 1)
+            if "priority" in spec:
+                _check_int(errors, f"lanes.{name}.priority", spec["priority"], 0)
 
-def load_settings() -> Settings:
-    default_url, per_platform = _load_yaml_config()
+    pipelines = data.get("pipelines") or {}
+    if not isinstance(pipelines, dict):
+        errors.append("pipelines must be a mapping")
+        pipelines = {}
+    for name, spec in pipelines.items():
+        if not isinstance(spec, dict):
+            errors.append(f"pipelines.{name} must be a mapping")
+            continue
+        for key, value in spec.items():
+            where = f"pipelines.{name}.{key}"
+            if key in ("connect_timeout", "read_timeout", "total_timeout", "retries"):
+                _check_int(errors, where, value, 1)
+            elif key == "concurrency":
+                _check_int(errors, where, value, 0)
+            elif key == "resolve_redirects":
+                if not isinstance(value, bool):
+                    errors.append(f"{where} must be true or false")
+            elif key == "fallback_endpoints":
+                urls = [value] if isinstance(value, str) else value
+                if not isinstance(urls, list) or not all(_is_http_url(u) for u in urls):
+                    errors.append(f"{where} must be a list of http(s) URLs")
+            else:
+                errors.append(f"{where} is not a known pipeline setting")
+
+    limits = data.get("limits") or {}
+    if not isinstance(limits, dict):
+        errors.append("limits must be a mapping")
+        limits = {}
+    for key, value in limits.items():
+        if key in ("max_concurrent_per_user", "max_upload_bytes"):
+            _check_int(errors, f"limits.{key}", value, 1)
+        else:
+            errors.append(f"limits.{key} is not a known limit")
+
+    pages = data.get("carousel_page_size") or {}
+    if not isinstance(pages, dict):
+        errors.append("carousel_page_size must be a mapping")
+        pages = {}
+    for name, value in pages.items():
+        _check_int(errors, f"carousel_page_size.{name}", value, 0)
+
+    if data.get("rate_limits") is not None:
+        errors.extend(validate_rate_tiers(data["rate_limits"]))
+    if data.get("overload") is not None:
+        errors.extend(validate_overload(data["overload"]))
+    return errors
+
+
+def _parse_lanes(data: Dict[str, Any]) -> tuple[Dict[str, Dict[str, int]], int]:
+    """Merge the optional `lanes:` section over the default lane specs."""
+    lanes = {k: dict(v) for k, v in DEFAULT_LANES.items()}
+    shared = DEFAULT_SHARED_WORKERS
+    section = data.get("lanes") or {}
+    if not isinstance(section, dict):
+        return lanes, shared
+    for name, spec in section.items():
+        if name == "shared_workers":
+            try:
+                shared = int(spec)
+            except (TypeError, ValueError):
+                pass
+            continue
+        if not isinstance(spec, dict):
+            continue
+        lane = lanes.setdefault(str(name).lower(), {"workers": 1, "priority": 10})
+        for key in ("workers", "priority"):
+            try:
+                lane[key] = int(spec[key])
+            except (KeyError, TypeError, ValueError):
+                pass
+    return lanes, shared
+
+
+def _parse_page_sizes(section: Any, default: int) -> Dict[str, int]:
+    """`carousel_page_size:` platform -> images per page; invalid values are ignored."""
+    sizes = {"default": default}
+    if isinstance(section, dict):
+        for name, value in section.items():
+            if isinstance(name, str) and isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+                sizes[name.lower()] = value
+    return sizes
+
+
+def page_size_for(settings: Settings, platform: str) -> int:
+    """Images sent per carousel page for ``platform``; 0 sends everything at once."""
+    sizes = settings.carousel_page_size
+    return sizes.get(platform, sizes.get("default", 0))
+
+
+def _yaml_limit(data: Dict[str, Any], key: str, default: int) -> int:
+    limits = data.get("limits")
+    value = limits.get(key) if isinstance(limits, dict) else None
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+    return default
+
+
+def load_settings(strict: bool = False) -> Settings:
+    """Build settings from env and config.yml.
+
+    ``strict`` (used for hot reloads) raises ConfigError on an invalid
+    config.yml instead of ignoring it.
+    """
+    default_url, per_platform, data = _load_yaml_config(strict=strict)
+    lanes, lanes_shared_workers = _parse_lanes(data)
+    http_connect_timeout = getenv_int("HTTP_CONNECT_TIMEOUT", 10)
+    http_read_timeout = getenv_int("HTTP_READ_TIMEOUT", 60)
+    http_total_timeout = getenv_int("HTTP_TOTAL_TIMEOUT", 120)
+    pipelines = parse_pipelines(
+        data.get("pipelines"),
+        PipelineSettings(connect_timeout=http_connect_timeout, read_timeout=http_read_timeout, total_timeout=http_total_timeout),
+    )
+    env_tiers = dict(DEFAULT_TIERS)
+    env_tiers[DEFAULT] = RateTier(per_minute=getenv_int("RATE_LIMIT_PER_MINUTE", 10), burst=max(1, getenv_int("RATE_LIMIT_BURST", 5)))
     return Settings(
         telegram_bot_token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
         downloader_api_base_url=default_url,
         downloader_api_key=os.getenv("DOWNLOADER_API_KEY"),
-        max_upload_bytes=getenv_int("MAX_UPLOAD_TO_TELEGRAM_BYTES", 50 * 1024 * 1024),
-        max_concurrent_per_user=getenv_int("MAX_CONCURRENT_PER_USER", 3),
-        http_connect_timeout=getenv_int("HTTP_CONNECT_TIMEOUT", 10),
-        http_read_timeout=getenv_int("HTTP_READ_TIMEOUT", 60),
-        http_total_timeout=getenv_int("HTTP_TOTAL_TIMEOUT", 120),
+        max_upload_bytes=_yaml_limit(data, "max_upload_bytes", getenv_int("MAX_UPLOAD_TO_TELEGRAM_BYTES", 50 * 1024 * 1024)),
+        max_concurrent_per_user=_yaml_limit(data, "max_concurrent_per_user", getenv_int("MAX_CONCURRENT_PER_USER", 3)),
+        http_connect_timeout=http_connect_timeout,
+        http_read_timeout=http_read_timeout,
+        http_total_timeout=http_total_timeout,
         endpoints_per_platform=per_platform,
+        http_pool_limit=max(0, getenv_int("HTTP_POOL_LIMIT", 256)),
+        http_dns_ttl=max(0, getenv_int("HTTP_DNS_TTL", 300)),
+        http_keepalive_seconds=max(1, getenv_int("HTTP_KEEPALIVE_SECONDS", 60)),
+        http_warm_connections=max(0, getenv_int("HTTP_WARM_CONNECTIONS", 2)),
+        http_warm_interval=max(0, getenv_int("HTTP_WARM_INTERVAL", 45)),
+        youtube_mux_enabled=getenv_bool("YOUTUBE_MUX_ENABLED", False),
+        youtube_mux_max_height=getenv_int("YOUTUBE_MUX_MAX_HEIGHT", 1080),
+        ffmpeg_path=os.getenv("FFMPEG_PATH") or "ffmpeg",
+        mux_memory_limit_bytes=getenv_int("MUX_MEMORY_LIMIT_BYTES", 512 * 1024 * 1024),
+        mux_cpu_seconds=getenv_int("MUX_CPU_SECONDS", 120),
+        image_recompress_enabled=getenv_bool("IMAGE_RECOMPRESS_ENABLED", True),
+        image_workers=getenv_int("IMAGE_WORKERS", 2),
+        photo_max_dimension=getenv_int("PHOTO_MAX_DIMENSION", 2560),
+        photo_target_bytes=getenv_int("PHOTO_TARGET_BYTES", 4 * 1024 * 1024),
+        batch_max_urls=getenv_int("BATCH_MAX_URLS", 100),
+        batch_max_file_bytes=getenv_int("BATCH_MAX_FILE_BYTES", 256 * 1024),
+        result_cache_ttl=getenv_int("RESULT_CACHE_TTL", 600),
+        inline_deadline_seconds=getenv_int("INLINE_DEADLINE_SECONDS", 6),
+        inline_cache_time=getenv_int("INLINE_CACHE_TIME", 300),
+        lanes=lanes,
+        lanes_shared_workers=lanes_shared_workers,
+        pipelines=pipelines,
+        update_concurrency=getenv_int("UPDATE_CONCURRENCY", 64),
+        update_backlog=getenv_int("UPDATE_BACKLOG", 512),
+        job_queue_path=os.getenv("JOB_QUEUE_PATH") or "data/jobs.sqlite3",
+        job_workers=getenv_int("JOB_WORKERS", 8),
+        job_max_pending=getenv_int("JOB_MAX_PENDING", 200),
+        job_max_attempts=getenv_int("JOB_MAX_ATTEMPTS", 3),
+        shutdown_drain_seconds=getenv_int("SHUTDOWN_DRAIN_SECONDS", 30),
+        drop_pending_updates=getenv_bool("DROP_PENDING_UPDATES", False),
+        log_level=os.getenv("LOG_LEVEL", "INFO"),
+        log_format="json" if os.getenv("LOG_FORMAT", "").strip().lower() == "json" else "text",
+        log_file=os.getenv("LOG_FILE", ""),
+        log_max_bytes=max(0, getenv_int("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        log_backups=max(0, getenv_int("LOG_BACKUPS", 5)),
+        log_sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+        send_limits=SendLimits(
+            global_per_second=max(1, getenv_int("TELEGRAM_GLOBAL_PER_SECOND", 30)),
+            chat_per_second=max(1, getenv_int("TELEGRAM_CHAT_PER_SECOND", 1)),
+            chat_burst=max(1, getenv_int("TELEGRAM_CHAT_BURST", 5)),
+            group_per_minute=max(1, getenv_int("TELEGRAM_GROUP_PER_MINUTE", 20)),
+            group_burst=max(1, getenv_int("TELEGRAM_GROUP_BURST", 5)),
+            max_retries=max(0, getenv_int("TELEGRAM_SEND_RETRIES", 3)),
+        ),
+        rate_tiers=parse_rate_tiers(data.get("rate_limits"), env_tiers),
+        trusted_user_ids=getenv_ids("TRUSTED_USER_IDS"),
+        record_dir=os.getenv("DOWNLOADER_RECORD_DIR", ""),
+        loop_watchdog_enabled=getenv_bool("LOOP_WATCHDOG_ENABLED", False),
+        loop_lag_threshold_ms=getenv_int("LOOP_LAG_THRESHOLD_MS", 100),
+        overload=parse_overload(data.get("overload"), OverloadSettings(enabled=getenv_bool("OVERLOAD_ENABLED", True))),
+        memory_budget_bytes=getenv_int("MEMORY_BUDGET_BYTES", 0),
+        memory_wait_seconds=getenv_int("MEMORY_WAIT_SECONDS", 30),
+        media_cache_enabled=getenv_bool("MEDIA_CACHE_ENABLED", False),
+        media_cache_dir=os.getenv("MEDIA_CACHE_DIR") or "data/media-cache",
+        media_cache_max_bytes=getenv_int("MEDIA_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024),
+        carousel_page_size=_parse_page_sizes(data.get("carousel_page_size"), max(0, getenv_int("CAROUSEL_PAGE_SIZE", 0))),
+        mp3_prefetch_enabled=getenv_bool("MP3_PREFETCH_ENABLED", False),
+        mp3_prefetch_ttl=max(1, getenv_int("MP3_PREFETCH_TTL", 600)),
+        mp3_prefetch_max_bytes=max(0, getenv_int("MP3_PREFETCH_MAX_BYTES", 64 * 1024 * 1024)),
+        admin_user_ids=getenv_ids("ADMIN_USER_IDS"),
     )
@@ -1,9 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from typing import Optional
 
 from .config import Settings
-from .state import CallbackStore, UserSemaphores
+from .http_pool import HttpPool
+from .lanes import WorkLanes
+from .link_queue import LinkJobQueue
+from .media_cache import MediaCache
+from .memory import MemoryBudget, resolve_budget
+from .overload import OverloadMonitor
+from .prefetch import AudioPrefetcher
+from .ratelimit import UserRateLimiter
+from .recorder import ResponseRecorder
+from .state import CallbackStore, CarouselStore, FileIdCache, ReactionCache, ResultCache, UserSemaphores
+from .sendqueue import SendScheduler
+from .updates import ChatOrderedUpdateProcessor
+from .upload_strategy import UploadStrategy
+from .watchdog import LoopWatchdog
 
 
 @dataclass
@@ -12,3 +26,47 @@ class BotContext:
     callbacks: CallbackStore
     semaphores: UserSemaphores
     started_at: float
+    results: ResultCache = field(default_factory=ResultCache)
+    file_ids: FileIdCache = field(default_factory=FileIdCache)
+    reactions: ReactionCache = field(default_factory=ReactionCache)
+    carousels: CarouselStore = field(default_factory=CarouselStore)
+    lanes: WorkLanes = field(default_factory=WorkLanes)
+    memory: MemoryBudget = field(default_factory=MemoryBudget)
+    overload: OverloadMonitor = field(default_factory=OverloadMonitor)
+    uploads: UploadStrategy = field(default_factory=UploadStrategy)
+    rate_limits: UserRateLimiter = field(default_factory=UserRateLimiter)
+    http: HttpPool = field(default_factory=HttpPool)
+    # Durable link job queue; None processes links inline
+    jobs: Optional[LinkJobQueue] = None
+    # Set by build_app; exposes update wait/run metrics
+    updates: Optional[ChatOrderedUpdateProcessor] = None
+    # Set by build_app; paces outgoing messages under Telegram's flood limits
+    sender: Optional[SendScheduler] = None
+    # Saves downloader API responses when DOWNLOADER_RECORD_DIR is set
+    recorder: Optional[ResponseRecorder] = None
+    # Event loop lag watchdog; None when LOOP_WATCHDOG_ENABLED is off
+    watchdog: Optional[LoopWatchdog] = None
+    # On-disk media byte cache; None when MEDIA_CACHE_ENABLED is off
+    media_cache: Optional[MediaCache] = None
+    # Speculative MP3 downloads; None when MP3_PREFETCH_ENABLED is off
+    prefetch: Optional[AudioPrefetcher] = None
+
+    def snapshot(self) -> "BotContext":
+        """Copy pinned to the current settings; caches, lanes and queues stay shared.
+
+        Jobs take a snapshot when they start so a hot reload only affects
+        work that starts after it.
+        """
+        return replace(self)
+
+    def swap_settings(self, new: Settings) -> None:
+        """Install reloaded settings and resize the live limits to match."""
+        self.settings = new
+        self.semaphores.resize(new.max_concurrent_per_user)
+        self.lanes.reconfigure(new.lanes, new.lanes_shared_workers)
+        self.memory.resize(resolve_budget(new.memory_budget_bytes))
+        self.memory.wait_seconds = new.memory_wait_seconds
+        self.overload.settings = new.overload
+        if self.jobs is not None:
+            self.jobs.per_user_limit = max(1, new.max_concurrent_per_user)
+            self.jobs.max_pending = new.job_max_pending
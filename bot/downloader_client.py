@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from urllib.parse import urlencode
 
 import aiohttp
@@ -103,6 +103,14 @@ class DownloaderClient:
                     raise TooLargeError(len(buf), max_bytes)
             return bytes(buf)
 
+    async def iter_chunks(self, session: aiohttp.ClientSession, url: str, chunk_size: int = 1024 * 64) -> AsyncIterator[bytes]:
+        async with session.get(url, timeout=self._timeout) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise DownloaderError(f"Download status {resp.status}: {text[:200]}")
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                yield chunk
+
     async def resolve_redirects(self, session: aiohttp.ClientSession, url: str) -> str:
         try:
             async with session.get(url, timeout=self._timeout, allow_redirects=True) as resp:
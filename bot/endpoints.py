@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+
+from .context import BotContext
+from .downloader_client import DownloaderClient
+
+
+def get_base_url_for(ctx: BotContext, platform_name: str) -> str:
+    # Prefer YAML-configured per-platform endpoint if present
+    plat = (platform_name or "").lower()
+    if ctx.settings.endpoints_per_platform.get(plat):
+        return ctx.settings.endpoints_per_platform[plat]
+    return ctx.settings.downloader_api_base_url
+
+
+def get_param_names(platform_name: str) -> tuple[str, str]:
+    up = platform_name.upper()
+    url_param = os.getenv(f"DOWNLOADER_URL_PARAM_NAME_{up}") or os.getenv("DOWNLOADER_URL_PARAM_NAME") or "url"
+    key_param = os.getenv(f"DOWNLOADER_APIKEY_PARAM_NAME_{up}") or os.getenv("DOWNLOADER_APIKEY_PARAM_NAME") or "apikey"
+    return url_param, key_param
+
+
+def build_api(ctx: BotContext, platform_name: str) -> DownloaderClient:
+    url_param, key_param = get_param_names(platform_name)
+    return DownloaderClient(
+        base_url=get_base_url_for(ctx, platform_name),
+        api_key=ctx.settings.downloader_api_key,
+        connect_timeout=ctx.settings.http_connect_timeout,
+        read_timeout=ctx.settings.http_read_timeout,
+        total_timeout=ctx.settings.http_total_timeout,
+        url_param_name=url_param,
+        apikey_param_name=key_param,
+    )
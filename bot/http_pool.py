@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+def origin_of(url: str) -> Optional[str]:
+    """``scheme://host[:port]`` of ``url``, or None if it has no host."""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+@dataclass
+class WarmResult:
+    origin: str
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    opened: int = 0
+    reused: int = 0
+    error: Optional[str] = None
+
+    def describe(self) -> str:
+        if self.error and not (self.opened or self.reused):
+            return f"{self.origin} gagal ({self.error})"
+        dns = f"{self.dns_ms:.0f}ms" if self.dns_ms is not None else "cache"
+        connect = f"{self.connect_ms:.0f}ms" if self.connect_ms is not None else "-"
+        return f"{self.origin} dns={dns} connect={connect} koneksi baru={self.opened} dipakai ulang={self.reused}"
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Times DNS and connection setup of warm-up requests (those with a WarmResult ctx)."""
+    trace = aiohttp.TraceConfig()
+
+    def _result(ctx: SimpleNamespace) -> Optional[WarmResult]:
+        result = getattr(ctx, "trace_request_ctx", None)
+        return result if isinstance(result, WarmResult) else None
+
+    async def dns_start(session, ctx, params) -> None:
+        ctx.dns_started = time.monotonic()
+
+    async def dns_end(session, ctx, params) -> None:
+        result = _result(ctx)
+        if result is not None and hasattr(ctx, "dns_started"):
+            elapsed = (time.monotonic() - ctx.dns_started) * 1000
+            result.dns_ms = max(result.dns_ms or 0.0, elapsed)
+
+    async def conn_start(session, ctx, params) -> None:
+        ctx.conn_started = time.monotonic()
+
+    async def conn_end(session, ctx, params) -> None:
+        result = _result(ctx)
+        if result is not None and hasattr(ctx, "conn_started"):
+            result.opened += 1
+            elapsed = (time.monotonic() - ctx.conn_started) * 1000
+            result.connect_ms = max(result.connect_ms or 0.0, elapsed)
+
+    async def conn_reused(session, ctx, params) -> None:
+        result = _result(ctx)
+        if result is not None:
+            result.reused += 1
+
+    trace.on_dns_resolvehost_start.append(dns_start)
+    trace.on_dns_resolvehost_end.append(dns_end)
+    trace.on_connection_create_start.append(conn_start)
+    trace.on_connection_create_end.append(conn_end)
+    trace.on_connection_reuseconn.append(conn_reused)
+    return trace
+
+
+class HttpPool:
+    """One shared aiohttp session for the downloader API and media CDNs.
+
+    The connector keeps idle connections for ``keepalive`` seconds and caches
+    DNS answers for ``dns_ttl`` seconds, so consecutive requests to the same
+    host skip the lookup and the TLS handshake. ``warm`` opens
+    ``connections`` keep-alive connections to each configured endpoint with
+    concurrent HEAD requests; ``start_refresh`` repeats that every
+    ``interval`` seconds so the pool does not go cold during quiet hours.
+
+    Until ``open`` is called (offline tools, replay), ``client`` hands out a
+    short-lived session instead.
+    """
+
+    def __init__(self, *, limit: int = 256, dns_ttl: int = 300, keepalive: float = 60.0) -> None:
+        self.limit = limit
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.warmups = 0
+        self.last_warm: List[WarmResult] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._refresh: Optional[asyncio.Task] = None
+
+    def open(self) -> None:
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=self.dns_ttl, keepalive_timeout=self.keepalive)
+        self._session = aiohttp.ClientSession(connector=connector, trace_configs=[_trace_config()])
+
+    async def close(self) -> None:
+        if self._refresh is not None:
+            self._refresh.cancel()
+            await asyncio.gather(self._refresh, return_exceptions=True)
+            self._refresh = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """The shared session (left open on exit), or a temporary one before ``open``."""
+        if self._session is not None and not self._session.closed:
+            yield self._session
+            return
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+    async def _warm_origin(self, origin: str, connections: int, timeout: float) -> WarmResult:
+        assert self._session is not None
+        result = WarmResult(origin)
+
+        async def _one() -> None:
+            try:
+                # Any answer will do: the point is a pooled, handshaken connection
+                async with self._session.head(
+                    origin + "/",
+                    allow_redirects=False,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    trace_request_ctx=result,
+                ) as resp:
+                    await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result.error = e.__class__.__name__
+
+        await asyncio.gather(*(_one() for _ in range(max(1, connections))))
+        return result
+
+    async def warm(self, urls: Iterable[str], connections: int = 2, timeout: float = 10.0) -> List[WarmResult]:
+        """Resolve and connect to the origin of every URL in ``urls``, concurrently."""
+        if self._session is None:
+            return []
+        origins = sorted({o for o in (origin_of(u) for u in urls) if o})
+        results = list(await asyncio.gather(*(self._warm_origin(o, connections, timeout) for o in origins)))
+        self.warmups += 1
+        self.last_warm = results
+        return results
+
+    def start_refresh(self, urls: Callable[[], Iterable[str]], *, connections: Callable[[], int], interval: Callable[[], float]) -> None:
+        """Re-warm ``urls()`` every ``interval()`` seconds.
+
+        All three are re-read each round to follow reloads; a round with no
+        connections or no interval is skipped.
+        """
+        if self._refresh is not None:
+            return
+
+        async def _loop() -> None:
+            while True:
+                wait, n = interval(), connections()
+                if wait <= 0 or n <= 0:
+                    await asyncio.sleep(60)
+                    continue
+                await asyncio.sleep(wait)
+                try:
+                    for r in await self.warm(urls(), connections()):
+                        if r.error and not (r.opened or r.reused):
+                            logging.getLogger("bot").warning("http_warm_failed origin=%s error=%s", r.origin, r.error)
+                except Exception:
+                    logging.getLogger("bot").exception("http_warm_error")
+
+        self._refresh = asyncio.create_task(_loop())
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "open": self._session is not None,
+            "warmups": self.warmups,
+            "last_warm": [r.describe() for r in self.last_warm],
+        }
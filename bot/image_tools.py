@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image  # type: ignore
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore
+
+# Telegram photo constraints: URL-fetched photos up to 5 MB, uploads up to
+# 10 MB, width + height at most 10000 px.
+TELEGRAM_PHOTO_URL_MAX_BYTES = 5 * 1024 * 1024
+TELEGRAM_PHOTO_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+TELEGRAM_PHOTO_MAX_SIDES_SUM = 10000
+# Largest source image downloaded for recompression; bigger ones stay URLs.
+# Also the memory reserved for a photo whose size is unknown.
+IMAGE_SOURCE_MAX_BYTES = 2 * TELEGRAM_PHOTO_UPLOAD_MAX_BYTES
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 2
+
+
+def recompression_available() -> bool:
+    return Image is not None
+
+
+def configure_pool(workers: int) -> None:
+    global _pool_workers
+    _pool_workers = max(1, workers)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Forking a process that runs threads (the event loop's executors,
+        # the log writer) can copy held locks into the child; start clean
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=context)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def recompress_image(data: bytes, max_dimension: int, target_bytes: int) -> bytes:
+    """Decode, downscale and re-encode an image as baseline JPEG.
+
+    Runs inside the process pool. EXIF/ICC metadata is dropped because the
+    JPEG is written without passing it through. Quality is lowered first and
+    the resolution second until the output fits ``target_bytes``.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    with Image.open(io.BytesIO(data)) as src:
+        src.seek(0)  # first frame of animated WebP/GIF
+        img = src.convert("RGBA") if src.mode in ("RGBA", "LA", "P") else src.convert("RGB")
+    if img.mode == "RGBA":
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+
+    w, h = img.size
+    scale = min(1.0, max_dimension / max(w, h), TELEGRAM_PHOTO_MAX_SIDES_SUM / (w + h))
+    out = b""
+    for _ in range(4):
+        if scale < 1.0:
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            frame = img.resize(size, Image.LANCZOS)
+        else:
+            frame = img
+        for quality in (90, 82, 74, 65, 55):
+            buf = io.BytesIO()
+            frame.save(buf, format="JPEG", quality=quality, optimize=True, progressive=False)
+            out = buf.getvalue()
+            if len(out) <= target_bytes:
+                return out
+        scale *= 0.75
+    return out
+
+
+async def recompress_image_async(data: bytes, *, max_dimension: int, target_bytes: int) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), recompress_image, data, max_dimension, target_bytes)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# Work classes, cheapest first
+INTERACTIVE = "interactive"
+METADATA = "metadata"
+TRANSFER = "transfer"
+TRANSCODE = "transcode"
+# Speculative work (MP3 prefetch): only runs on spare capacity
+PREFETCH = "prefetch"
+
+DEFAULT_LANES: Dict[str, Dict[str, int]] = {
+    INTERACTIVE: {"workers": 8, "priority": 0},
+    METADATA: {"workers": 8, "priority": 1},
+    TRANSFER: {"workers": 4, "priority": 2},
+    TRANSCODE: {"workers": 2, "priority": 3},
+    PREFETCH: {"workers": 2, "priority": 4},
+}
+DEFAULT_SHARED_WORKERS = 12
+
+
+@dataclass
+class Lane:
+    name: str
+    workers: int
+    priority: int
+    # Lanes outside the shared pool (interactive) only answer to their own cap
+    shared: bool = True
+    running: int = 0
+    waiting: int = 0
+    completed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        avg = self.total_wait / self.completed if self.completed else 0.0
+        return {
+            "workers": self.workers,
+            "priority": self.priority,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "avg_wait": avg,
+            "max_wait": self.max_wait,
+        }
+
+
+class WorkLanes:
+    """Bounded worker pools per work class with priority hand-off.
+
+    Every lane has its own worker cap. Heavy lanes additionally share
+    ``shared_workers`` slots; when a slot frees up it goes to the waiting
+    job from the lane with the best (lowest) priority. The interactive lane
+    never touches the shared pool, so button clicks and commands cannot
+    queue behind uploads or transcodes.
+    """
+
+    def __init__(self, lanes: Optional[Dict[str, Dict[str, int]]] = None, shared_workers: int = DEFAULT_SHARED_WORKERS) -> None:
+        self.shared_workers = max(1, shared_workers)
+        self._shared_running = 0
+        self._lanes: Dict[str, Lane] = {}
+        for name, spec in (lanes or DEFAULT_LANES).items():
+            self._lanes[name] = Lane(
+                name=name,
+                workers=max(1, int(spec.get("workers", 1))),
+                priority=int(spec.get("priority", 10)),
+                shared=name != INTERACTIVE,
+            )
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def reconfigure(self, lanes: Dict[str, Dict[str, int]], shared_workers: int) -> None:
+        """Apply new caps/priorities in place; running work keeps its slot."""
+        self.shared_workers = max(1, shared_workers)
+        for name, spec in lanes.items():
+            lane = self.lane(name)
+            lane.workers = max(1, int(spec.get("workers", lane.workers)))
+            lane.priority = int(spec.get("priority", lane.priority))
+        # Queued entries carry their old priority; rebuild the heap with the new ones
+        self._waiters = [(self._lanes[n].priority, seq, n, fut) for _, seq, n, fut in self._waiters]
+        heapq.heapify(self._waiters)
+        self._dispatch()
+
+    def lane(self, name: str) -> Lane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = self._lanes[name] = Lane(name=name, workers=1, priority=10)
+        return lane
+
+    def _can_start(self, lane: Lane) -> bool:
+        if lane.running >= lane.workers:
+            return False
+        return not lane.shared or self._shared_running < self.shared_workers
+
+    def _start(self, lane: Lane) -> None:
+        lane.running += 1
+        if lane.shared:
+            self._shared_running += 1
+
+    def _release(self, lane: Lane) -> None:
+        lane.running -= 1
+        lane.completed += 1
+        if lane.shared:
+            self._shared_running -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        blocked = []
+        while self._waiters:
+            item = heapq.heappop(self._waiters)
+            fut = item[3]
+            if fut.done():
+                continue
+            lane = self._lanes[item[2]]
+            if self._can_start(lane):
+                self._start(lane)
+                fut.set_result(None)
+            else:
+                blocked.append(item)
+        for item in blocked:
+            heapq.heappush(self._waiters, item)
+
+    def has_spare(self, name: str) -> bool:
+        """True if ``name`` could start now without anything else waiting for a slot."""
+        return not any(lane.waiting for lane in self._lanes.values()) and self._can_start(self.lane(name))
+
+    @asynccontextmanager
+    async def run(self, name: str) -> AsyncIterator[None]:
+        lane = self.lane(name)
+        queued_at = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane.priority, next(self._seq), name, fut))
+        self._dispatch()
+        if not fut.done():
+            lane.waiting += 1
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # Slot was granted just before cancellation; hand it back
+                    self._release(lane)
+                raise
+            finally:
+                lane.waiting -= 1
+        wait = time.monotonic() - queued_at
+        lane.total_wait += wait
+        lane.max_wait = max(lane.max_wait, wait)
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {name: lane.snapshot() for name, lane in self._lanes.items()}
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("bot")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    req_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    chat_type TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    platform TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class LinkJob:
+    req_id: str
+    user_id: int
+    chat_id: int
+    chat_type: str
+    message_id: int
+    url: str
+    platform: Optional[str] = None
+    id: Optional[int] = None
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+    # In-memory only: live objects for jobs accepted in this process
+    message: Any = None
+    status: Any = None
+    future: Optional[asyncio.Future] = None
+
+
+class LinkJobQueue:
+    """SQLite-backed queue of accepted link jobs.
+
+    Intake records a row and returns a future; a fixed set of workers
+    consume jobs with per-user fairness (a user at their concurrency limit
+    does not occupy workers). Rows are deleted once a job finishes, so
+    anything left on startup was interrupted and is resumed. All SQLite
+    calls run on one dedicated thread.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        workers: int = 8,
+        max_pending: int = 200,
+        max_attempts: int = 3,
+        per_user_limit: int = 3,
+    ) -> None:
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.per_user_limit = max(1, per_user_limit)
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobdb")
+        self._pending: Deque[LinkJob] = deque()
+        self._running: Dict[int, LinkJob] = {}
+        self._user_running: Dict[int, int] = {}
+        self._cond: Optional[asyncio.Condition] = None
+        # Slots taken by submits whose database insert is still running
+        self._reserved = 0
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self._runner: Optional[Callable[[LinkJob], Awaitable[bool]]] = None
+        self.completed = 0
+        self.failed = 0
+        self.recovered = 0
+
+    # -- database (runs on the jobdb thread) --------------------------------
+
+    def _db_open(self) -> List[LinkJob]:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        # Jobs that already crashed the bot too often are dropped
+        self._db.execute("DELETE FROM jobs WHERE attempts >= ?", (self.max_attempts,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT id, req_id, user_id, chat_id, chat_type, message_id, url, platform, attempts, created_at FROM jobs ORDER BY id"
+        ).fetchall()
+        return [
+            LinkJob(
+                id=r[0],
+                req_id=r[1],
+                user_id=r[2],
+                chat_id=r[3],
+                chat_type=r[4],
+                message_id=r[5],
+                url=r[6],
+                platform=r[7],
+                attempts=r[8],
+                created_at=r[9],
+            )
+            for r in rows
+        ]
+
+    def _db_insert(self, job: LinkJob) -> int:
+        assert self._db is not None
+        cur = self._db.execute(
+            "INSERT INTO jobs (req_id, user_id, chat_id, chat_type, message_id, url, platform, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.req_id, job.user_id, job.chat_id, job.chat_type, job.message_id, job.url, job.platform, job.created_at),
+        )
+        self._db.commit()
+        return int(cur.lastrowid)
+
+    def _db_mark_running(self, job_id: int) -> None:
+        assert self._db is not None
+        self._db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1 WHERE id = ?", (job_id,))
+        self._db.commit()
+
+    def _db_delete(self, job_id: int) -> None:
+        assert self._db is not None
+        self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._db.commit()
+
+    def _db_close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def _db_call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # -- lifecycle ------------------------------------------------------------
+
+    async def start(self, runner: Callable[[LinkJob], Awaitable[bool]]) -> int:
+        """Open the database, requeue interrupted jobs and start the workers.
+
+        Returns the number of recovered jobs.
+        """
+        self._runner = runner
+        self._cond = asyncio.Condition()
+        recovered = await self._db_call(self._db_open)
+        self._pending.extend(recovered)
+        self.recovered = len(recovered)
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._worker(), name=f"link-worker-{i}") for i in range(self.workers)]
+        return self.recovered
+
+    def close_intake(self) -> None:
+        self._accepting = False
+
+    async def drain(self, deadline: float) -> int:
+        """Stop intake, let in-flight and queued jobs finish for up to
+        ``deadline`` seconds, then cancel the rest (they stay in the database
+        and resume on the next start). Returns the number of unfinished jobs.
+        """
+        self.close_intake()
+        assert self._cond is not None
+        async with self._cond:
+            self._cond.notify_all()
+        pending = set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=deadline)
+        unfinished = self.depth()
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._db_call(self._db_close)
+        self._executor.shutdown(wait=False)
+        return unfinished
+
+    # -- intake -----------------------------------------------------------------
+
+    def depth(self) -> int:
+        return len(self._pending) + len(self._running) + self._reserved
+
+    async def submit(self, job: LinkJob) -> asyncio.Future:
+        if not self._accepting:
+            raise QueueFull("intake closed")
+        assert self._cond is not None
+        # Reserve the slot under the lock, then insert without it: concurrent
+        # submits cannot overshoot the cap, and workers never wait on the disk
+        async with self._cond:
+            if self.depth() >= self.max_pending:
+                raise QueueFull(f"queue depth {self.depth()} >= {self.max_pending}")
+            self._reserved += 1
+        try:
+            job.future = asyncio.get_running_loop().create_future()
+            job.id = await self._db_call(self._db_insert, job)
+        except BaseException:
+            # Plain counter on the loop thread: the rollback needs no lock
+            self._reserved -= 1
+            raise
+        async with self._cond:
+            self._reserved -= 1
+            self._pending.append(job)
+            self._cond.notify()
+        return job.future
+
+    # -- workers ------------------------------------------------------------------
+
+    def _take(self) -> Optional[LinkJob]:
+        for job in self._pending:
+            if self._user_running.get(job.user_id, 0) < self.per_user_limit:
+                self._pending.remove(job)
+                return job
+        return None
+
+    async def _worker(self) -> None:
+        assert self._cond is not None
+        while True:
+            async with self._cond:
+                job = self._take()
+                while job is None:
+                    if not self._accepting and not self._pending:
+                        return
+                    await self._cond.wait()
+                    job = self._take()
+                self._user_running[job.user_id] = self._user_running.get(job.user_id, 0) + 1
+                self._running[job.id or 0] = job
+            try:
+                await self._run(job)
+            finally:
+                async with self._cond:
+                    self._running.pop(job.id or 0, None)
+                    left = self._user_running.get(job.user_id, 1) - 1
+                    if left > 0:
+                        self._user_running[job.user_id] = left
+                    else:
+                        self._user_running.pop(job.user_id, None)
+                    self._cond.notify_all()
+
+    async def _run(self, job: LinkJob) -> None:
+        assert self._runner is not None
+        ok = False
+        try:
+            await self._db_call(self._db_mark_running, job.id)
+            ok = await self._runner(job)
+        except asyncio.CancelledError:
+            # Shutdown deadline: leave the row for restart recovery
+            if job.future and not job.future.done():
+                job.future.cancel()
+            raise
+        except Exception:
+            logger.exception("link_job_failed id=%s job=%s url=%s", job.req_id, job.id, job.url)
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        try:
+            await self._db_call(self._db_delete, job.id)
+        except Exception:
+            logger.exception("link_job_delete_failed job=%s", job.id)
+        if job.future and not job.future.done():
+            job.future.set_result(ok)
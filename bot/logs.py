@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s :: %(message)s"
+
+# printf placeholders in a log format string; `%%` is a literal percent
+_PLACEHOLDER = re.compile(r"%(?:%|[-#0 +]*\d*(?:\.\d+)?[sdifrxXeEgGc])")
+_KEY_BEFORE = re.compile(r"(\w+)=$")
+
+# Keys the code base logs under different names, normalized in JSON output
+_FIELD_ALIASES = {"id": "req_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """``"request_start=0.1,url_resolved=0.5"`` -> {event: rate}; bad items are ignored."""
+    rates: Dict[str, float] = {}
+    for item in (value or "").split(","):
+        name, sep, raw = item.strip().partition("=")
+        if not sep or not name:
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(raw)))
+        except ValueError:
+            continue
+    return rates
+
+
+def event_of(record: logging.LogRecord) -> str:
+    """First word of the format string: the event name by this code base's convention."""
+    msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+    return msg.split(" ", 1)[0]
+
+
+def fields_of(record: logging.LogRecord) -> Dict[str, Any]:
+    """``key=%s`` pairs of the format string mapped to their raw arguments.
+
+    Reading the arguments instead of parsing the formatted text keeps
+    numbers as numbers and values with spaces (errors, titles) intact.
+    """
+    if not isinstance(record.msg, str) or not isinstance(record.args, tuple):
+        return {}
+    out: Dict[str, Any] = {}
+    args = iter(record.args)
+    for match in _PLACEHOLDER.finditer(record.msg):
+        if match.group() == "%%":
+            continue
+        try:
+            value = next(args)
+        except StopIteration:
+            break
+        key = _KEY_BEFORE.search(record.msg, 0, match.start())
+        if key is None:
+            continue
+        if not isinstance(value, (str, int, float, bool)) and value is not None:
+            value = str(value)
+        out[_FIELD_ALIASES.get(key.group(1), key.group(1))] = value
+    return out
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, message, then the event's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        doc: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": event_of(record),
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        for key, value in (fields if fields is not None else fields_of(record)).items():
+            doc.setdefault(key, value)
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            doc["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps ``rate`` of the records of each sampled event; warnings and above always pass."""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(event_of(record))
+        return rate is None or random.random() < rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Freezes the message on the caller's thread; tracebacks and JSON happen on the writer.
+
+    ``msg % args`` runs here, so a dict or stats object mutated right after
+    the call is logged as it was. With ``capture_fields`` the JSON fields
+    are taken from the arguments at the same moment. Unlike the stock
+    ``prepare``, exception formatting is left to the listener thread.
+    """
+
+    def __init__(self, records: "queue.SimpleQueue[logging.LogRecord]", capture_fields: bool = False) -> None:
+        super().__init__(records)
+        self.capture_fields = capture_fields
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if self.capture_fields:
+            record.fields = fields_of(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(
+    *,
+    level: str = "INFO",
+    fmt: str = "text",
+    path: str = "",
+    max_bytes: int = 10 * 1024 * 1024,
+    backups: int = 5,
+    sample_rates: Optional[Dict[str, float]] = None,
+) -> None:
+    """Route the root logger through a queue to a background writer thread.
+
+    Callers only build and format the message and put the record on the
+    queue; JSON encoding, tracebacks and the stderr/file writes happen on the
+    listener thread. With ``path``, output also goes to a file rotated at
+    ``max_bytes`` keeping ``backups`` old files. ``sample_rates`` keeps only
+    that fraction of the INFO/DEBUG records of each named event.
+    """
+    global _listener
+    formatter: logging.Formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(records, capture_fields=fmt == "json")
+    sampling = SamplingFilter(sample_rates or {})
+    queue_handler.addFilter(sampling)
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -2,22 +2,45 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import signal
 from urllib.parse import urlparse
 import time
 
 from dotenv import load_dotenv
 
+from handlers.dispatch import run_job
+from processors.registry import upstream_totals
+
 from .app import build_app
-from .config import load_settings
+from .config import ConfigError, endpoint_urls, load_settings
 from .context import BotContext
-from .state import CallbackStore, UserSemaphores
+from .http_pool import HttpPool
+from .image_tools import configure_pool, recompression_available, shutdown_pool
+from .lanes import WorkLanes
+from .link_queue import LinkJobQueue
+from .logs import configure_logging
+from .media_cache import MediaCache
+from .memory import MemoryBudget, resolve_budget
+from .overload import OverloadMonitor
+from .prefetch import AudioPrefetcher
+from .recorder import ResponseRecorder
+from .state import CallbackStore, ResultCache, UserSemaphores
 from .platforms import SUPPORTED_PLATFORMS
+from .reload import reload_config
+from .watchdog import LoopWatchdog
 
 
 load_dotenv()
 settings = load_settings()
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s :: %(message)s")
+configure_logging(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    path=settings.log_file,
+    max_bytes=settings.log_max_bytes,
+    backups=settings.log_backups,
+    sample_rates=settings.log_sample_rates,
+)
 logger = logging.getLogger("bot")
 
 
@@ -32,7 +55,32 @@ async def main_async():
         callbacks=CallbackStore(),
         semaphores=UserSemaphores(settings.max_concurrent_per_user),
         started_at=time.time(),
+        results=ResultCache(ttl=settings.result_cache_ttl),
+        lanes=WorkLanes(settings.lanes, settings.lanes_shared_workers),
+        memory=MemoryBudget(resolve_budget(settings.memory_budget_bytes), settings.memory_wait_seconds),
+        overload=OverloadMonitor(settings.overload),
+        http=HttpPool(limit=settings.http_pool_limit, dns_ttl=settings.http_dns_ttl, keepalive=settings.http_keepalive_seconds),
+        jobs=LinkJobQueue(
+            settings.job_queue_path,
+            workers=settings.job_workers,
+            max_pending=settings.job_max_pending,
+            max_attempts=settings.job_max_attempts,
+            per_user_limit=settings.max_concurrent_per_user,
+        ),
     )
+    if settings.media_cache_enabled:
+        ctx.media_cache = MediaCache(settings.media_cache_dir, settings.media_cache_max_bytes, memory=ctx.memory)
+        await ctx.media_cache.open()
+        logger.info("Media cache: %s (%.0f/%.0f MB)", settings.media_cache_dir, ctx.media_cache.total_bytes / 1048576, settings.media_cache_max_bytes / 1048576)
+    if settings.mp3_prefetch_enabled:
+        ctx.prefetch = AudioPrefetcher(ttl=settings.mp3_prefetch_ttl, max_bytes=settings.mp3_prefetch_max_bytes)
+    if settings.record_dir:
+        ctx.recorder = ResponseRecorder(settings.record_dir, secrets=[settings.downloader_api_key or ""])
+        logger.info("Recording downloader responses to %s", settings.record_dir)
+    logger.info("Memory budget: %.0f MB for media buffers", ctx.memory.limit_bytes / 1048576)
+    configure_pool(settings.image_workers)
+    if settings.image_recompress_enabled and not recompression_available():
+        logger.warning("IMAGE_RECOMPRESS_ENABLED is set but Pillow cannot be imported; photos over the Telegram limit will not be recompressed")
     app = build_app(ctx)
     # Pretty startup summary
     logger.info("================ AIO Downloader Bot ================")
@@ -51,17 +99,80 @@ async def main_async():
         logger.info("Endpoints: %s", ", ".join(eps))
     except Exception:
         logger.exception("failed_log_endpoints")
+    ctx.http.open()
+    if ctx.settings.http_warm_connections:
+        # DNS lookups and TLS handshakes happen now instead of on the first user's request
+        for result in await ctx.http.warm(endpoint_urls(ctx.settings), ctx.settings.http_warm_connections):
+            logger.info("Warm-up: %s", result.describe())
     logger.info("====================================================")
     logger.info("Bot starting... kirim /start ke bot Telegram Anda.")
+    started = time.monotonic()
     await app.initialize()
+    logger.info("Warm-up: api.telegram.org getMe %.0f ms", (time.monotonic() - started) * 1000)
+    # Reads ctx.settings every round, so /reload can change or disable the refresh
+    ctx.http.start_refresh(
+        lambda: endpoint_urls(ctx.settings),
+        connections=lambda: ctx.settings.http_warm_connections,
+        interval=lambda: ctx.settings.http_warm_interval,
+    )
     await app.start()
-    await app.updater.start_polling(drop_pending_updates=True)
+    recovered = await ctx.jobs.start(lambda job: run_job(ctx, job, bot=app.bot))
+    if recovered:
+        logger.info("Resuming %s unfinished link job(s) from %s", recovered, settings.job_queue_path)
+    if settings.loop_watchdog_enabled:
+        ctx.watchdog = LoopWatchdog(threshold=settings.loop_lag_threshold_ms / 1000)
+        ctx.watchdog.start()
+
+    def _load_signals():
+        signals = {
+            "queue": ctx.jobs.depth() / max(1, ctx.settings.job_max_pending),
+            "memory": ctx.memory.pressure(),
+        }
+        if ctx.watchdog is not None:
+            signals["loop_lag"] = ctx.watchdog.recent_lag
+        return signals
+
+    ctx.overload.start(_load_signals, upstream_totals)
+    await app.updater.start_polling(drop_pending_updates=settings.drop_pending_updates)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    def _reload() -> None:
+        try:
+            reload_config(ctx)
+        except ConfigError as e:
+            logger.error("config_reload_rejected error=%s", str(e))
+
+    if hasattr(signal, "SIGHUP"):
+        try:
+            loop.add_signal_handler(signal.SIGHUP, _reload)
+        except (NotImplementedError, RuntimeError):
+            pass
     try:
-        await asyncio.Future()
+        await stop.wait()
     finally:
+        # Stop intake first, then let accepted jobs finish before tearing down
         await app.updater.stop()
+        unfinished = await ctx.jobs.drain(ctx.settings.shutdown_drain_seconds)
+        if unfinished:
+            logger.warning("Shutdown: %s link job(s) left for the next start", unfinished)
+        await ctx.overload.stop()
+        if ctx.watchdog is not None:
+            await ctx.watchdog.stop()
         await app.stop()
         await app.shutdown()
+        if ctx.prefetch is not None:
+            await ctx.prefetch.close(ctx)
+        shutdown_pool()
+        await ctx.http.close()
+        if ctx.media_cache is not None:
+            await ctx.media_cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import aiohttp
+
+from .downloader_client import DownloaderClient, TooLargeError
+from .memory import MemoryBudget
+
+logger = logging.getLogger("bot")
+
+# Query parameters that known CDNs rotate per request (signatures, expiry,
+# edge hints), by host suffix. Dropping them lets a re-resolved link hit the
+# same cache entry; every other parameter stays in the key, because on
+# proxy and download endpoints (``?token=``, ``?l=``) it names the file.
+VOLATILE_PARAMS: Tuple[Tuple[Tuple[str, ...], FrozenSet[str], Tuple[str, ...]], ...] = (
+    (
+        ("fbcdn.net", "cdninstagram.com"),
+        frozenset({"oh", "oe", "efg", "ccb"}),
+        ("_nc_",),
+    ),
+    (
+        ("googlevideo.com",),
+        frozenset(
+            {
+                "expire",
+                "ei",
+                "ip",
+                "ipbits",
+                "sig",
+                "sparams",
+                "lsig",
+                "lsparams",
+                "mh",
+                "mm",
+                "mn",
+                "ms",
+                "mv",
+                "mvi",
+                "pl",
+                "rms",
+                "initcwndbps",
+            }
+        ),
+        (),
+    ),
+    (
+        ("tiktokcdn.com", "tiktokcdn-us.com", "tiktokv.com", "byteoversea.com", "ibytedtos.com"),
+        frozenset({"x-expires", "x-signature", "expire", "signature", "policy"}),
+        (),
+    ),
+    (
+        ("cloudfront.net",),
+        frozenset({"expires", "signature", "key-pair-id", "policy"}),
+        (),
+    ),
+)
+
+
+def _volatile_rules(host: str) -> Tuple[FrozenSet[str], Tuple[str, ...]]:
+    host = host.split(":", 1)[0]
+    for suffixes, names, prefixes in VOLATILE_PARAMS:
+        if any(host == s or host.endswith("." + s) for s in suffixes):
+            return names, prefixes
+    return frozenset(), ()
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        digest TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        last_access REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS urls (
+        url_key TEXT PRIMARY KEY,
+        digest TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS blobs_lru ON blobs (last_access)",
+)
+
+
+def normalize_media_url(url: str) -> str:
+    """Cache key for a media URL: lowercase host, no fragment, no CDN-volatile params."""
+    try:
+        p = urlparse(url)
+    except ValueError:
+        return url
+    names, prefixes = _volatile_rules(p.netloc.lower())
+    query = [
+        (k, v)
+        for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if k.lower() not in names and not k.lower().startswith(prefixes)
+    ]
+    query.sort()
+    return urlunparse((p.scheme.lower(), p.netloc.lower(), p.path, "", urlencode(query), ""))
+
+
+class MediaCache:
+    """Size-capped, content-addressed cache of downloaded media bytes.
+
+    Blobs are stored once per SHA-256 under ``root/blobs`` and looked up by
+    normalized media URL. The SQLite index survives restarts; the least
+    recently used blobs are evicted once ``max_bytes`` is exceeded. Writes
+    go to a temporary file and are renamed into place, so readers never see
+    partial blobs.
+
+    Cached bytes count against ``memory`` like any other media buffer:
+    ``get`` callers reserve the blob's size (``size_of``) before reading it,
+    and ``put`` holds a reservation until the background write is done.
+    """
+
+    def __init__(self, root: str, max_bytes: int, memory: Optional[MemoryBudget] = None) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.memory = memory
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mediacache")
+        self._writes: Set[asyncio.Task] = set()
+
+    # -- index (runs on the mediacache thread) -------------------------------
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    def _db_open(self) -> int:
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for stmt in _SCHEMA:
+            self._db.execute(stmt)
+        self._db.commit()
+        row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return int(row[0])
+
+    def _db_size(self, url_key: str) -> Optional[int]:
+        assert self._db is not None
+        row = self._db.execute(
+            "SELECT blobs.size FROM urls JOIN blobs ON blobs.digest = urls.digest WHERE urls.url_key = ?",
+            (url_key,),
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def _db_lookup(self, url_key: str) -> Optional[Tuple[str, int]]:
+        assert self._db is not None
+        row = self._db.execute(
+            "SELECT blobs.digest, blobs.size FROM urls JOIN blobs ON blobs.digest = urls.digest WHERE urls.url_key = ?",
+            (url_key,),
+        ).fetchone()
+        if not row:
+            return None
+        self._db.execute("UPDATE blobs SET hits = hits + 1, last_access = ? WHERE digest = ?", (time.time(), row[0]))
+        self._db.commit()
+        return row[0], int(row[1])
+
+    def _db_forget(self, digest: str) -> None:
+        assert self._db is not None
+        row = self._db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self._db.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+        self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self._db.commit()
+        if row:
+            self.total_bytes -= int(row[0])
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._blob_path(digest).read_bytes()
+        except FileNotFoundError:
+            self._db_forget(digest)
+            return None
+
+    def _store(self, url_key: str, data: bytes) -> None:
+        assert self._db is not None
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        exists = self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if not exists:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{digest}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._db.execute("INSERT INTO blobs (digest, size, last_access) VALUES (?, ?, ?)", (digest, len(data), now))
+            self.total_bytes += len(data)
+        self._db.execute("INSERT OR REPLACE INTO urls (url_key, digest) VALUES (?, ?)", (url_key, digest))
+        self._db.commit()
+        self._evict()
+
+    def _evict(self) -> None:
+        assert self._db is not None
+        while self.total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT digest FROM blobs ORDER BY last_access LIMIT 1").fetchone()
+            if not row:
+                break
+            try:
+                self._blob_path(row[0]).unlink()
+            except FileNotFoundError:
+                pass
+            self._db_forget(row[0])
+
+    def _db_close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # -- public API --------------------------------------------------------------
+
+    async def open(self) -> None:
+        self.total_bytes = await self._call(self._db_open)
+
+    async def close(self) -> None:
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        await self._call(self._db_close)
+        self._executor.shutdown(wait=False)
+
+    async def size_of(self, url: str) -> Optional[int]:
+        """Size of the cached copy of ``url``, without reading it; None (a miss) when not cached."""
+        size = await self._call(self._db_size, normalize_media_url(url))
+        if size is None:
+            self.misses += 1
+        return size
+
+    async def get(self, url: str, max_bytes: Optional[int] = None) -> Optional[bytes]:
+        """The cached bytes of ``url``, or None on a miss.
+
+        The caller holds a memory reservation for the blob. Raises
+        TooLargeError without reading when it exceeds ``max_bytes``.
+        """
+        found = await self._call(self._db_lookup, normalize_media_url(url))
+        if found is not None and max_bytes is not None and found[1] > max_bytes:
+            raise TooLargeError(found[1], max_bytes)
+        data = await self._call(self._read, found[0]) if found else None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += len(data)
+        return data
+
+    def put(self, url: str, data: bytes) -> None:
+        """Store ``data`` in the background; the caller does not wait for disk.
+
+        The write keeps ``data`` alive after the caller is done with it, so it
+        holds its own reservation; under memory pressure the copy is skipped.
+        """
+        if not data or len(data) > self.max_bytes:
+            return
+        reserved = 0
+        if self.memory is not None:
+            got = self.memory.try_acquire(len(data))
+            if got is None:
+                return
+            reserved = got
+        task = asyncio.create_task(self._call(self._store, normalize_media_url(url), data))
+        self._writes.add(task)
+        task.add_done_callback(lambda t: self._write_done(t, reserved))
+
+    def _write_done(self, task: asyncio.Task, reserved: int) -> None:
+        self._writes.discard(task)
+        if self.memory is not None:
+            self.memory.release(reserved)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("media_cache_write_failed error=%s", task.exception())
+
+    def snapshot(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+async def download_cached(
+    cache: Optional[MediaCache],
+    api: DownloaderClient,
+    session: aiohttp.ClientSession,
+    url: str,
+    max_bytes: int,
+    *,
+    lookup: bool = True,
+) -> bytes:
+    """``api.download_to_bytes`` served from (and filling) the media cache.
+
+    Runs under the caller's memory reservation for ``max_bytes`` or the
+    expected size. ``lookup=False`` skips the cache read when the caller
+    already missed.
+    """
+    if cache is not None and lookup:
+        data = await cache.get(url, max_bytes)
+        if data is not None:
+            return data
+    data = await api.download_to_bytes(session, url, max_bytes)
+    if cache is not None:
+        cache.put(url, data)
+    return data
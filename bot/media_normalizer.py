@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import re
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
 
+from .media_utils import AUDIO, MediaItem, build_partitions, classify_media, mime_has_audio_codec, quality_rank
+
+_RESOLUTION_RE = re.compile(r"(\d{3,4})p")
+
 
 def _infer_ext_from_url(url: str) -> Optional[str]:
     try:
@@ -16,7 +21,22 @@ def _infer_ext_from_url(url: str) -> Optional[str]:
     return None
 
 
-def _normalize_media_item(m: Dict[str, Any], platform: str) -> Dict[str, Any]:
+def _extract_resolution(m: Dict[str, Any], quality: str) -> int:
+    # Common patterns like "mp4 (1080p)" or "webm (720p)"
+    mobj = _RESOLUTION_RE.search(quality.lower())
+    if mobj:
+        return int(mobj.group(1))
+    for key in ("height", "Height"):
+        try:
+            h = int(m.get(key))
+        except (TypeError, ValueError):
+            continue
+        if 100 <= h <= 5000:
+            return h
+    return 0
+
+
+def _normalize_media_item(m: Dict[str, Any], platform: str) -> MediaItem:
     url = m.get("url") or m.get("download_url") or m.get("direct") or m.get("link") or ""
     mime = (m.get("mimeType") or m.get("mime_type") or "").lower()
     ext = (m.get("extension") or m.get("ext") or "").lower()
@@ -63,30 +83,31 @@ def _normalize_media_item(m: Dict[str, Any], platform: str) -> Dict[str, Any]:
     except Exception:
         duration_int = None
 
-    has_audio = False
-    if t == "audio" or m.get("is_audio") is True:
-        has_audio = True
-    else:
+    has_audio = t == AUDIO or m.get("is_audio") is True
+    if not has_audio:
         if m.get("audioQuality") not in (None, "", "null"):
             has_audio = True
         # Codec hints inside mimeType
-        if any(tok in mime for tok in ["mp4a", "vorbis", "opus", "ac-3", "ec-3"]):
+        elif mime_has_audio_codec(mime):
             has_audio = True
 
-    normalized = {
-        "url": url,
-        "type": t or "file",
-        "extension": ext or None,
-        "quality": quality,
-        "data_size": data_size_int,
-        "duration": duration_int,
-        "filename": m.get("filename"),
-        "mimeType": mime or None,
-        # carry through useful platform-specific fields
-        "formatId": m.get("formatId") or m.get("itag"),
-        "has_audio": has_audio,
-    }
-    return normalized
+    quality = str(quality)
+    format_id = m.get("formatId") or m.get("itag")
+    return MediaItem(
+        url=url if isinstance(url, str) else str(url),
+        kind=classify_media(t, mime, ext),
+        type=t or "file",
+        extension=ext or None,
+        quality=quality,
+        quality_rank=quality_rank(quality),
+        resolution=_extract_resolution(m, quality),
+        data_size=data_size_int,
+        duration=duration_int,
+        filename=m.get("filename"),
+        mime_type=mime or None,
+        format_id=str(format_id) if format_id is not None else None,
+        has_audio=has_audio,
+    )
 
 
 def normalize_result(result: Dict[str, Any], platform: str) -> Dict[str, Any]:
@@ -94,12 +115,14 @@ def normalize_result(result: Dict[str, Any], platform: str) -> Dict[str, Any]:
     medias = result.get("medias") or []
     if not isinstance(medias, list):
         medias = []
-    normalized_medias: List[Dict[str, Any]] = []
+    normalized_medias: List[MediaItem] = []
     for m in medias:
         if isinstance(m, dict):
             normalized_medias.append(_normalize_media_item(m, platform))
 
     out = dict(result)
     out["medias"] = normalized_medias
+    # Video/image/audio views over the same items; see media_utils.partitions
+    out["partitions"] = build_partitions(normalized_medias)
     return out
 
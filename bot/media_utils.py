@@ -1,21 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 
 def summarize_result(result: Dict[str, Any]) -> Tuple[int, int, int]:
-    videos = 0
-    images = 0
-    audios = 0
-    for m in (result.get("medias") or []):
-        t = (m.get("type") or "").lower()
-        if t == "video":
-            videos += 1
-        elif t == "image":
-            images += 1
-        elif t == "audio":
-            audios += 1
-    return videos, images, audios
+    parts = partitions(result)
+    return len(parts.videos), len(parts.images), len(parts.audios)
 
 
 def pick_caption(author: Optional[str], title: Optional[str]) -> str:
@@ -33,61 +24,93 @@ def iter_medias(result: Dict[str, Any]):
         yield idx, m
 
 
-def _get_mime(m: Dict[str, Any]) -> str:
-    return (m.get("mimeType") or m.get("mime_type") or "").lower()
-
-
-def _get_extension(m: Dict[str, Any]) -> Optional[str]:
-    ext = m.get("extension") or m.get("ext")
-    if isinstance(ext, str):
-        return ext.lower()
-    return None
-
-
-def is_audio(m: Dict[str, Any]) -> bool:
-    t = (m.get("type") or "").lower()
-    if t == "audio":
-        return True
-    if m.get("is_audio") is True:
-        return True
-    mime = _get_mime(m)
-    if mime.startswith("audio/"):
-        return True
-    ext = _get_extension(m)
-    if ext in {"mp3", "m4a", "aac", "opus", "ogg", "oga", "webm"}:
-        return True
-    return False
-
-
-def is_video(m: Dict[str, Any]) -> bool:
-    if is_audio(m):
-        return False
-    t = (m.get("type") or "").lower()
-    if t == "video":
-        return True
-    mime = _get_mime(m)
-    if mime.startswith("video/"):
-        return True
-    ext = _get_extension(m)
-    if ext in {"mp4", "mkv", "mov", "webm", "m4v"}:
-        return True
-    return False
-
-
-def is_image(m: Dict[str, Any]) -> bool:
-    t = (m.get("type") or "").lower()
-    if t == "image":
-        return True
-    mime = _get_mime(m)
-    if mime.startswith("image/"):
-        return True
-    ext = _get_extension(m)
-    if ext in {"jpg", "jpeg", "png", "webp", "gif"}:
-        return True
-    return False
-
-
-def _quality_rank(q: Optional[str]) -> int:
+VIDEO = "video"
+IMAGE = "image"
+AUDIO = "audio"
+FILE = "file"
+
+AUDIO_EXTENSIONS = frozenset({"mp3", "m4a", "aac", "opus", "ogg", "oga", "webm"})
+VIDEO_EXTENSIONS = frozenset({"mp4", "mkv", "mov", "webm", "m4v"})
+IMAGE_EXTENSIONS = frozenset({"jpg", "jpeg", "png", "webp", "gif"})
+_AUDIO_CODEC_HINTS = ("mp4a", "vorbis", "opus", "ac-3", "ec-3")
+
+
+@dataclass(frozen=True, slots=True)
+class MediaItem:
+    """One normalized media entry, classified once by the normalizer."""
+
+    url: str
+    kind: str
+    type: str
+    extension: Optional[str] = None
+    quality: str = ""
+    quality_rank: int = 100
+    resolution: int = 0
+    data_size: Optional[int] = None
+    duration: Optional[int] = None
+    filename: Optional[str] = None
+    mime_type: Optional[str] = None
+    format_id: Optional[str] = None
+    has_audio: bool = False
+
+    @property
+    def is_http(self) -> bool:
+        return self.url.startswith("http")
+
+
+class MediaPartitions(NamedTuple):
+    videos: Tuple[MediaItem, ...]
+    images: Tuple[MediaItem, ...]
+    audios: Tuple[MediaItem, ...]
+
+
+def classify_media(t: str, mime: str, ext: str) -> str:
+    """Media kind from lowercased type, MIME and extension.
+
+    Audio wins over video, video over image (``webm`` counts as audio).
+    """
+    if t == AUDIO or mime.startswith("audio/") or ext in AUDIO_EXTENSIONS:
+        return AUDIO
+    if t == VIDEO or mime.startswith("video/") or ext in VIDEO_EXTENSIONS:
+        return VIDEO
+    if t == IMAGE or mime.startswith("image/") or ext in IMAGE_EXTENSIONS:
+        return IMAGE
+    return FILE
+
+
+def mime_has_audio_codec(mime: str) -> bool:
+    return any(tok in mime for tok in _AUDIO_CODEC_HINTS)
+
+
+def build_partitions(medias: List[MediaItem]) -> MediaPartitions:
+    return MediaPartitions(
+        videos=tuple(m for m in medias if m.kind == VIDEO),
+        images=tuple(m for m in medias if m.kind == IMAGE),
+        audios=tuple(m for m in medias if m.kind == AUDIO),
+    )
+
+
+def partitions(result: Dict[str, Any]) -> MediaPartitions:
+    """Video/image/audio partitions built by ``normalize_result``."""
+    parts = result.get("partitions")
+    if parts is None:
+        parts = build_partitions(result.get("medias") or [])
+    return parts
+
+
+def is_audio(m: MediaItem) -> bool:
+    return m.kind == AUDIO
+
+
+def is_video(m: MediaItem) -> bool:
+    return m.kind == VIDEO
+
+
+def is_image(m: MediaItem) -> bool:
+    return m.kind == IMAGE
+
+
+def quality_rank(q: Optional[str]) -> int:
     if not q:
         return 100
     ql = q.lower()
@@ -106,34 +129,9 @@ def _quality_rank(q: Optional[str]) -> int:
     return 50
 
 
-def _video_has_audio_track(m: Dict[str, Any]) -> bool:
-    # Prefer muxed streams when available (useful for YouTube)
-    if m.get("audioQuality") not in (None, "", "null"):
-        return True
-    mime = _get_mime(m)
-    if any(tok in mime for tok in ["mp4a", "vorbis", "opus", "ac-3", "ec-3"]):
-        return True
-    return False
-
-
-def choose_best_video(medias: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    videos = [m for m in medias if is_video(m)]
+def choose_best_video(medias: Iterable[MediaItem]) -> Optional[MediaItem]:
+    # Prefer muxed streams (useful for YouTube), then quality priority, then size desc
+    videos = [m for m in medias if m.kind == VIDEO]
     if not videos:
         return None
-
-    # Sort by: has audio track first, then quality priority, then size desc
-    def sort_key(m: Dict[str, Any]):
-        has_audio = _video_has_audio_track(m)
-        q = _quality_rank(m.get("quality"))
-        size = m.get("data_size") or 0
-        try:
-            size = int(size)
-        except Exception:
-            size = 0
-        return (0 if has_audio else 1, q, -size)
-
-    videos.sort(key=sort_key)
-    return videos[0]
-
-
-# Terabox utilities removed as platform support has been dropped
+    return min(videos, key=lambda m: (0 if m.has_audio else 1, m.quality_rank, -(m.data_size or 0)))
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from .downloader_client import DownloaderError
+
+try:
+    import resource  # type: ignore
+except Exception:  # pragma: no cover
+    resource = None  # type: ignore
+
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+# Share of the container memory limit handed to media buffers when the
+# budget is derived automatically; the rest covers the interpreter, caches
+# and ffmpeg overhead.
+AUTO_BUDGET_SHARE = 0.5
+
+_CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",  # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+)
+
+
+class BudgetExhausted(DownloaderError):
+    """The memory budget stayed full for longer than the caller would wait."""
+
+    def __init__(self, nbytes: int, waited: float):
+        super().__init__(f"Memory budget exhausted: {nbytes} bytes not available after {waited:.0f}s")
+        self.nbytes = nbytes
+
+
+def container_memory_limit() -> Optional[int]:
+    """The cgroup memory limit in bytes, or None when unlimited/unknown."""
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            continue
+        if raw.isdigit():
+            value = int(raw)
+            # cgroup v1 reports "unlimited" as a huge page-aligned number
+            return value if value < 1 << 60 else None
+        return None
+    return None
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # Peak, not current, but the best available without /proc (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def resolve_budget(configured: int) -> int:
+    """``configured`` when positive, else a share of the container limit."""
+    if configured > 0:
+        return configured
+    limit = container_memory_limit()
+    if limit:
+        return int(limit * AUTO_BUDGET_SHARE)
+    return DEFAULT_BUDGET_BYTES
+
+
+def buffer_cost(expected: Optional[int], cap: int) -> int:
+    """Bytes to reserve for buffering a download of ``expected`` bytes.
+
+    A download is held twice at its peak (the receive buffer and the final
+    bytes object, or the bytes and the upload copy). Unknown sizes reserve
+    for the worst case ``cap``.
+    """
+    size = expected if expected is not None and 0 < expected <= cap else cap
+    return 2 * size
+
+
+class MemoryBudget:
+    """Process-wide byte budget for in-flight media buffers.
+
+    Work reserves its expected size before downloading and releases it
+    when the buffer is gone. Reservations are granted in FIFO order, so a
+    large download is not starved by a stream of small ones; a single
+    reservation larger than the whole budget is clamped to it and simply
+    runs alone.
+    """
+
+    def __init__(self, limit_bytes: int = DEFAULT_BUDGET_BYTES, wait_seconds: float = 30.0) -> None:
+        self.limit_bytes = max(1, limit_bytes)
+        self.wait_seconds = wait_seconds
+        self.reserved = 0
+        self.peak_reserved = 0
+        self.granted = 0
+        self.exhausted = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    def resize(self, limit_bytes: int) -> None:
+        # Existing reservations stay; a smaller budget just admits less new work
+        self.limit_bytes = max(1, limit_bytes)
+        self._wake()
+
+    def _grant(self, n: int) -> None:
+        self.reserved += n
+        self.granted += 1
+        self.peak_reserved = max(self.peak_reserved, self.reserved)
+
+    def _wake(self) -> None:
+        while self._waiters:
+            n, fut = self._waiters[0]
+            if fut.done():
+                self._waiters.popleft()
+                continue
+            if self.reserved + n > self.limit_bytes:
+                break
+            self._waiters.popleft()
+            self._grant(n)
+            fut.set_result(None)
+
+    async def acquire(self, nbytes: int, *, timeout: Optional[float] = None) -> int:
+        """Reserve ``nbytes`` (clamped to the budget) and return the amount.
+
+        Raises BudgetExhausted after ``timeout`` (default ``wait_seconds``)
+        so the caller can degrade instead of queueing forever.
+        """
+        n = min(max(0, nbytes), self.limit_bytes)
+        if not self._waiters and self.reserved + n <= self.limit_bytes:
+            self._grant(n)
+            return n
+        wait = self.wait_seconds if timeout is None else timeout
+        entry = (n, asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(entry[1], wait)
+        except asyncio.TimeoutError:
+            self._drop(entry)
+            self.exhausted += 1
+            raise BudgetExhausted(n, wait) from None
+        except BaseException:
+            self._drop(entry)
+            raise
+        return n
+
+    def try_acquire(self, nbytes: int) -> Optional[int]:
+        """Reserve ``nbytes`` only if it fits right now without queueing; None otherwise."""
+        n = min(max(0, nbytes), self.limit_bytes)
+        if self._waiters or self.reserved + n > self.limit_bytes:
+            return None
+        self._grant(n)
+        return n
+
+    def _drop(self, entry: Tuple[int, asyncio.Future]) -> None:
+        n, fut = entry
+        if fut.done() and not fut.cancelled():
+            # Granted just as the caller gave up
+            self.release(n)
+            return
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+        # A blocked head-of-line waiter leaving may unblock the ones behind it
+        self._wake()
+
+    def release(self, n: int) -> None:
+        self.reserved = max(0, self.reserved - n)
+        self._wake()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int, *, timeout: Optional[float] = None) -> AsyncIterator[int]:
+        n = await self.acquire(nbytes, timeout=timeout)
+        try:
+            yield n
+        finally:
+            self.release(n)
+
+    def pressure(self) -> float:
+        """Reserved plus queued bytes as a share of the budget (may exceed 1)."""
+        queued = sum(n for n, fut in self._waiters if not fut.done())
+        return (self.reserved + queued) / self.limit_bytes
+
+    def snapshot(self) -> Dict[str, Optional[int]]:
+        return {
+            "limit": self.limit_bytes,
+            "reserved": self.reserved,
+            "peak_reserved": self.peak_reserved,
+            "waiting": sum(1 for _, fut in self._waiters if not fut.done()),
+            "granted": self.granted,
+            "exhausted": self.exhausted,
+            "rss": current_rss(),
+            "container_limit": container_memory_limit(),
+        }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+from typing import Optional
+
+import aiohttp
+
+from .downloader_client import DownloaderClient, DownloaderError, TooLargeError
+
+try:
+    import resource  # type: ignore
+except Exception:  # pragma: no cover
+    resource = None  # type: ignore
+
+
+class MuxError(DownloaderError):
+    pass
+
+
+def ffmpeg_available(ffmpeg_path: str) -> bool:
+    return shutil.which(ffmpeg_path) is not None
+
+
+def _resource_limiter(memory_limit_bytes: int, cpu_seconds: int):
+    """Build a preexec_fn that caps ffmpeg's address space and CPU time."""
+    if resource is None or (memory_limit_bytes <= 0 and cpu_seconds <= 0):
+        return None
+
+    def _apply() -> None:
+        if memory_limit_bytes > 0:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        if cpu_seconds > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+
+    return _apply
+
+
+async def _pump(api: DownloaderClient, session: aiohttp.ClientSession, url: str, fd: int) -> None:
+    # Pipe writes block when ffmpeg is not reading yet, so they run in the executor
+    loop = asyncio.get_running_loop()
+    with os.fdopen(fd, "wb", buffering=0) as f:
+        try:
+            async for chunk in api.iter_chunks(session, url):
+                await loop.run_in_executor(None, f.write, chunk)
+        except BrokenPipeError:
+            # ffmpeg exited early; its exit status tells the real story
+            pass
+
+
+async def _collect(stream: asyncio.StreamReader, max_bytes: int) -> bytes:
+    buf = bytearray()
+    while True:
+        chunk = await stream.read(1024 * 64)
+        if not chunk:
+            break
+        buf += chunk
+        if len(buf) > max_bytes:
+            raise TooLargeError(len(buf), max_bytes)
+    return bytes(buf)
+
+
+async def mux_to_bytes(
+    api: DownloaderClient,
+    session: aiohttp.ClientSession,
+    *,
+    video_url: str,
+    audio_url: str,
+    max_bytes: int,
+    ffmpeg_path: str = "ffmpeg",
+    memory_limit_bytes: int = 0,
+    cpu_seconds: int = 0,
+    timeout: Optional[float] = None,
+) -> bytes:
+    """Download a video-only and an audio-only stream concurrently and remux
+    them into a fragmented MP4 with ``ffmpeg -c copy``.
+
+    Both inputs are fed through anonymous pipes and the output is read from
+    stdout, so nothing touches the disk and nothing is re-encoded. The output
+    buffer is capped at ``max_bytes``; ffmpeg itself is capped by
+    ``memory_limit_bytes`` (RLIMIT_AS) and ``cpu_seconds`` (RLIMIT_CPU).
+    """
+    video_r, video_w = os.pipe()
+    audio_r, audio_w = os.pipe()
+    cmd = [
+        ffmpeg_path,
+        "-hide_banner",
+        "-loglevel", "error",
+        "-nostdin",
+        "-i", f"pipe:{video_r}",
+        "-i", f"pipe:{audio_r}",
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c", "copy",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "-f", "mp4",
+        "pipe:1",
+    ]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=(video_r, audio_r),
+            preexec_fn=_resource_limiter(memory_limit_bytes, cpu_seconds),
+        )
+    except Exception as e:
+        for fd in (video_r, video_w, audio_r, audio_w):
+            os.close(fd)
+        raise MuxError(f"ffmpeg failed to start: {e}") from e
+    # The child owns the read ends now
+    os.close(video_r)
+    os.close(audio_r)
+
+    pumps = [
+        asyncio.create_task(_pump(api, session, video_url, video_w)),
+        asyncio.create_task(_pump(api, session, audio_url, audio_w)),
+    ]
+    out_task = asyncio.create_task(_collect(proc.stdout, max_bytes))  # type: ignore[arg-type]
+    err_task = asyncio.create_task(proc.stderr.read())  # type: ignore[union-attr]
+
+    try:
+        _, _, data = await asyncio.wait_for(asyncio.gather(*pumps, out_task), timeout=timeout)
+        returncode = await proc.wait()
+        stderr = await err_task
+    except BaseException:
+        for t in (*pumps, out_task, err_task):
+            t.cancel()
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+        raise
+
+    if returncode != 0:
+        tail = stderr.decode("utf-8", "replace").strip()[-300:]
+        raise MuxError(f"ffmpeg exited with {returncode}: {tail}")
+    if not data:
+        raise MuxError("ffmpeg produced no output")
+    return data
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Degradation levels, each including the ones below it
+NORMAL = 0
+LINKS_ONLY = 1  # no byte-upload fallbacks (download + re-upload), links instead
+NO_PROBE = 2  # additionally skip origin probes (redirect resolution)
+REJECT = 3  # fast-reject new links
+
+LEVEL_NAMES = ("normal", "links_only", "no_probe", "reject")
+
+# Signals and their thresholds for entering LINKS_ONLY, NO_PROBE and REJECT
+SIGNALS = ("queue", "loop_lag", "memory", "error_rate")
+
+# A level is left only once every signal drops below this share of its
+# entry threshold, and stayed there for ``recover_seconds``
+EXIT_RATIO = 0.7
+
+# Upstream error rate needs this many requests in the window to count
+_MIN_REQUESTS = 5
+
+Thresholds = Tuple[float, float, float]
+
+
+@dataclass(frozen=True)
+class OverloadSettings:
+    """Overload detection thresholds (config.yml `overload:`).
+
+    ``queue`` is the link queue depth as a share of JOB_MAX_PENDING,
+    ``loop_lag`` the event loop lag in seconds, ``memory`` reserved plus
+    queued buffer bytes as a share of the memory budget and ``error_rate``
+    the share of failed downloader API calls over ``window_seconds``.
+    """
+
+    enabled: bool = True
+    queue: Thresholds = (0.5, 0.75, 0.9)
+    loop_lag: Thresholds = (0.25, 0.75, 2.0)
+    memory: Thresholds = (0.8, 1.0, 1.5)
+    error_rate: Thresholds = (0.25, 0.5, 0.8)
+    window_seconds: int = 30
+    recover_seconds: int = 30
+    retry_after: int = 30
+
+
+def _thresholds(value: Any) -> Optional[Thresholds]:
+    if not isinstance(value, (list, tuple)) or len(value) != 3:
+        return None
+    try:
+        out = tuple(float(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+    if any(v < 0 for v in out) or list(out) != sorted(out):
+        return None
+    return out  # type: ignore[return-value]
+
+
+def parse_overload(section: Any, base: OverloadSettings) -> OverloadSettings:
+    """Merge the `overload:` section over ``base``; invalid values are ignored."""
+    if not isinstance(section, dict):
+        return base
+    changes: Dict[str, Any] = {}
+    for key in SIGNALS:
+        th = _thresholds(section.get(key))
+        if th is not None:
+            changes[key] = th
+    for key in ("window_seconds", "recover_seconds", "retry_after"):
+        try:
+            changes[key] = max(1, int(section[key]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return replace(base, **changes)
+
+
+def validate_overload(section: Any) -> List[str]:
+    errors: List[str] = []
+    if not isinstance(section, dict):
+        return ["overload must be a mapping"]
+    for key, value in section.items():
+        if key in SIGNALS:
+            if _thresholds(value) is None:
+                errors.append(f"overload.{key} must be a list of 3 ascending numbers >= 0")
+        elif key in ("window_seconds", "recover_seconds", "retry_after"):
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                errors.append(f"overload.{key} must be an integer >= 1")
+        else:
+            errors.append(f"overload.{key} is not a known overload setting")
+    return errors
+
+
+class OverloadMonitor:
+    """Maps load signals to a degradation level with hysteresis.
+
+    The level rises as soon as any signal crosses an entry threshold. It
+    falls one step at a time, and only after every signal has stayed below
+    ``EXIT_RATIO`` of the current level's thresholds for
+    ``recover_seconds``, so the bot does not flap around a threshold.
+    """
+
+    def __init__(self, settings: Optional[OverloadSettings] = None, interval: float = 1.0) -> None:
+        self.settings = settings or OverloadSettings()
+        self.interval = interval
+        self.level = NORMAL
+        self.changed_at = time.monotonic()
+        self.signals: Dict[str, float] = {name: 0.0 for name in SIGNALS}
+        self.cause: Optional[str] = None
+        self.shed: Dict[str, int] = {name: 0 for name in LEVEL_NAMES[1:]}
+        self._calm_since: Optional[float] = None
+        self._errors: Deque[Tuple[float, int, int]] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    # -- queries used on the hot path ---------------------------------------
+
+    @property
+    def links_only(self) -> bool:
+        return self.level >= LINKS_ONLY
+
+    @property
+    def skip_probes(self) -> bool:
+        return self.level >= NO_PROBE
+
+    @property
+    def rejecting(self) -> bool:
+        return self.level >= REJECT
+
+    def count_shed(self, level: int) -> None:
+        self.shed[LEVEL_NAMES[level]] += 1
+
+    # -- evaluation -----------------------------------------------------------
+
+    def _level_for(self, signals: Dict[str, float], scale: float) -> Tuple[int, Optional[str]]:
+        level, cause = NORMAL, None
+        for name in SIGNALS:
+            value = signals.get(name, 0.0)
+            thresholds = getattr(self.settings, name)
+            for idx in range(len(thresholds) - 1, -1, -1):
+                if value >= thresholds[idx] * scale:
+                    if idx + 1 > level:
+                        level, cause = idx + 1, name
+                    break
+        return level, cause
+
+    def error_rate(self, requests: int, failures: int, now: float) -> float:
+        """Failure share of downloader calls over the window from running totals."""
+        self._errors.append((now, requests, failures))
+        while len(self._errors) > 1 and now - self._errors[0][0] > self.settings.window_seconds:
+            self._errors.popleft()
+        _, req0, fail0 = self._errors[0]
+        done = requests - req0
+        return (failures - fail0) / done if done >= _MIN_REQUESTS else 0.0
+
+    def update(self, signals: Dict[str, float], now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        self.signals = dict(signals)
+        if not self.settings.enabled:
+            self._set(NORMAL, None, now)
+            return self.level
+        target, cause = self._level_for(signals, 1.0)
+        if target > self.level:
+            self._calm_since = None
+            self._set(target, cause, now)
+            return self.level
+        calm, _ = self._level_for(signals, EXIT_RATIO)
+        if calm >= self.level:
+            self._calm_since = None
+            return self.level
+        if self._calm_since is None:
+            self._calm_since = now
+        elif now - self._calm_since >= self.settings.recover_seconds:
+            self._calm_since = now
+            self._set(self.level - 1, self.cause, now)
+        return self.level
+
+    def _set(self, level: int, cause: Optional[str], now: float) -> None:
+        if level == self.level:
+            return
+        logging.getLogger("bot").warning(
+            "overload_level from=%s to=%s cause=%s signals=%s",
+            LEVEL_NAMES[self.level],
+            LEVEL_NAMES[level],
+            cause or "-",
+            ",".join(f"{k}={v:.2f}" for k, v in self.signals.items()),
+        )
+        self.level = level
+        self.cause = cause if level else None
+        self.changed_at = now
+
+    def retry_after(self) -> int:
+        return self.settings.retry_after
+
+    # -- sampling loop --------------------------------------------------------
+
+    def start(self, collect: Callable[[], Dict[str, float]], upstream: Callable[[], Tuple[int, int]]) -> None:
+        """Sample ``collect()`` (queue, memory) and ``upstream()`` (request and
+        failure totals) every ``interval`` seconds; loop lag is measured here."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(collect, upstream))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, collect: Callable[[], Dict[str, float]], upstream: Callable[[], Tuple[int, int]]) -> None:
+        lag = 0.0
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            # Smooth single stalls so one slow callback does not shed load
+            lag = 0.7 * lag + 0.3 * max(0.0, now - started - self.interval)
+            try:
+                signals = dict(collect())
+                # The loop watchdog, when running, provides a finer lag signal
+                signals.setdefault("loop_lag", lag)
+                signals["error_rate"] = self.error_rate(*upstream(), now)
+                self.update(signals, now)
+            except Exception:
+                logging.getLogger("bot").exception("overload_sample_failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "level": self.level,
+            "name": LEVEL_NAMES[self.level],
+            "cause": self.cause,
+            "since": time.monotonic() - self.changed_at,
+            "signals": dict(self.signals),
+            "shed": dict(self.shed),
+        }
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Tuple
+
+# Keys accepted in a config.yml `pipelines:` entry
+_INT_KEYS = ("connect_timeout", "read_timeout", "total_timeout", "concurrency", "retries")
+
+# Built-in platform entries, applied under any config.yml entry of the same
+# name: these processors always made a single API call, so they keep doing
+# so unless `retries` is configured explicitly.
+BUILTIN_PIPELINES: Dict[str, Dict[str, Any]] = {
+    "tiktok": {"retries": 1},
+    "instagram": {"retries": 1},
+    "facebook": {"retries": 1},
+}
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    """How a platform's downloader API is called.
+
+    ``concurrency`` 0 means unlimited; ``retries`` counts attempts per
+    endpoint; ``fallback_endpoints`` are tried in order after the primary
+    endpoint fails.
+    """
+
+    connect_timeout: int = 10
+    read_timeout: int = 60
+    total_timeout: int = 120
+    concurrency: int = 0
+    retries: int = 3
+    fallback_endpoints: Tuple[str, ...] = ()
+    resolve_redirects: bool = True
+
+
+def _apply(base: PipelineSettings, spec: Dict[str, Any]) -> PipelineSettings:
+    changes: Dict[str, Any] = {}
+    for key in _INT_KEYS:
+        if key in spec:
+            try:
+                changes[key] = max(0, int(spec[key]))
+            except (TypeError, ValueError):
+                pass
+    if "resolve_redirects" in spec:
+        changes["resolve_redirects"] = bool(spec["resolve_redirects"])
+    fallbacks = spec.get("fallback_endpoints")
+    if isinstance(fallbacks, str):
+        fallbacks = [fallbacks]
+    if isinstance(fallbacks, list):
+        changes["fallback_endpoints"] = tuple(u for u in fallbacks if isinstance(u, str) and u.startswith("http"))
+    if changes.get("retries") == 0:
+        changes["retries"] = 1
+    return replace(base, **changes)
+
+
+def parse_pipelines(section: Any, base: PipelineSettings) -> Dict[str, PipelineSettings]:
+    """Build per-platform pipeline settings from the `pipelines:` section.
+
+    ``default`` applies to every platform and each platform entry is merged
+    over it, on top of ``BUILTIN_PIPELINES``. Unknown keys and invalid
+    values are ignored.
+    """
+    if not isinstance(section, dict):
+        section = {}
+    default_spec = section.get("default")
+    default = _apply(base, default_spec) if isinstance(default_spec, dict) else base
+    out: Dict[str, PipelineSettings] = {"default": default}
+    for name, spec in BUILTIN_PIPELINES.items():
+        out[name] = _apply(default, spec)
+    for name, spec in section.items():
+        if name == "default" or not isinstance(name, str) or not isinstance(spec, dict):
+            continue
+        out[name.lower()] = _apply(default, {**BUILTIN_PIPELINES.get(name.lower(), {}), **spec})
+    return out
+
+
+def pipeline_for(pipelines: Dict[str, PipelineSettings], platform: str) -> PipelineSettings:
+    return pipelines.get(platform) or pipelines.get("default") or PipelineSettings()
@@ -35,18 +35,32 @@ SUPPORTED_PLATFORMS = {
 }
 
 
+# Precompiled host-suffix map: every registered domain points at its platform.
+# Lookups walk the host's label suffixes (a.b.tiktok.com -> b.tiktok.com ->
+# tiktok.com), so cost depends on the host's depth, not on the platform count.
+HOST_SUFFIX_MAP = {d: platform for platform, domains in SUPPORTED_PLATFORMS.items() for d in domains}
+
+
+def platform_for_host(host: str) -> str | None:
+    host = host.lower().rstrip(".")
+    while host:
+        platform = HOST_SUFFIX_MAP.get(host)
+        if platform:
+            return platform
+        dot = host.find(".")
+        if dot < 0:
+            return None
+        host = host[dot + 1 :]
+    return None
+
+
 def detect_platform(url: str) -> str | None:
     try:
         parsed = urlparse(url)
-        host = (parsed.hostname or "").lower()
+        host = parsed.hostname or ""
     except Exception:
         return None
-
-    for platform, domains in SUPPORTED_PLATFORMS.items():
-        for d in domains:
-            if host == d or host.endswith("." + d):
-                return platform
-    return None
+    return platform_for_host(host)
 
 
 def is_supported_url(url: str) -> bool:
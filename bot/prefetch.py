@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .downloader_client import DownloaderClient, DownloaderError
+from .lanes import PREFETCH, TRANSFER
+from .media_cache import download_cached
+from .memory import buffer_cost
+
+if TYPE_CHECKING:
+    from .config import Settings
+    from .context import BotContext
+
+
+def audio_client(settings: "Settings") -> DownloaderClient:
+    """Client for MP3 downloads; ``DOWNLOADER_API_BASE_URL_AUDIO`` overrides the endpoint."""
+    return DownloaderClient(
+        base_url=os.getenv("DOWNLOADER_API_BASE_URL_AUDIO") or settings.downloader_api_base_url,
+        api_key=settings.downloader_api_key,
+        connect_timeout=settings.http_connect_timeout,
+        read_timeout=settings.http_read_timeout,
+        total_timeout=settings.http_total_timeout,
+    )
+
+
+@dataclass
+class _Entry:
+    task: Optional[asyncio.Task] = None
+    expiry: Optional[asyncio.TimerHandle] = None
+    # Set once the download holds its PREFETCH slot
+    active: bool = False
+
+
+class AudioPrefetcher:
+    """Downloads the audio behind fresh "Download MP3" buttons before the click.
+
+    ``offer`` is called for every new audio token. The download only starts
+    while nothing else waits for a worker slot, the bot is not shedding
+    load and memory reservations stay below ``max_pressure`` of the budget;
+    it runs in the lowest-priority lane and holds at most ``max_bytes`` of
+    reservations in total. A click takes the bytes together with their
+    memory reservation, waiting for a download already in flight; one still
+    queued for its lane slot is cancelled so the click is not stuck behind
+    lower-priority work. Entries not claimed within ``ttl`` seconds of the
+    offer are dropped (cancelled, or their bytes counted as waste).
+    """
+
+    def __init__(self, *, ttl: float = 600.0, max_bytes: int = 64 * 1024 * 1024, max_pressure: float = 0.5) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_pressure = max_pressure
+        self.held_bytes = 0
+        self._entries: Dict[str, _Entry] = {}
+        self.offered = 0
+        self.started = 0
+        self.skipped = 0
+        self.failed = 0
+        self.hits = 0
+        self.inflight_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.used_bytes = 0
+        self.wasted_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def offer(self, ctx: "BotContext", token: str, url: str, size_hint: Optional[int] = None) -> None:
+        self.offered += 1
+        s = ctx.settings
+        if size_hint is not None and size_hint > min(s.max_upload_bytes, self.max_bytes):
+            self.skipped += 1
+            return
+        busy = (
+            ctx.overload.links_only
+            or ctx.memory.pressure() >= self.max_pressure
+            or self.held_bytes >= self.max_bytes
+            or not ctx.lanes.has_spare(PREFETCH)
+            or not ctx.lanes.has_spare(TRANSFER)
+        )
+        if busy:
+            self.skipped += 1
+            return
+        self.started += 1
+        entry = self._entries[token] = _Entry()
+        entry.expiry = asyncio.get_running_loop().call_later(self.ttl, self._expire, ctx, token)
+        entry.task = asyncio.create_task(self._run(ctx, token, entry, url, size_hint))
+
+    async def _run(self, ctx: "BotContext", token: str, entry: _Entry, url: str, size: Optional[int]) -> Optional[Tuple[bytes, int]]:
+        result = await self._fetch(ctx, token, entry, url, size)
+        if result is None and self._entries.get(token) is entry:
+            # Nothing to hand over; a later click simply downloads as usual
+            del self._entries[token]
+            if entry.expiry is not None:
+                entry.expiry.cancel()
+        return result
+
+    async def _fetch(self, ctx: "BotContext", token: str, entry: _Entry, url: str, size: Optional[int]) -> Optional[Tuple[bytes, int]]:
+        s = ctx.settings
+        api = audio_client(s)
+        reserved = 0
+        try:
+            async with ctx.lanes.run(PREFETCH), ctx.http.client() as session:
+                entry.active = True
+                # Only the size for now: the cached bytes are read once reserved
+                cached_size = await ctx.media_cache.size_of(url) if ctx.media_cache is not None else None
+                if cached_size is not None:
+                    size = cached_size
+                elif size is None:
+                    size = await api.head_size(session, url)
+                limit = min(s.max_upload_bytes, self.max_bytes)
+                if size is None or size > limit:
+                    # Unknown or large sizes would tie up too much budget on a guess
+                    self.skipped += 1
+                    return None
+                cost = buffer_cost(size, s.max_upload_bytes)
+                if self.held_bytes + cost > self.max_bytes or ctx.memory.pressure() + cost / ctx.memory.limit_bytes > self.max_pressure:
+                    self.skipped += 1
+                    return None
+                got = ctx.memory.try_acquire(cost)
+                if got is None:
+                    self.skipped += 1
+                    return None
+                reserved = got
+                self.held_bytes += reserved
+                data = await download_cached(ctx.media_cache, api, session, url, limit, lookup=cached_size is not None)
+        except asyncio.CancelledError:
+            self._drop_reservation(ctx, reserved)
+            raise
+        except (DownloaderError, asyncio.TimeoutError, OSError):
+            self._drop_reservation(ctx, reserved)
+            self.failed += 1
+            logging.getLogger("bot").info("mp3_prefetch_failed token=%s url=%s", token, url, exc_info=True)
+            return None
+        except Exception:
+            self._drop_reservation(ctx, reserved)
+            self.failed += 1
+            logging.getLogger("bot").exception("mp3_prefetch_error token=%s", token)
+            return None
+        return data, reserved
+
+    def _drop_reservation(self, ctx: "BotContext", reserved: int) -> None:
+        if reserved:
+            self.held_bytes -= reserved
+            ctx.memory.release(reserved)
+
+    def _expire(self, ctx: "BotContext", token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        assert entry.task is not None
+        if not entry.task.done():
+            entry.task.cancel()
+            return
+        result = None if entry.task.cancelled() or entry.task.exception() else entry.task.result()
+        if result is not None:
+            data, reserved = result
+            self.wasted_bytes += len(data)
+            self._drop_reservation(ctx, reserved)
+
+    async def take(self, token: str) -> Optional[Tuple[bytes, int]]:
+        """Prefetched ``(bytes, reserved)`` for ``token``, or None on a miss.
+
+        The caller owns the memory reservation and releases it after the
+        upload.
+        """
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expiry is not None:
+            entry.expiry.cancel()
+        assert entry.task is not None
+        inflight = not entry.task.done()
+        if inflight and not entry.active:
+            # Still waiting for the lowest-priority lane: don't make the click
+            # wait behind everything else, take the regular TRANSFER path
+            entry.task.cancel()
+            self.bypassed += 1
+            self.misses += 1
+            return None
+        try:
+            result = await entry.task
+        except asyncio.CancelledError:
+            if not entry.task.cancelled():
+                # The click handler itself was cancelled; don't leave the download behind
+                entry.task.cancel()
+                raise
+            result = None
+        if result is None:
+            self.misses += 1
+            return None
+        data, reserved = result
+        self.held_bytes -= reserved
+        if inflight:
+            self.inflight_hits += 1
+        else:
+            self.hits += 1
+        self.used_bytes += len(data)
+        return data, reserved
+
+    async def close(self, ctx: "BotContext") -> None:
+        for token in list(self._entries):
+            entry = self._entries[token]
+            if entry.expiry is not None:
+                entry.expiry.cancel()
+            if entry.task is not None:
+                entry.task.cancel()
+        await asyncio.gather(*(e.task for e in self._entries.values() if e.task is not None), return_exceptions=True)
+        for token in list(self._entries):
+            self._expire(ctx, token)
+
+    def snapshot(self) -> Dict[str, float]:
+        clicks = self.hits + self.inflight_hits + self.misses
+        return {
+            "offered": self.offered,
+            "started": self.started,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "hits": self.hits,
+            "inflight_hits": self.inflight_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": (self.hits + self.inflight_hits) / clicks if clicks else 0.0,
+            "held_bytes": self.held_bytes,
+            "used_bytes": self.used_bytes,
+            "wasted_bytes": self.wasted_bytes,
+            "pending": len(self._entries),
+        }
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import linecache
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Frames kept per tracemalloc allocation; more is more overhead while tracing
+TRACE_FRAMES = 10
+
+FrameKey = Tuple[str, int, str]
+
+
+def _frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _format_key(key: FrameKey) -> str:
+    filename, line, name = key
+    return f"{name} ({filename}:{line})"
+
+
+class SamplingProfiler:
+    """Stack sampler for one thread, run from a helper thread.
+
+    Nothing is installed in the profiled thread (no sys.setprofile), so
+    the cost is one ``sys._current_frames()`` call per interval while
+    running and zero otherwise.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.own: Counter = Counter()
+        self.total: Counter = Counter()
+        self.stacks: Counter = Counter()
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        self.samples += 1
+        self.own[_frame_key(frame)] += 1
+        stack: List[FrameKey] = []
+        seen = set()
+        while frame is not None:
+            key = _frame_key(frame)
+            stack.append(key)
+            # Recursion counts once per sample in the cumulative view
+            if key not in seen:
+                seen.add(key)
+                self.total[key] += 1
+            frame = frame.f_back
+        self.stacks[";".join(name for _, _, name in reversed(stack))] += 1
+
+    def run(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._sample()
+            time.sleep(self.interval)
+
+    def report(self, top: int = 40) -> str:
+        out = io.StringIO()
+        out.write(f"samples: {self.samples} (interval {self.interval * 1000:.0f} ms)\n")
+        if not self.samples:
+            return out.getvalue()
+        for title, counter in (("self", self.own), ("cumulative", self.total)):
+            out.write(f"\n== top {top} by {title} time ==\n")
+            for key, count in counter.most_common(top):
+                out.write(f"{count / self.samples * 100:6.1f}%  {count:6d}  {_format_key(key)}\n")
+        out.write("\n== collapsed stacks (flamegraph.pl input) ==\n")
+        for stack, count in self.stacks.most_common():
+            out.write(f"{stack} {count}\n")
+        return out.getvalue()
+
+
+_profile_lock = asyncio.Lock()
+
+
+def profile_running() -> bool:
+    return _profile_lock.locked()
+
+
+async def profile_loop(seconds: float, interval: float = 0.005) -> str:
+    """Sample the running event loop thread for ``seconds`` and return a report."""
+    async with _profile_lock:
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        started = time.monotonic()
+        await asyncio.to_thread(profiler.run, seconds)
+        header = f"CPU profile of the event loop thread, {time.monotonic() - started:.1f}s\n"
+        return header + profiler.report()
+
+
+class MemorySnapshots:
+    """tracemalloc driven from an admin command.
+
+    Tracing starts with the first snapshot and stays on until ``stop``;
+    each later snapshot is diffed against the previous one so growth
+    between two calls shows up at the top.
+    """
+
+    def __init__(self) -> None:
+        self._last: Optional[tracemalloc.Snapshot] = None
+        self._last_at = 0.0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._last = None
+
+    def take(self, sizes: Dict[str, int], top: int = 30) -> str:
+        """Snapshot, diff against the previous one and return a report.
+
+        ``sizes`` are entry counts of long-lived structures, listed so a
+        leak in one of them is visible without reading allocation sites.
+        """
+        out = io.StringIO()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            out.write("tracemalloc started; allocations are tracked from now on.\n")
+        snap = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, linecache.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        out.write(f"traced: {current / 1048576:.1f} MB (peak {peak / 1048576:.1f} MB)\n")
+        out.write("\n== structure sizes ==\n")
+        for name, size in sizes.items():
+            out.write(f"{name}: {size}\n")
+        if self._last is not None:
+            out.write(f"\n== top {top} growth since the previous snapshot ({time.monotonic() - self._last_at:.0f}s ago) ==\n")
+            for stat in snap.compare_to(self._last, "traceback")[:top]:
+                out.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback[0]}\n")
+                for line in stat.traceback.format()[2:]:
+                    out.write(f"    {line}\n")
+        out.write(f"\n== top {top} allocation sites ==\n")
+        for stat in snap.statistics("lineno")[:top]:
+            out.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback[0]}\n")
+        self._last = snap
+        self._last_at = time.monotonic()
+        return out.getvalue()
+
+
+def dump_tasks(limit: int = 20) -> str:
+    """Every pending asyncio task with its current stack (``limit`` frames each)."""
+    tasks = sorted(asyncio.all_tasks(), key=lambda t: t.get_name())
+    out = io.StringIO()
+    out.write(f"{len(tasks)} task(s)\n")
+    for task in tasks:
+        out.write(f"\n== {task.get_name()} {task.get_coro()!r}\n")
+        task.print_stack(limit=limit, file=out)
+    return out.getvalue()
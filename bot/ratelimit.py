@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+ADMIN = "admin"
+TRUSTED = "trusted"
+DEFAULT = "default"
+
+
+@dataclass(frozen=True)
+class RateTier:
+    """Link rate for a group of users. ``per_minute`` 0 means unlimited."""
+
+    per_minute: float
+    burst: int
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+
+DEFAULT_TIERS: Dict[str, RateTier] = {
+    ADMIN: RateTier(per_minute=0, burst=0),
+    TRUSTED: RateTier(per_minute=60, burst=20),
+    DEFAULT: RateTier(per_minute=10, burst=5),
+}
+
+
+def parse_rate_tiers(section: Any, base: Dict[str, RateTier]) -> Dict[str, RateTier]:
+    """Merge the config.yml `rate_limits:` section over ``base``; invalid values are ignored."""
+    tiers = dict(base)
+    if not isinstance(section, dict):
+        return tiers
+    for name, spec in section.items():
+        if not isinstance(name, str) or not isinstance(spec, dict):
+            continue
+        current = tiers.get(name.lower(), tiers[DEFAULT])
+        per_minute, burst = current.per_minute, current.burst
+        try:
+            per_minute = max(0.0, float(spec.get("per_minute", per_minute)))
+            burst = max(1, int(spec.get("burst", burst)))
+        except (TypeError, ValueError):
+            continue
+        tiers[name.lower()] = RateTier(per_minute=per_minute, burst=burst)
+    return tiers
+
+
+def validate_rate_tiers(section: Any) -> List[str]:
+    if not isinstance(section, dict):
+        return ["rate_limits must be a mapping"]
+    errors: List[str] = []
+    for name, spec in section.items():
+        if name not in (ADMIN, TRUSTED, DEFAULT):
+            errors.append(f"rate_limits.{name} is not a known tier (admin, trusted, default)")
+        elif not isinstance(spec, dict):
+            errors.append(f"rate_limits.{name} must be a mapping")
+        else:
+            for key, value in spec.items():
+                if key not in ("per_minute", "burst"):
+                    errors.append(f"rate_limits.{name}.{key} is not a known setting")
+                elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < (0 if key == "per_minute" else 1):
+                    errors.append(f"rate_limits.{name}.{key} must be a number >= {0 if key == 'per_minute' else 1}")
+    return errors
+
+
+class UserRateLimiter:
+    """Per-user token buckets for new links, stored as one float per user.
+
+    Each user's bucket is kept as the time at which it will be full again
+    (the GCRA "theoretical arrival time"): taking a token pushes it one
+    emission interval into the future, and a request fits while it stays
+    within ``burst`` intervals of now. Buckets whose time has passed are
+    full, so a periodic sweep drops them and memory tracks only recently
+    active users.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0) -> None:
+        self.sweep_interval = sweep_interval
+        self.throttled = 0
+        self._full_at: Dict[int, float] = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def take(self, user_id: int, tier: RateTier, n: int = 1) -> Tuple[int, float]:
+        """Take up to ``n`` tokens; returns ``(granted, retry_after)``.
+
+        ``retry_after`` is the number of seconds until the next token when
+        fewer than ``n`` were granted, else 0.
+        """
+        if tier.unlimited:
+            return n, 0.0
+        now = time.monotonic()
+        self._sweep(now)
+        interval = 60.0 / tier.per_minute
+        full_at = max(self._full_at.get(user_id, now), now)
+        available = int((tier.burst * interval - (full_at - now)) / interval + 1e-9)
+        granted = max(0, min(n, available))
+        full_at += granted * interval
+        self._full_at[user_id] = full_at
+        if granted >= n:
+            return granted, 0.0
+        self.throttled += 1
+        return granted, full_at - now + interval - tier.burst * interval
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for uid in [uid for uid, full_at in self._full_at.items() if full_at <= now]:
+            del self._full_at[uid]
+
+
+def format_retry(seconds: float) -> str:
+    seconds = max(1, math.ceil(seconds))
+    if seconds < 60:
+        return f"{seconds} detik"
+    return f"{math.ceil(seconds / 60)} menit"
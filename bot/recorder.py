@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Response keys dropped wherever they appear; the API echoes some of them
+SECRET_KEYS = frozenset({"apikey", "api_key", "access_token", "token", "cookie", "cookies", "authorization"})
+
+REDACTED = "REDACTED"
+
+
+def sanitize(value: Any, secrets: Iterable[str] = ()) -> Any:
+    """Copy of a decoded JSON value without secret keys or secret strings."""
+    secrets = tuple(s for s in secrets if s)
+
+    def _clean(v: Any) -> Any:
+        if isinstance(v, dict):
+            return {k: (REDACTED if str(k).lower() in SECRET_KEYS else _clean(x)) for k, x in v.items()}
+        if isinstance(v, list):
+            return [_clean(x) for x in v]
+        if isinstance(v, str):
+            for secret in secrets:
+                v = v.replace(secret, REDACTED)
+        return v
+
+    return _clean(value)
+
+
+@dataclass
+class Recording:
+    """One downloader API exchange as stored in the corpus."""
+
+    platform: str
+    url: str
+    resolved: str
+    endpoint: str
+    status: int
+    latency: float
+    response: Dict[str, Any]
+    path: Optional[Path] = None
+
+    @classmethod
+    def load(cls, path: Path) -> "Recording":
+        with path.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return cls(
+            platform=raw["platform"],
+            url=raw["url"],
+            resolved=raw.get("resolved") or raw["url"],
+            endpoint=raw.get("endpoint", ""),
+            status=int(raw.get("status", 200)),
+            latency=float(raw.get("latency", 0.0)),
+            response=raw["response"],
+            path=path,
+        )
+
+
+def load_corpus(root: str) -> List[Recording]:
+    """Every recording under ``root``, sorted by path; unreadable files are skipped."""
+    out: List[Recording] = []
+    for path in sorted(Path(root).glob("*/*.json")):
+        try:
+            out.append(Recording.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            logging.getLogger("bot").warning("corpus_skip path=%s error=%s", path, e)
+    return out
+
+
+class ResponseRecorder:
+    """Saves sanitized downloader API responses to ``root/<platform>/``.
+
+    Files are named by the hash of the requested URL, so recording the same
+    link again replaces the old response. The API key is removed from the
+    body as well as from the stored request.
+    """
+
+    def __init__(self, root: str, secrets: Iterable[str] = ()) -> None:
+        self.root = Path(root)
+        self.secrets = tuple(s for s in secrets if s)
+        self.recorded = 0
+
+    def _write(self, platform: str, url: str, doc: Dict[str, Any]) -> None:
+        folder = self.root / (platform or "generic")
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.json"
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    async def record(self, *, platform: str, url: str, resolved: str, endpoint: str, status: int, latency: float, response: Dict[str, Any]) -> None:
+        doc = {
+            "platform": platform,
+            "url": url,
+            "resolved": resolved,
+            "endpoint": endpoint,
+            "status": status,
+            "latency": round(latency, 4),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "response": sanitize(response, self.secrets),
+        }
+        try:
+            # Large YouTube responses take a while to serialize; keep it off the loop
+            await asyncio.to_thread(self._write, platform, url, doc)
+        except OSError:
+            logging.getLogger("bot").warning("record_failed platform=%s url=%s", platform, url, exc_info=True)
+            return
+        self.recorded += 1
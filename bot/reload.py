@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import fields
+from typing import List
+
+from .config import Settings, load_settings
+from .context import BotContext
+
+
+def reload_config(ctx: BotContext) -> List[str]:
+    """Re-read config.yml, validate it and swap the settings atomically.
+
+    Returns the names of the settings that changed. Raises ConfigError and
+    keeps the current settings when the file is invalid. Work already
+    running keeps the settings it started with.
+    """
+    new = load_settings(strict=True)
+    old = ctx.settings
+    changed = [f.name for f in fields(Settings) if getattr(old, f.name) != getattr(new, f.name)]
+    ctx.swap_settings(new)
+    logging.getLogger("bot").info("config_reloaded changed=%s", ",".join(changed) or "-")
+    return changed
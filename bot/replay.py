@@ -0,0 +1,172 @@
+"""Replay recorded downloader API responses offline.
+
+Record a corpus by running the bot with ``DOWNLOADER_RECORD_DIR`` set, then:
+
+    python -m bot.replay serve data/corpus --port 8765 [--speed 1.0]
+    python -m bot.replay check data/corpus
+    python -m bot.replay bench data/corpus [--concurrency 16] [--rounds 3] [--speed 0]
+
+``serve`` answers like the downloader API (any path, the link in any query
+parameter) with the recorded body and latency. ``check`` runs every
+response through the processors' mappers and ``normalize_result`` and exits
+non-zero on failures. ``bench`` starts the replay server in-process and
+drives the full resolve pipeline against it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from .recorder import Recording, load_corpus
+
+
+def _index(corpus: List[Recording]) -> Dict[str, Recording]:
+    index: Dict[str, Recording] = {}
+    for rec in corpus:
+        index[rec.url] = rec
+        index[rec.resolved] = rec
+    return index
+
+
+def build_server(corpus: List[Recording], speed: float = 1.0) -> web.Application:
+    """aiohttp app serving ``corpus``; ``speed`` divides recorded latencies (0 = none)."""
+    index = _index(corpus)
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        rec = next((index[v] for v in request.query.values() if v in index), None)
+        if rec is None:
+            return web.json_response({"success": False, "message": "not in replay corpus"}, status=404)
+        if speed > 0 and rec.latency > 0:
+            await asyncio.sleep(rec.latency / speed)
+        return web.Response(body=json.dumps(rec.response, ensure_ascii=False).encode("utf-8"), status=rec.status, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_route("GET", "/{tail:.*}", handle)
+    return app
+
+
+def check(corpus: List[Recording]) -> int:
+    """Normalize every recording offline; returns the number of failures."""
+    import handlers  # noqa: F401
+    from processors.registry import get_processor, normalize_response
+
+    failures = 0
+    total = 0.0
+    for rec in corpus:
+        started = time.perf_counter()
+        try:
+            result = normalize_response(get_processor(rec.platform), rec.response, platform=rec.platform, url=rec.url)
+            status = f"{len(result['medias'])} medias" if result["medias"] else "NO MEDIAS"
+            failures += 0 if result["medias"] else 1
+        except Exception as e:
+            status = f"ERROR {e.__class__.__name__}: {e}"
+            failures += 1
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        size = len(json.dumps(rec.response))
+        print(f"{rec.platform:10} {size / 1024:8.1f} KiB {elapsed * 1000:7.2f} ms  {status}  {rec.path}")
+    print(f"\n{len(corpus)} recordings, {failures} failed, {total * 1000:.1f} ms total")
+    return failures
+
+
+async def bench(corpus: List[Recording], *, concurrency: int, rounds: int, speed: float) -> None:
+    """Resolve every recorded link through the full pipeline against a local replay server."""
+    # Import order matters: the processors registry depends on handlers
+    import handlers  # noqa: F401
+    from processors.registry import resolve, stats_snapshot
+
+    from .config import load_settings
+    from .context import BotContext
+    from .pipelines import PipelineSettings
+    from .state import CallbackStore, UserSemaphores
+
+    runner = web.AppRunner(build_server(corpus, speed))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    base = f"http://127.0.0.1:{port}/downloader"
+
+    settings = load_settings()
+    pipeline = PipelineSettings(connect_timeout=5, read_timeout=30, total_timeout=60, retries=1, resolve_redirects=False)
+    settings = replace(settings, downloader_api_base_url=base, downloader_api_key=None, endpoints_per_platform={}, pipelines={"default": pipeline})
+    ctx = BotContext(settings=settings, callbacks=CallbackStore(), semaphores=UserSemaphores(concurrency), started_at=time.time())
+    ctx.http.open()
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(rec: Recording) -> None:
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            try:
+                await resolve(ctx, platform=rec.platform, url=rec.url, req_id=uuid.uuid4().hex[:12], user_id=0)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            await asyncio.gather(*(one(rec) for rec in corpus))
+    finally:
+        await ctx.http.close()
+        await runner.cleanup()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+    print(
+        f"requests={len(latencies)} errors={errors} elapsed={elapsed:.2f}s rps={len(latencies) / elapsed:.1f} "
+        f"p50={pct(0.5):.1f}ms p95={pct(0.95):.1f}ms p99={pct(0.99):.1f}ms"
+    )
+    for name, st in stats_snapshot().items():
+        print(f"  {name:10} requests={st['requests']} failures={st['failures']} avg={st['avg_latency'] * 1000:.1f}ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bot.replay", description="Replay recorded downloader API responses")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="serve the corpus as a fake downloader API")
+    p_serve.add_argument("corpus")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_serve.add_argument("--speed", type=float, default=1.0, help="latency divisor, 0 disables recorded latency")
+    p_check = sub.add_parser("check", help="normalize every recording offline")
+    p_check.add_argument("corpus")
+    p_bench = sub.add_parser("bench", help="benchmark the resolve pipeline against the corpus")
+    p_bench.add_argument("corpus")
+    p_bench.add_argument("--concurrency", type=int, default=16)
+    p_bench.add_argument("--rounds", type=int, default=3)
+    p_bench.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"no recordings under {args.corpus}", file=sys.stderr)
+        return 1
+    if args.command == "serve":
+        print(f"serving {len(corpus)} recordings on http://{args.host}:{args.port}/")
+        web.run_app(build_server(corpus, args.speed), host=args.host, port=args.port, print=None)
+        return 0
+    if args.command == "check":
+        return 1 if check(corpus) else 0
+    asyncio.run(bench(corpus, concurrency=args.concurrency, rounds=args.rounds, speed=args.speed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Send priorities, lowest value goes first
+RESULT = 0
+MESSAGE = 1
+COSMETIC = 2
+PRIORITY_NAMES = ("result", "message", "cosmetic")
+
+# Endpoints that deliver a download result to the user
+_RESULT_ENDPOINTS = frozenset(
+    {"sendVideo", "sendPhoto", "sendMediaGroup", "sendDocument", "sendAudio", "sendAnimation", "sendVoice", "sendVideoNote"}
+)
+# Progress edits, reactions and typing indicators: delayed first, coalesced
+_COSMETIC_ENDPOINTS = frozenset(
+    {"editMessageText", "editMessageCaption", "editMessageReplyMarkup", "setMessageReaction", "sendChatAction"}
+)
+_MESSAGE_ENDPOINTS = frozenset({"sendMessage", "copyMessage", "forwardMessage", "editMessageMedia", "sendPoll", "sendLocation"})
+
+ChatKey = Union[int, str]
+
+
+@dataclass(frozen=True)
+class SendLimits:
+    """Telegram's documented bot message rates."""
+
+    global_per_second: float = 30.0
+    chat_per_second: float = 1.0
+    chat_burst: int = 5
+    group_per_minute: float = 20.0
+    group_burst: int = 5
+    max_retries: int = 3
+
+
+def priority_of(endpoint: str) -> Optional[int]:
+    """Scheduling priority of ``endpoint``, or None if it is not a message send."""
+    if endpoint in _RESULT_ENDPOINTS:
+        return RESULT
+    if endpoint in _COSMETIC_ENDPOINTS:
+        return COSMETIC
+    if endpoint in _MESSAGE_ENDPOINTS:
+        return MESSAGE
+    return None
+
+
+def _is_group(chat_id: ChatKey) -> bool:
+    # Group and channel ids are negative; "@username" targets are channels
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+class _Gcra:
+    """Token bucket kept as the time it is full again, one float per key."""
+
+    def __init__(self) -> None:
+        self.full_at: Dict[Any, float] = {}
+
+    def wait(self, key: Any, interval: float, burst: int, cost: int, now: float) -> float:
+        full_at = max(self.full_at.get(key, now), now)
+        return max(0.0, full_at + (cost - burst) * interval - now)
+
+    def take(self, key: Any, interval: float, cost: int, now: float) -> None:
+        self.full_at[key] = max(self.full_at.get(key, now), now) + cost * interval
+
+    def block(self, key: Any, until: float, burst: int, interval: float) -> None:
+        # Empty the bucket until ``until``: nothing fits before then
+        self.full_at[key] = max(self.full_at.get(key, 0.0), until + (burst - 1) * interval)
+
+    def sweep(self, now: float) -> None:
+        for key in [k for k, t in self.full_at.items() if t <= now]:
+            del self.full_at[key]
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat: Optional[ChatKey] = field(compare=False)
+    cost: int = field(compare=False)
+    coalesce: Optional[Tuple[Any, ...]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    queued_at: float = field(compare=False)
+
+
+class SendScheduler(BaseRateLimiter[Dict[str, Any]]):
+    """Throttles outgoing Bot API messages to stay under Telegram's flood limits.
+
+    Every message send waits for a slot in a per-chat bucket (private chats
+    ``chat_per_second``, groups ``group_per_minute``) and in the global
+    bucket. Waiting sends are granted in priority order: results before
+    plain messages before cosmetic edits, oldest first within a priority.
+    A newer edit of the same message replaces a still-waiting older one, so
+    progress updates never queue up behind each other. If Telegram still
+    answers with ``RetryAfter``, the chat (or everything, for chat-less
+    calls) is held for that long and the send is retried. Other API calls
+    (callback answers, inline answers, file downloads) skip the queue.
+
+    Callers can pass ``rate_limit_args={"priority": RESULT}`` to override
+    the endpoint's default priority.
+    """
+
+    def __init__(self, limits: Optional[SendLimits] = None) -> None:
+        self.limits = limits or SendLimits()
+        self._global = _Gcra()
+        self._chats = _Gcra()
+        self._pending: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep = time.monotonic()
+        self.sent = 0
+        self.coalesced = 0
+        self.retry_afters = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.sent_by_priority = [0, 0, 0]
+
+    async def initialize(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for waiter in self._pending:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self._pending.clear()
+
+    # -- rates ------------------------------------------------------------------
+
+    def _chat_rate(self, chat: ChatKey) -> Tuple[float, int]:
+        lim = self.limits
+        if _is_group(chat):
+            return 60.0 / lim.group_per_minute, lim.group_burst
+        return 1.0 / lim.chat_per_second, lim.chat_burst
+
+    def _global_rate(self) -> Tuple[float, int]:
+        return 1.0 / self.limits.global_per_second, max(1, int(self.limits.global_per_second))
+
+    # -- dispatcher ---------------------------------------------------------------
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            delay = self._grant(time.monotonic())
+            self._wakeup.clear()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant(self, now: float) -> Optional[float]:
+        """Grant every waiter that fits now; returns seconds until the next may fit."""
+        if now - self._last_sweep > 60:
+            self._last_sweep = now
+            self._global.sweep(now)
+            self._chats.sweep(now)
+        g_interval, g_burst = self._global_rate()
+        delay: Optional[float] = None
+        kept: List[_Waiter] = []
+        for idx, waiter in enumerate(self._pending):
+            if waiter.future.done():
+                continue
+            g_wait = self._global.wait(None, g_interval, g_burst, min(waiter.cost, g_burst), now)
+            if g_wait > 0:
+                # The global bucket is empty: lower priorities must not overtake this one
+                delay = g_wait if delay is None else min(delay, g_wait)
+                kept.extend(w for w in self._pending[idx:] if not w.future.done())
+                break
+            if waiter.chat is not None:
+                interval, burst = self._chat_rate(waiter.chat)
+                # Telegram counts every album item against the chat limit too
+                c_cost = min(waiter.cost, burst)
+                c_wait = self._chats.wait(waiter.chat, interval, burst, c_cost, now)
+                if c_wait > 0:
+                    delay = c_wait if delay is None else min(delay, c_wait)
+                    kept.append(waiter)
+                    continue
+                self._chats.take(waiter.chat, interval, c_cost, now)
+            self._global.take(None, g_interval, min(waiter.cost, g_burst), now)
+            waiter.future.set_result(True)
+        self._pending = kept
+        return delay
+
+    async def _slot(self, chat: Optional[ChatKey], priority: int, cost: int, coalesce: Optional[Tuple[Any, ...]]) -> bool:
+        """Wait for a send slot; False if a newer edit of the same message replaced this one."""
+        loop = asyncio.get_running_loop()
+        if coalesce is not None:
+            for old in self._pending:
+                if old.coalesce == coalesce and not old.future.done():
+                    old.future.set_result(False)
+                    self.coalesced += 1
+        waiter = _Waiter(priority, next(self._seq), chat, cost, coalesce, loop.create_future(), time.monotonic())
+        bisect.insort(self._pending, waiter)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        try:
+            granted = await waiter.future
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        if granted:
+            waited = time.monotonic() - waiter.queued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return granted
+
+    def _hold(self, chat: Optional[ChatKey], seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if chat is None:
+            interval, burst = self._global_rate()
+            self._global.block(None, until, burst, interval)
+        else:
+            interval, burst = self._chat_rate(chat)
+            self._chats.block(chat, until, burst, interval)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # -- BaseRateLimiter --------------------------------------------------------------
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        priority = priority_of(endpoint)
+        if rate_limit_args and "priority" in rate_limit_args:
+            priority = min(COSMETIC, max(RESULT, int(rate_limit_args["priority"])))
+        chat: Optional[ChatKey] = data.get("chat_id")
+        cost = len(data.get("media") or ()) if endpoint == "sendMediaGroup" else 1
+        coalesce = None
+        if endpoint.startswith("edit"):
+            coalesce = (endpoint, chat, data.get("message_id"), data.get("inline_message_id"))
+
+        attempt = 0
+        while True:
+            if priority is not None and self._task is not None:
+                if not await self._slot(chat, priority, max(1, cost), coalesce):
+                    # Superseded edit: Telegram would have shown the newer text anyway
+                    return True
+                self.sent += 1
+                self.sent_by_priority[priority] += 1
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                self.retry_afters += 1
+                wait = e.retry_after if isinstance(e.retry_after, (int, float)) else e.retry_after.total_seconds()
+                logging.getLogger("bot").warning(
+                    "send_retry_after endpoint=%s chat=%s retry_after=%ss attempt=%s", endpoint, chat, wait, attempt
+                )
+                if attempt > self.limits.max_retries:
+                    raise
+                self._hold(chat, float(wait))
+                if priority is None or self._task is None:
+                    await asyncio.sleep(float(wait))
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued = [0, 0, 0]
+        for waiter in self._pending:
+            if not waiter.future.done():
+                queued[waiter.priority] += 1
+        return {
+            "queued": dict(zip(PRIORITY_NAMES, queued)),
+            "sent": self.sent,
+            "sent_by_priority": dict(zip(PRIORITY_NAMES, self.sent_by_priority)),
+            "coalesced": self.coalesced,
+            "retry_afters": self.retry_afters,
+            "avg_wait": self.total_wait / self.sent if self.sent else 0.0,
+            "max_wait": self.max_wait,
+        }
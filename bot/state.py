@@ -3,8 +3,9 @@ from __future__ import annotations
 import asyncio
 import time
 import uuid
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -16,6 +17,27 @@ class AudioTask:
     filename_hint: str
     created_at: float
     in_progress: bool = False
+    content_key: Optional[str] = None
+
+
+@dataclass
+class CarouselState:
+    """Images of a carousel not yet sent; ``next_index`` is the first unsent one."""
+
+    user_id: int
+    chat_id: int
+    platform: str
+    medias: List[Any]
+    author: Optional[str]
+    title: Optional[str]
+    content_key: Optional[str]
+    next_index: int
+    created_at: float
+    in_progress: bool = False
+
+    @property
+    def remaining(self) -> int:
+        return max(0, len(self.medias) - self.next_index)
 
 
 class UserSemaphores:
@@ -23,6 +45,15 @@ class UserSemaphores:
         self.per_user_limit = per_user_limit
         self._semaphores: Dict[int, asyncio.Semaphore] = {}
 
+    def __len__(self) -> int:
+        return len(self._semaphores)
+
+    def resize(self, per_user_limit: int) -> None:
+        # Holders release the semaphore they acquired; new work gets the new limit
+        if per_user_limit != self.per_user_limit:
+            self.per_user_limit = per_user_limit
+            self._semaphores = {}
+
     def for_user(self, user_id: int) -> asyncio.Semaphore:
         if user_id not in self._semaphores:
             self._semaphores[user_id] = asyncio.Semaphore(self.per_user_limit)
@@ -33,7 +64,10 @@ class CallbackStore:
     def __init__(self) -> None:
         self._store: Dict[str, AudioTask] = {}
 
-    def new_audio_token(self, *, user_id: int, chat_id: int, message_id: int, media_url: str, filename_hint: str) -> str:
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def new_audio_token(self, *, user_id: int, chat_id: int, message_id: int, media_url: str, filename_hint: str, content_key: Optional[str] = None) -> str:
         token = uuid.uuid4().hex[:24]
         self._store[token] = AudioTask(
             user_id=user_id,
@@ -42,6 +76,7 @@ class CallbackStore:
             media_url=media_url,
             filename_hint=filename_hint,
             created_at=time.time(),
+            content_key=content_key,
         )
         return token
 
@@ -65,3 +100,149 @@ class CallbackStore:
     def complete(self, token: str) -> None:
         self._store.pop(token, None)
 
+
+class CarouselStore:
+    """Pending carousel pages behind "more" buttons, expired after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = 1800.0, max_entries: int = 2000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._store: "OrderedDict[str, CarouselState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def new_token(self, state: CarouselState) -> str:
+        token = uuid.uuid4().hex[:24]
+        self._store[token] = state
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Optional[CarouselState]:
+        state = self._store.get(token)
+        if state and time.time() - state.created_at > self.ttl:
+            self._store.pop(token, None)
+            return None
+        return state
+
+    def complete(self, token: str) -> None:
+        self._store.pop(token, None)
+
+
+class ResultCache:
+    """Short-lived LRU of normalized results keyed by canonical content key.
+
+    Concurrent lookups for the same key share one upstream call
+    (single-flight); failures are not cached.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 1000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._store: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._store.get(key)
+        if not entry:
+            return None
+        stored_at, result = entry
+        if time.time() - stored_at > self.ttl:
+            self._store.pop(key, None)
+            return None
+        self._store.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._store[key] = (time.time(), result)
+        self._store.move_to_end(key)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+
+    async def get_or_resolve(self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            # Mark retrieved so an unawaited failure does not warn
+            fut.exception()
+            raise
+        else:
+            self.put(key, result)
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+
+class FileIdCache:
+    """Telegram file_ids of media already sent, keyed by canonical content key."""
+
+    def __init__(self, max_entries: int = 5000) -> None:
+        self.max_entries = max_entries
+        self._store: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def add(self, key: Optional[str], kind: str, file_id: str) -> None:
+        if not key or not file_id:
+            return
+        entries = self._store.setdefault(key, [])
+        if (kind, file_id) not in entries:
+            entries.append((kind, file_id))
+        self._store.move_to_end(key)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+
+    def get(self, key: str) -> List[Tuple[str, str]]:
+        entries = self._store.get(key)
+        if entries is None:
+            return []
+        self._store.move_to_end(key)
+        return list(entries)
+
+
+class ReactionCache:
+    """Per-chat allowed reaction emojis, so each message needs a single call.
+
+    ``None`` means every emoji is allowed (private chats, or groups without a
+    restriction); an empty tuple means reactions are off for the chat.
+    """
+
+    def __init__(self, ttl: float = 3600.0) -> None:
+        self.ttl = ttl
+        self._store: Dict[int, Tuple[float, Optional[Tuple[str, ...]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def get(self, chat_id: int) -> Tuple[bool, Optional[Tuple[str, ...]]]:
+        """Return ``(known, allowed)``."""
+        entry = self._store.get(chat_id)
+        if not entry or time.time() - entry[0] > self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def put(self, chat_id: int, allowed: Optional[Tuple[str, ...]]) -> None:
+        self._store[chat_id] = (time.time(), allowed)
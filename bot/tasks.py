@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Coroutine, Optional, Set
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def spawn_background(coro: Coroutine[Any, Any, Any], *, name: Optional[str] = None) -> asyncio.Task:
+    """Run a coroutine without awaiting it, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
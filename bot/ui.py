@@ -5,27 +5,31 @@ from typing import Any, List
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from .context import BotContext
-from .media_utils import iter_medias, is_audio
+from .media_utils import AUDIO, iter_medias
 
 
-def build_summary_keyboard(ctx: BotContext, result: dict, *, user_id: int, chat_id: int, message_id: int | None = None) -> InlineKeyboardMarkup | None:
+def build_summary_keyboard(ctx: BotContext, result: dict, *, user_id: int, chat_id: int, key: str | None, message_id: int | None = None) -> InlineKeyboardMarkup | None:
+    """``key`` is the content key of the link the user sent (see ``send_result_flow``)."""
     buttons: List[List[InlineKeyboardButton]] = []
     seen_audio_urls = set()
     # audio-only buttons (per requirements)
     for idx, m in iter_medias(result):
-        url = m.get("url") or m.get("download_url") or ""
-        ext = (m.get("extension") or m.get("ext") or "").lower()
+        url = m.url
+        ext = m.extension or ""
         if not url or url in seen_audio_urls:
             continue
-        if is_audio(m) or ext == "mp3":
+        if m.kind == AUDIO or ext == "mp3":
             seen_audio_urls.add(url)
             token = ctx.callbacks.new_audio_token(
                 user_id=user_id,
                 chat_id=chat_id,
                 message_id=message_id or -1,
                 media_url=url,
-                filename_hint=m.get("filename") or f"audio_{idx}.{ext or 'mp3'}",
+                filename_hint=m.filename or f"audio_{idx}.{ext or 'mp3'}",
+                content_key=key,
             )
+            if ctx.prefetch is not None:
+                ctx.prefetch.offer(ctx, token, url, m.data_size)
             buttons.append([
                 InlineKeyboardButton(text="Download MP3", callback_data=f"mp3:{token}"),
                 InlineKeyboardButton(text="Buka di Browser", url=url),
@@ -44,7 +48,10 @@ def build_summary_keyboard(ctx: BotContext, result: dict, *, user_id: int, chat_
             message_id=message_id or -1,
             media_url=top_mp3,
             filename_hint="audio.mp3",
+            content_key=key,
         )
+        if ctx.prefetch is not None:
+            ctx.prefetch.offer(ctx, token, top_mp3)
         buttons.append([
             InlineKeyboardButton(text="Download MP3", callback_data=f"mp3:{token}"),
             InlineKeyboardButton(text="Buka di Browser", url=top_mp3),
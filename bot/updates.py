@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import MessageEntity, Update
+from telegram.ext import BaseUpdateProcessor
+
+# Releases the running update's chat lock; set by ChatOrderedUpdateProcessor
+_release_chat: ContextVar[Optional[Callable[[], None]]] = ContextVar("release_chat", default=None)
+
+
+def release_chat_order() -> None:
+    """Let the chat's next update start; a no-op outside an ordered update.
+
+    Link handlers call this once their links are queued: from then on the
+    queue position keeps the order, and the download itself must not hold
+    up the rest of the chat.
+    """
+    release = _release_chat.get()
+    if release is not None:
+        release()
+
+
+@dataclass
+class UpdateStats:
+    processed: int = 0
+    failed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_run: float = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        n = self.processed or 1
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait": self.total_wait / n,
+            "max_wait": self.max_wait,
+            "avg_run": self.total_run / n,
+        }
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Run updates concurrently while keeping each chat's messages in order.
+
+    ``concurrency`` bounds how many handlers run at once. The intake of
+    messages from the same chat is serialized: the chat lock is held until
+    the handler calls ``release_chat_order`` (once its links are queued) or
+    returns, so links are queued in the order the user sent them while the
+    downloads run concurrently. A chat waiting for its turn does not hold
+    one of the running slots. Commands, callback and inline queries are not
+    tied to a chat's message order and skip the per-chat lock. ``backlog``
+    (PTB's own semaphore) caps how many updates may be held in memory,
+    running or waiting.
+    """
+
+    def __init__(self, concurrency: int = 64, backlog: int = 512) -> None:
+        super().__init__(max(backlog, concurrency, 1))
+        self.concurrency = max(1, concurrency)
+        self._running = asyncio.BoundedSemaphore(self.concurrency)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_refs: Dict[int, int] = {}
+        self.active = 0
+        self.waiting = 0
+        self.stats = UpdateStats()
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+        if update.callback_query or update.inline_query or update.chosen_inline_result:
+            return None
+        message = update.effective_message
+        if message is not None:
+            entities = message.entities or message.caption_entities
+            if entities and entities[0].type == MessageEntity.BOT_COMMAND and entities[0].offset == 0:
+                # /start, /runtime, /batch ...: answered right away, not behind downloads
+                return None
+        chat = update.effective_chat
+        return chat.id if chat else None
+
+    def _acquire_lock(self, key: int) -> asyncio.Lock:
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_refs[key] = self._chat_refs.get(key, 0) + 1
+        return lock
+
+    def _release_lock(self, key: int) -> None:
+        refs = self._chat_refs.get(key, 1) - 1
+        if refs > 0:
+            self._chat_refs[key] = refs
+        else:
+            self._chat_refs.pop(key, None)
+            self._chat_locks.pop(key, None)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued_at = time.monotonic()
+        key = self._chat_key(update)
+        lock = self._acquire_lock(key) if key is not None else None
+        self.waiting += 1
+        waiting = True
+        locked = False
+
+        def _release() -> None:
+            nonlocal locked
+            if locked:
+                locked = False
+                lock.release()
+
+        try:
+            if lock is not None:
+                await lock.acquire()
+                locked = True
+                _release_chat.set(_release)
+            try:
+                async with self._running:
+                    wait = time.monotonic() - queued_at
+                    self.waiting -= 1
+                    waiting = False
+                    self.active += 1
+                    started = time.monotonic()
+                    try:
+                        await coroutine
+                    except Exception:
+                        self.stats.failed += 1
+                        raise
+                    finally:
+                        self.active -= 1
+                        st = self.stats
+                        st.processed += 1
+                        st.total_wait += wait
+                        st.max_wait = max(st.max_wait, wait)
+                        st.total_run += time.monotonic() - started
+            finally:
+                _release()
+        except asyncio.CancelledError:
+            # Never started (shutdown while queued): avoid "never awaited" warnings
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            raise
+        finally:
+            if waiting:
+                self.waiting -= 1
+            if key is not None:
+                self._release_lock(key)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def snapshot(self) -> Dict[str, float]:
+        data = self.stats.snapshot()
+        data.update(
+            {
+                "concurrency": self.concurrency,
+                "active": self.active,
+                "waiting": self.waiting,
+                "chats": len(self._chat_locks),
+            }
+        )
+        return data
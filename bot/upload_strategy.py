@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# How a video is delivered first
+URL = "url"  # let Telegram fetch the URL
+BYTES = "bytes"  # download and upload the bytes ourselves
+HEDGE = "hedge"  # try the URL while the bytes are prefetched in the background
+
+# Size buckets (upper bounds); Telegram fetches URLs up to 20 MB for videos
+_BUCKETS = ((5 * 1024 * 1024, "<5M"), (20 * 1024 * 1024, "<20M"), (50 * 1024 * 1024, "<50M"))
+
+
+def host_key(url: str) -> str:
+    """Registrable part of the media host, so CDN edge nodes share one entry.
+
+    ``scontent-sin6-1.cdninstagram.com`` and ``scontent-cgk1-1.cdninstagram.com``
+    both map to ``cdninstagram.com``; two-letter country TLDs keep a short
+    second level (``example.co.id``).
+    """
+    host = (urlparse(url).hostname or "").lower()
+    labels = host.split(".")
+    keep = 3 if len(labels) >= 3 and len(labels[-1]) == 2 and len(labels[-2]) <= 3 else 2
+    return ".".join(labels[-keep:])
+
+
+def size_bucket(size: Optional[int]) -> str:
+    if not size:
+        return "?"
+    for limit, name in _BUCKETS:
+        if size < limit:
+            return name
+    return ">50M"
+
+
+@dataclass
+class _Outcomes:
+    ok: float = 0.0
+    failed: float = 0.0
+    updated: float = 0.0
+
+    def decay(self, now: float, half_life: float) -> None:
+        if self.updated and half_life > 0:
+            factor = 0.5 ** ((now - self.updated) / half_life)
+            self.ok *= factor
+            self.failed *= factor
+        self.updated = now
+
+
+class UploadStrategy:
+    """Learns, per media host and size bucket, whether Telegram can fetch a
+    video URL, and picks how to deliver the next one.
+
+    Outcomes decay with ``half_life`` seconds so hosts that start (or stop)
+    blocking Telegram are re-learned. Without enough evidence the URL is
+    tried first; a mostly failing host goes straight to the byte upload and
+    an unclear one hedges by prefetching the bytes during the URL attempt.
+    """
+
+    def __init__(self, *, half_life: float = 6 * 3600, min_evidence: float = 2.0, fail_below: float = 0.2, trust_above: float = 0.8, max_entries: int = 2000) -> None:
+        self.half_life = half_life
+        self.min_evidence = min_evidence
+        self.fail_below = fail_below
+        self.trust_above = trust_above
+        self.max_entries = max_entries
+        self.decisions: Dict[str, int] = {URL: 0, BYTES: 0, HEDGE: 0}
+        self.hedges_used = 0
+        self._store: "OrderedDict[Tuple[str, str], _Outcomes]" = OrderedDict()
+
+    def _entry(self, url: str, size: Optional[int], now: float) -> _Outcomes:
+        key = (host_key(url), size_bucket(size))
+        entry = self._store.get(key)
+        if entry is None:
+            entry = self._store[key] = _Outcomes()
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+        self._store.move_to_end(key)
+        entry.decay(now, self.half_life)
+        return entry
+
+    def success_rate(self, url: str, size: Optional[int]) -> Tuple[float, float]:
+        """``(rate, evidence)``: decayed URL-send success share and sample weight."""
+        entry = self._entry(url, size, time.time())
+        seen = entry.ok + entry.failed
+        return (entry.ok / seen if seen else 1.0), seen
+
+    def choose(self, url: str, size: Optional[int]) -> str:
+        rate, seen = self.success_rate(url, size)
+        if seen < self.min_evidence or rate >= self.trust_above:
+            choice = URL
+        elif rate <= self.fail_below:
+            choice = BYTES
+        else:
+            choice = HEDGE
+        self.decisions[choice] += 1
+        return choice
+
+    def record(self, url: str, size: Optional[int], ok: bool) -> None:
+        entry = self._entry(url, size, time.time())
+        if ok:
+            entry.ok += 1
+        else:
+            entry.failed += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        now = time.time()
+        blocked = []
+        for (host, bucket), entry in self._store.items():
+            entry.decay(now, self.half_life)
+            seen = entry.ok + entry.failed
+            if seen >= self.min_evidence and entry.ok / seen <= self.fail_below:
+                blocked.append(f"{host} {bucket}")
+        return {
+            "hosts": len(self._store),
+            "decisions": dict(self.decisions),
+            "hedges_used": self.hedges_used,
+            "blocked": blocked,
+        }
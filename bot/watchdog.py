@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds; the last bucket is open-ended
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Frames under this directory are attributed as "our" code in stall reports
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Request each task is serving. Written only on the loop thread; the watchdog
+# thread does single lookups, never reading the live frames' locals.
+_task_requests: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+
+def bind_request(req_id: Optional[str]) -> None:
+    """Attribute loop stalls in the current task to ``req_id`` (None clears it)."""
+    task = asyncio.current_task()
+    if task is None:
+        return
+    if req_id:
+        _task_requests[task] = req_id
+    else:
+        _task_requests.pop(task, None)
+
+
+def _site_of(frames: List) -> str:
+    """Innermost frame in this repository, else the innermost frame overall."""
+    for frame in reversed(frames):
+        if frame.f_code.co_filename.startswith(_REPO_ROOT):
+            return f"{os.path.relpath(frame.f_code.co_filename, _REPO_ROOT)}:{frame.f_lineno} {frame.f_code.co_name}"
+    if frames:
+        frame = frames[-1]
+        return f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}"
+    return "?"
+
+
+class LoopWatchdog:
+    """Measures event loop scheduling lag and catches the code that blocks it.
+
+    A heartbeat task sleeps ``interval`` and records how late it woke up in
+    a histogram. A helper thread watches the heartbeat; once it is overdue
+    by ``threshold`` the loop thread's stack is captured while it is still
+    blocked, and logged with the ``req_id`` bound to the running task
+    (``bind_request``) when the loop comes back.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05, log_every: float = 10.0) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        # Minimum seconds between two logged stacks of the same site
+        self.log_every = log_every
+        self.buckets: List[int] = [0] * (len(LAG_BUCKETS) + 1)
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.recent_lag = 0.0
+        self.stalls = 0
+        self.sites: Counter = Counter()
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._captured: Optional[Tuple[str, Optional[str], str]] = None
+        self._logged: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._loop = asyncio.get_running_loop()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    # -- loop side --------------------------------------------------------------
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self.record(max(0.0, now - started - self.interval))
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.recent_lag = 0.8 * self.recent_lag + 0.2 * lag
+        self.buckets[bisect.bisect_left(LAG_BUCKETS, lag)] += 1
+        if lag < self.threshold:
+            return
+        self.stalls += 1
+        captured, self._captured = self._captured, None
+        if captured is None:
+            # Stalled between two watchdog checks; nothing was captured
+            logging.getLogger("bot").warning("loop_stall lag_ms=%.0f site=? req_id=-", lag * 1000)
+            return
+        site, req_id, stack = captured
+        self.sites[site] += 1
+        now = time.monotonic()
+        if now - self._logged.get(site, 0.0) < self.log_every:
+            logging.getLogger("bot").warning("loop_stall lag_ms=%.0f site=%s req_id=%s", lag * 1000, site, req_id or "-")
+            return
+        self._logged[site] = now
+        logging.getLogger("bot").warning("loop_stall lag_ms=%.0f site=%s req_id=%s\n%s", lag * 1000, site, req_id or "-", stack)
+
+    # -- watchdog thread --------------------------------------------------------------
+
+    def _watch(self) -> None:
+        armed = True
+        while not self._stop.wait(self.interval / 2):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold:
+                armed = True
+                continue
+            if not armed:
+                continue
+            # One capture per stall, taken while the loop is still blocked
+            armed = False
+            frame = sys._current_frames().get(self._loop_thread or 0)
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            stack = "".join(traceback.format_list(traceback.StackSummary.extract((f, f.f_lineno) for f in frames)))
+            self._captured = (_site_of(frames), self._blocked_request(), stack)
+
+    def _blocked_request(self) -> Optional[str]:
+        if self._loop is None:
+            return None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            return None
+        return _task_requests.get(task) if task is not None else None
+
+    def snapshot(self) -> Dict[str, object]:
+        def quantile(q: float) -> float:
+            if not self.samples:
+                return 0.0
+            rank, seen = q * self.samples, 0
+            for idx, count in enumerate(self.buckets):
+                seen += count
+                if seen >= rank:
+                    return LAG_BUCKETS[idx] if idx < len(LAG_BUCKETS) else self.max_lag
+            return self.max_lag
+
+        labels = [f"<={b * 1000:g}ms" for b in LAG_BUCKETS] + [f">{LAG_BUCKETS[-1] * 1000:g}ms"]
+        return {
+            "samples": self.samples,
+            "avg": self.total_lag / self.samples if self.samples else 0.0,
+            "p50": quantile(0.5),
+            "p99": quantile(0.99),
+            "max": self.max_lag,
+            "recent": self.recent_lag,
+            "stalls": self.stalls,
+            "histogram": dict(zip(labels, self.buckets)),
+            "sites": self.sites.most_common(5),
+        }
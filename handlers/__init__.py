@@ -4,16 +4,27 @@ from telegram.ext import Application
 
 from bot.context import BotContext
 from .start import start_handler
-from .callbacks import mp3_callback_handler
+from .admin import memsnap_command_handler, profile_command_handler, reload_command_handler, tasks_command_handler
+from .batch import batch_command_handler, batch_document_handler
+from .callbacks import more_callback_handler, mp3_callback_handler
 from .text import text_handler
+from .inline import inline_query_handler
 from .misc import help_callback_handler, runtime_callback_handler, help_command_handler, runtime_command_handler
 
 
 def register_handlers(app: Application, ctx: BotContext) -> None:
-    app.add_handler(start_handler())
-    app.add_handler(help_command_handler())
+    app.add_handler(start_handler(ctx))
+    app.add_handler(help_command_handler(ctx))
     app.add_handler(runtime_command_handler(ctx))
-    app.add_handler(help_callback_handler())
+    app.add_handler(reload_command_handler(ctx))
+    app.add_handler(profile_command_handler(ctx))
+    app.add_handler(memsnap_command_handler(ctx))
+    app.add_handler(tasks_command_handler(ctx))
+    app.add_handler(batch_command_handler(ctx))
+    app.add_handler(batch_document_handler(ctx))
+    app.add_handler(help_callback_handler(ctx))
     app.add_handler(runtime_callback_handler(ctx))
     app.add_handler(mp3_callback_handler(ctx))
+    app.add_handler(more_callback_handler(ctx))
     app.add_handler(text_handler(ctx))
+    app.add_handler(inline_query_handler(ctx))
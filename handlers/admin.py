@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import io
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from bot.config import ConfigError
+from bot.context import BotContext
+from bot.lanes import INTERACTIVE
+from bot.profiling import MemorySnapshots, dump_tasks, profile_loop, profile_running
+from bot.reload import reload_config
+
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 120
+
+_snapshots = MemorySnapshots()
+
+
+def is_admin(ctx: BotContext, update: Update) -> bool:
+    user = update.effective_user
+    return bool(user and user.id in ctx.settings.admin_user_ids)
+
+
+async def _admin_message(ctx: BotContext, update: Update):
+    """The command message when it comes from an admin, else None (after telling the user)."""
+    message = update.effective_message
+    if not message:
+        return None
+    if not is_admin(ctx, update):
+        await message.reply_text("Perintah ini khusus admin.")
+        return None
+    return message
+
+
+async def _reply_report(message, name: str, report: str, caption: str) -> None:
+    doc = io.BytesIO(report.encode("utf-8"))
+    await message.reply_document(document=doc, filename=f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.txt", caption=caption)
+
+
+async def _on_reload(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = await _admin_message(ctx, update)
+    if message is None:
+        return
+    async with ctx.lanes.run(INTERACTIVE):
+        try:
+            changed = reload_config(ctx)
+        except ConfigError as e:
+            logging.getLogger("bot").warning("config_reload_rejected user=%s error=%s", update.effective_user.id, str(e))
+            await message.reply_text(f"❌ config.yml tidak valid, konfigurasi lama tetap dipakai:\n{e}")
+            return
+        if changed:
+            await message.reply_text("✅ Konfigurasi dimuat ulang.\nBerubah: " + ", ".join(changed))
+        else:
+            await message.reply_text("✅ Konfigurasi dimuat ulang, tidak ada perubahan.")
+
+
+def reload_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("reload", lambda u, c: _on_reload(ctx, u, c))
+
+
+async def _on_profile(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = await _admin_message(ctx, update)
+    if message is None:
+        return
+    seconds = PROFILE_DEFAULT_SECONDS
+    if context.args:
+        try:
+            seconds = int(context.args[0])
+        except ValueError:
+            await message.reply_text(f"Pemakaian: /profile [detik], maksimal {PROFILE_MAX_SECONDS}.")
+            return
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    if profile_running():
+        await message.reply_text("Profiling lain sedang berjalan, tunggu sampai selesai.")
+        return
+    await message.reply_text(f"⏱️ Profiling CPU selama {seconds} detik...")
+    # Not in a lane: the profile only sleeps, it must not hold an interactive worker
+    report = await profile_loop(seconds)
+    await _reply_report(message, "profile", report, f"Profil CPU event loop ({seconds} detik)")
+
+
+async def _on_memsnap(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = await _admin_message(ctx, update)
+    if message is None:
+        return
+    async with ctx.lanes.run(INTERACTIVE):
+        if context.args and context.args[0].lower() == "stop":
+            _snapshots.stop()
+            await message.reply_text("tracemalloc dimatikan.")
+            return
+        first = not _snapshots.tracing
+        sizes = {
+            "CallbackStore": len(ctx.callbacks),
+            "UserSemaphores": len(ctx.semaphores),
+            "ResultCache": len(ctx.results),
+            "FileIdCache": len(ctx.file_ids),
+            "ReactionCache": len(ctx.reactions),
+        }
+        report = _snapshots.take(sizes)
+    caption = "Snapshot memori pertama; kirim /memsnap lagi nanti untuk melihat selisihnya. /memsnap stop mematikan tracemalloc."
+    await _reply_report(message, "memsnap", report, caption if first else "Selisih memori sejak snapshot sebelumnya")
+
+
+async def _on_tasks(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = await _admin_message(ctx, update)
+    if message is None:
+        return
+    async with ctx.lanes.run(INTERACTIVE):
+        report = dump_tasks()
+    await _reply_report(message, "tasks", report, "Daftar task asyncio beserta stack-nya")
+
+
+def profile_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("profile", lambda u, c: _on_profile(ctx, u, c))
+
+
+def memsnap_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("memsnap", lambda u, c: _on_memsnap(ctx, u, c))
+
+
+def tasks_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("tasks", lambda u, c: _on_tasks(ctx, u, c))
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
+
+from bot.canonical import extract_supported_urls
+from bot.context import BotContext
+from bot.ratelimit import format_retry
+from bot.sendqueue import MESSAGE
+from handlers.dispatch import admit_links, process_links, rate_tier
+from handlers.text import message_urls
+
+# Edit the progress message at most this often
+_PROGRESS_INTERVAL = 3.0
+
+
+async def _read_document_text(context: ContextTypes.DEFAULT_TYPE, document, max_bytes: int) -> Optional[str]:
+    if document.file_size is not None and document.file_size > max_bytes:
+        return None
+    tg_file = await context.bot.get_file(document.file_id)
+    data = await tg_file.download_as_bytearray()
+    if len(data) > max_bytes:
+        return None
+    return bytes(data).decode("utf-8", errors="replace")
+
+
+async def _collect_urls(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[List[str]]:
+    message = update.effective_message
+    urls = message_urls(message)
+    for source in (message, message.reply_to_message):
+        if source is None:
+            continue
+        if source.document:
+            text = await _read_document_text(context, source.document, ctx.settings.batch_max_file_bytes)
+            if text is None:
+                return None
+            urls.extend(extract_supported_urls(text))
+        elif source is message.reply_to_message:
+            urls.extend(message_urls(source))
+    # Drop duplicates across sources while keeping order
+    return extract_supported_urls("", urls)
+
+
+async def _on_batch(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    message = update.effective_message
+    if not message:
+        return
+    logger = logging.getLogger("bot")
+    s = ctx.settings
+
+    urls = await _collect_urls(ctx, update, context)
+    if urls is None:
+        await message.reply_text(f"File terlalu besar. Maksimal {s.batch_max_file_bytes // 1024} KB.")
+        return
+    if not urls:
+        await message.reply_text(
+            "Kirim /batch diikuti daftar URL, balas sebuah file .txt berisi URL dengan /batch, "
+            "atau kirim file .txt dengan caption /batch."
+        )
+        return
+
+    skipped = max(0, len(urls) - s.batch_max_urls)
+    urls = urls[: s.batch_max_urls]
+    user_id = message.from_user.id if message.from_user else 0
+    # Every URL pays its own rate token. Those over the user's budget are
+    # not dropped: they are queued one by one as the bucket refills.
+    allowed, _ = admit_links(ctx, user_id, len(urls))
+    deferred = len(urls) - allowed
+    logger.info("batch_start user=%s urls=%s skipped=%s deferred=%s", user_id, len(urls), skipped, deferred)
+
+    started = time.monotonic()
+    last_edit = started
+    intro = f"Memproses batch {len(urls)} link (paralel {s.max_concurrent_per_user})..."
+    tier = rate_tier(ctx, user_id)
+    if deferred and not tier.unlimited:
+        eta = deferred * 60.0 / tier.per_minute
+        intro += f"\n{deferred} link ditunda mengikuti batas kecepatan (selesai masuk antrean dalam ±{format_retry(eta)})."
+    status = await message.reply_text(intro)
+
+    async def _progress(done: int, ok: int, total: int) -> None:
+        nonlocal last_edit
+        now = time.monotonic()
+        if done < total and now - last_edit >= _PROGRESS_INTERVAL:
+            last_edit = now
+            await status.edit_text(f"Memproses batch... {done}/{total} selesai ({ok} berhasil)")
+
+    results = await process_links(ctx, message=message, urls=urls, user_id=user_id, on_progress=_progress, admitted=allowed)
+    ok = sum(results)
+    elapsed = time.monotonic() - started
+    logger.info("batch_done user=%s ok=%s failed=%s elapsed=%.1fs", user_id, ok, len(results) - ok, elapsed)
+
+    lines = [
+        "✅ Batch selesai",
+        f"- Berhasil: {ok}",
+        f"- Gagal: {len(results) - ok}",
+        f"- Total: {len(results)} link dalam {elapsed:.0f} detik",
+    ]
+    if skipped:
+        lines.append(f"- Dilewati: {skipped} (maksimal {s.batch_max_urls} link per batch)")
+    if deferred:
+        lines.append(f"- Ditunda karena batas kecepatan: {deferred}")
+    try:
+        await status.edit_text("\n".join(lines), rate_limit_args={"priority": MESSAGE})
+    except Exception:
+        await message.reply_text("\n".join(lines))
+
+
+def batch_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("batch", lambda u, c: _on_batch(ctx, u, c))
+
+
+def batch_document_handler(ctx: BotContext) -> MessageHandler:
+    # Commands in captions are not seen by CommandHandler
+    return MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/batch(@\w+)?(\s|$)"), lambda u, c: _on_batch(ctx, u, c))
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
-import os
+import logging
+import uuid
 from typing import List
 
-import aiohttp
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 import io
 from bot.context import BotContext
-from bot.downloader_client import DownloaderClient, TooLargeError
+from bot.config import page_size_for
+from bot.downloader_client import TooLargeError
+from bot.lanes import TRANSFER
+from bot.media_cache import download_cached
+from bot.memory import BudgetExhausted, buffer_cost
+from bot.overload import LINKS_ONLY
+from bot.prefetch import audio_client
+from handlers.flow import is_album, remember_sent, send_image_page, send_more_button
+from handlers.utils import build_api
 
 
 async def _on_mp3_callback(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -21,6 +29,7 @@ async def _on_mp3_callback(ctx: BotContext, update: Update, context: ContextType
     if not data.startswith("mp3:"):
         return
     token = data.split(":", 1)[1]
+    ctx = ctx.snapshot()
 
     task = ctx.callbacks.get_audio_task(token)
     if not task:
@@ -51,40 +60,73 @@ async def _on_mp3_callback(ctx: BotContext, update: Update, context: ContextType
 
     await cq.answer("Menyiapkan MP3...", show_alert=False)
 
-    api = DownloaderClient(
-        base_url=os.getenv("DOWNLOADER_API_BASE_URL_AUDIO") or ctx.settings.downloader_api_base_url,
-        api_key=ctx.settings.downloader_api_key,
-        connect_timeout=ctx.settings.http_connect_timeout,
-        read_timeout=ctx.settings.http_read_timeout,
-        total_timeout=ctx.settings.http_total_timeout,
-    )
+    api = audio_client(ctx.settings)
+
+    async def _upload(data_bytes: bytes):
+        bio = io.BytesIO(data_bytes)
+        bio.name = task.filename_hint or "audio.mp3"
+        return await context.bot.send_audio(chat_id=task.chat_id, audio=bio)
 
     try:
-        async with aiohttp.ClientSession() as session:
-            size = await api.head_size(session, task.media_url)
-            if size is not None and size > ctx.settings.max_upload_bytes:
-                await context.bot.send_message(
-                    chat_id=task.chat_id,
-                    text=f"File MP3 terlalu besar untuk diupload ({size} bytes). Gunakan tautan berikut:",
-                    reply_markup=InlineKeyboardMarkup(
-                        [[InlineKeyboardButton(text="Buka di Browser", url=task.media_url)]]
-                    ),
-                )
-            else:
-                try:
-                    data_bytes = await api.download_to_bytes(session, task.media_url, ctx.settings.max_upload_bytes)
-                except TooLargeError as e:
+        # Bytes downloaded speculatively before the click come with their memory reservation
+        prefetched = await ctx.prefetch.take(token) if ctx.prefetch is not None else None
+        if prefetched is not None:
+            try:
+                async with ctx.lanes.run(TRANSFER):
+                    sent = await _upload(prefetched[0])
+            finally:
+                ctx.memory.release(prefetched[1])
+                del prefetched
+            remember_sent(ctx, task.content_key, sent)
+        else:
+            async with ctx.lanes.run(TRANSFER), ctx.http.client() as session:
+                # A cached copy skips both the HEAD probe and the CDN download;
+                # it is only read once its size is reserved
+                cached_size = await ctx.media_cache.size_of(task.media_url) if ctx.media_cache is not None else None
+                if cached_size is None and ctx.overload.links_only:
+                    # Overloaded: hand out the link instead of downloading and re-uploading
+                    ctx.overload.count_shed(LINKS_ONLY)
                     await context.bot.send_message(
                         chat_id=task.chat_id,
-                        text=f"File MP3 terlalu besar untuk diupload ({e.size} bytes). Tautan dikirim.",
+                        text="Server sedang sibuk. Gunakan tautan berikut untuk mengunduh MP3:",
                         reply_markup=InlineKeyboardMarkup(
                             [[InlineKeyboardButton(text="Buka di Browser", url=task.media_url)]]
                         ),
                     )
                 else:
-                    bio = io.BytesIO(data_bytes)
-                    bio.name = task.filename_hint or "audio.mp3"
-                    await context.bot.send_audio(chat_id=task.chat_id, audio=bio)
+                    size = cached_size if cached_size is not None else await api.head_size(session, task.media_url)
+                    if size is not None and size > ctx.settings.max_upload_bytes:
+                        await context.bot.send_message(
+                            chat_id=task.chat_id,
+                            text=f"File MP3 terlalu besar untuk diupload ({size} bytes). Gunakan tautan berikut:",
+                            reply_markup=InlineKeyboardMarkup(
+                                [[InlineKeyboardButton(text="Buka di Browser", url=task.media_url)]]
+                            ),
+                        )
+                    else:
+                        try:
+                            async with ctx.memory.reserve(buffer_cost(size, ctx.settings.max_upload_bytes)):
+                                data_bytes = await download_cached(ctx.media_cache, api, session, task.media_url, ctx.settings.max_upload_bytes, lookup=cached_size is not None)
+                                sent = await _upload(data_bytes)
+                                del data_bytes
+                        except TooLargeError as e:
+                            await context.bot.send_message(
+                                chat_id=task.chat_id,
+                                text=f"File MP3 terlalu besar untuk diupload ({e.size} bytes). Tautan dikirim.",
+                                reply_markup=InlineKeyboardMarkup(
+                                    [[InlineKeyboardButton(text="Buka di Browser", url=task.media_url)]]
+                                ),
+                            )
+                        except BudgetExhausted:
+                            await context.bot.send_message(
+                                chat_id=task.chat_id,
+                                text="Server sedang sibuk memproses banyak file. Gunakan tautan berikut:",
+                                reply_markup=InlineKeyboardMarkup(
+                                    [[InlineKeyboardButton(text="Buka di Browser", url=task.media_url)]]
+                                ),
+                            )
+                        else:
+                            remember_sent(ctx, task.content_key, sent)
     except Exception:
         await context.bot.send_message(chat_id=task.chat_id, text="Gagal menyiapkan MP3.")
     finally:
@@ -107,6 +149,61 @@ async def _on_mp3_callback(ctx: BotContext, update: Update, context: ContextType
         pass
 
 
+async def _on_more_callback(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cq = update.callback_query
+    if not cq or not cq.message:
+        return
+    token = (cq.data or "").split(":", 1)[1]
+    ctx = ctx.snapshot()
+
+    state = ctx.carousels.get(token)
+    if not state:
+        await cq.answer("Gambar sudah kadaluarsa. Kirim ulang link-nya.", show_alert=False)
+        return
+    if cq.from_user.id != state.user_id:
+        await cq.answer("Tombol ini bukan milik Anda.", show_alert=True)
+        return
+    if state.in_progress:
+        await cq.answer("Sedang mengirim gambar...", show_alert=False)
+        return
+    state.in_progress = True
+    await cq.answer("Mengirim gambar berikutnya...", show_alert=False)
+
+    s = ctx.settings
+    api = build_api(ctx, state.platform)
+    page = page_size_for(s, state.platform) or state.remaining
+    wanted = min(page, state.remaining)
+    req_id = uuid.uuid4().hex[:12]
+    try:
+        sent = await send_image_page(
+            ctx, api, cq.message, state.medias, start=state.next_index, count=page, album=is_album(state.platform, len(state.medias)),
+            author=state.author, title=state.title, key=state.content_key, req_id=req_id, stop_on_failure=True,
+        )
+    except Exception:
+        logging.getLogger("bot").exception("carousel_page_failed id=%s token=%s", req_id, token)
+        sent = 0
+    finally:
+        state.in_progress = False
+    # Only what actually went out is skipped; the button offers the rest again
+    state.next_index += sent
+    if sent < wanted:
+        await cq.message.reply_text("Gagal mengirim sebagian gambar. Tekan tombol untuk mencoba lagi.")
+
+    # Move the prompt below the page just sent, or drop it once everything is out
+    if state.remaining:
+        await send_more_button(cq.message, state, token)
+    else:
+        ctx.carousels.complete(token)
+    try:
+        await cq.message.delete()
+    except Exception:
+        pass
+
+
+def more_callback_handler(ctx: BotContext) -> CallbackQueryHandler:
+    return CallbackQueryHandler(lambda u, c: _on_more_callback(ctx, u, c), pattern=r"^more:")
+
+
 def mp3_callback_handler(ctx: BotContext) -> CallbackQueryHandler:
     return CallbackQueryHandler(lambda u, c: _on_mp3_callback(ctx, u, c), pattern=r"^mp3:")
 
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Chat, Message
+
+from bot.canonical import canonicalize
+from bot.context import BotContext
+from bot.downloader_client import DownloaderError
+from bot.lanes import METADATA
+from bot.link_queue import LinkJob, QueueFull
+from bot.overload import REJECT
+from bot.ratelimit import ADMIN, DEFAULT, TRUSTED, RateTier, format_retry
+from bot.updates import release_chat_order
+from bot.watchdog import bind_request
+from bot.platforms import detect_platform
+from handlers.flow import StatusMessage, reply_text, send_result_flow
+from handlers.utils import build_api
+from processors.registry import get_processor, resolve
+
+
+async def _send_default(ctx: BotContext, *, platform: str, message, result: Dict[str, Any], req_id: str, user_id: int, original_url: str, status: Optional[StatusMessage] = None) -> bool:
+    api = build_api(ctx, platform)
+    return await send_result_flow(ctx, platform=platform, message=message, result=result, req_id=req_id, user_id=user_id, api=api, original_url=original_url, status=status)
+
+
+async def resolve_link(ctx: BotContext, *, url: str, user_id: int, platform: Optional[str] = None, req_id: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch and normalize a link's result, served from the result cache.
+
+    Concurrent requests for the same content share one upstream call.
+    Raises DownloaderError (or anything unexpected) on failure.
+    """
+    platform = platform or detect_platform(url) or "generic"
+    req_id = req_id or uuid.uuid4().hex[:12]
+    c = canonicalize(url)
+    key = c.key if c else f"{platform}:{url}"
+
+    async def _resolve() -> Dict[str, Any]:
+        async with ctx.lanes.run(METADATA):
+            return await resolve(ctx, platform=platform, url=url, req_id=req_id, user_id=user_id)
+
+    return await ctx.results.get_or_resolve(key, _resolve)
+
+
+async def process_link(
+    ctx: BotContext,
+    *,
+    message,
+    url: str,
+    user_id: int,
+    platform: Optional[str] = None,
+    req_id: Optional[str] = None,
+    status: Optional[StatusMessage] = None,
+) -> bool:
+    """Resolve one link and deliver it to the chat under the user's semaphore.
+
+    Returns True when a result was delivered. Upstream failures are answered
+    with an error reply here. With ``status``, text-only replies are edited
+    into that status message.
+    """
+    logger = logging.getLogger("bot")
+    platform = platform or detect_platform(url) or "generic"
+    req_id = req_id or uuid.uuid4().hex[:12]
+    # Finish on the settings this job started with, even across a reload
+    ctx = ctx.snapshot()
+    bind_request(req_id)
+    try:
+        return await _process_link(ctx, logger, message=message, url=url, user_id=user_id, platform=platform, req_id=req_id, status=status)
+    finally:
+        bind_request(None)
+
+
+async def _process_link(ctx: BotContext, logger: logging.Logger, *, message, url: str, user_id: int, platform: str, req_id: str, status: Optional[StatusMessage]) -> bool:
+    async with ctx.semaphores.for_user(user_id):
+        try:
+            result = await resolve_link(ctx, url=url, user_id=user_id, platform=platform, req_id=req_id)
+        except DownloaderError as e:
+            logger.warning("downloader_error id=%s user=%s url=%s error=%s", req_id, user_id, url, str(e))
+            await reply_text(message, status, "Maaf, server downloader sedang sibuk. Coba lagi nanti.")
+            return False
+        except Exception:
+            logger.exception("unexpected_downloader_error id=%s user=%s url=%s", req_id, user_id, url)
+            await reply_text(message, status, "Terjadi kesalahan saat memproses tautan.")
+            return False
+
+        send = get_processor(platform).sender_fn or _send_default
+        try:
+            return bool(await send(ctx, platform=platform, message=message, result=result, req_id=req_id, user_id=user_id, original_url=url, status=status))
+        except Exception:
+            logger.exception("process_link_failed id=%s user=%s url=%s", req_id, user_id, url)
+            return False
+
+
+def _restore_message(bot, job: LinkJob) -> Message:
+    """Minimal stand-in for the user's message of a job recovered after a
+    restart; enough to reply in the right chat and thread."""
+    message = Message(
+        message_id=job.message_id,
+        date=datetime.fromtimestamp(job.created_at, tz=timezone.utc),
+        chat=Chat(id=job.chat_id, type=job.chat_type),
+    )
+    message.set_bot(bot)
+    return message
+
+
+async def run_job(ctx: BotContext, job: LinkJob, *, bot) -> bool:
+    """Queue runner: process one accepted (or recovered) link job."""
+    message = job.message if job.message is not None else _restore_message(bot, job)
+    if job.message is None:
+        logging.getLogger("bot").info("link_job_resumed id=%s job=%s url=%s attempt=%s", job.req_id, job.id, job.url, job.attempts + 1)
+    return await process_link(ctx, message=message, url=job.url, user_id=job.user_id, platform=job.platform, req_id=job.req_id, status=job.status)
+
+
+def rate_tier(ctx: BotContext, user_id: int) -> RateTier:
+    s = ctx.settings
+    if user_id in s.admin_user_ids:
+        name = ADMIN
+    elif user_id in s.trusted_user_ids:
+        name = TRUSTED
+    else:
+        name = DEFAULT
+    return s.rate_tiers.get(name) or s.rate_tiers[DEFAULT]
+
+
+def admit_links(ctx: BotContext, user_id: int, count: int) -> Tuple[int, str]:
+    """Take rate tokens for ``count`` new links.
+
+    Returns how many may run now and, when some were refused, a friendly
+    note with the retry time (empty otherwise).
+    """
+    granted, retry_after = ctx.rate_limits.take(user_id, rate_tier(ctx, user_id), count)
+    if granted >= count:
+        return granted, ""
+    logging.getLogger("bot").info("rate_limited user=%s requested=%s granted=%s retry_after=%.0fs", user_id, count, granted, retry_after)
+    if not granted:
+        return 0, f"⏳ Kamu mengirim link terlalu cepat. Coba lagi dalam {format_retry(retry_after)}."
+    return granted, f"⏳ {count - granted} link dilewati karena batas kecepatan. Kirim ulang dalam {format_retry(retry_after)}."
+
+
+async def wait_link_token(ctx: BotContext, user_id: int) -> None:
+    """Wait until the user's rate bucket has room for one more link, then take it."""
+    tier = rate_tier(ctx, user_id)
+    while True:
+        granted, retry_after = ctx.rate_limits.take(user_id, tier, 1)
+        if granted:
+            return
+        await asyncio.sleep(max(0.1, retry_after))
+
+
+async def submit_link(
+    ctx: BotContext,
+    *,
+    message,
+    url: str,
+    user_id: int,
+    platform: Optional[str] = None,
+    req_id: Optional[str] = None,
+    status: Optional[StatusMessage] = None,
+    on_queued: Optional[Callable[[], None]] = None,
+) -> bool:
+    """Record a link job in the queue and wait for its outcome.
+
+    Without a queue the link is processed inline. When the queue is full or
+    shutting down the user is told to retry and False is returned.
+    ``on_queued`` (default: ``release_chat_order``) is called exactly once,
+    as soon as the link is queued or turned away, so the chat's next message
+    does not wait for this download.
+    """
+    platform = platform or detect_platform(url) or "generic"
+    req_id = req_id or uuid.uuid4().hex[:12]
+    intake_open = True
+
+    def _intake_done() -> None:
+        nonlocal intake_open
+        if intake_open:
+            intake_open = False
+            (on_queued or release_chat_order)()
+
+    try:
+        if ctx.overload.rejecting:
+            # Fail fast instead of letting the job time out behind the backlog
+            ctx.overload.count_shed(REJECT)
+            logging.getLogger("bot").warning("link_job_shed id=%s user=%s url=%s", req_id, user_id, url)
+            await reply_text(message, status, f"Bot sedang kelebihan beban. Coba kirim ulang link dalam {ctx.overload.retry_after()} detik.")
+            return False
+        if ctx.jobs is None:
+            _intake_done()
+            return await process_link(ctx, message=message, url=url, user_id=user_id, platform=platform, req_id=req_id, status=status)
+        job = LinkJob(
+            req_id=req_id,
+            user_id=user_id,
+            chat_id=message.chat_id,
+            chat_type=message.chat.type,
+            message_id=message.message_id,
+            url=url,
+            platform=platform,
+            message=message,
+            status=status,
+        )
+        try:
+            fut = await ctx.jobs.submit(job)
+        except QueueFull as e:
+            logging.getLogger("bot").warning("link_job_rejected id=%s user=%s url=%s reason=%s", req_id, user_id, url, str(e))
+            await reply_text(message, status, "Antrian sedang penuh. Coba kirim ulang link beberapa saat lagi.")
+            return False
+        _intake_done()
+        # The job outlives this handler on shutdown; do not cancel it with us
+        return bool(await asyncio.shield(fut))
+    finally:
+        _intake_done()
+
+
+async def process_links(
+    ctx: BotContext,
+    *,
+    message,
+    urls: List[str],
+    user_id: int,
+    on_progress: Optional[Callable[[int, int, int], Awaitable[None]]] = None,
+    admitted: Optional[int] = None,
+) -> List[bool]:
+    """Queue several links and wait for all of them.
+
+    The queue runs a user's links concurrently up to their limit.
+    ``on_progress(done, ok, total)`` is awaited after each link finishes.
+    With ``admitted``, only the first that many links have already paid
+    their rate tokens; each later one waits for a token before it is
+    queued. Results are returned in input order.
+    """
+    total = len(urls)
+    done = 0
+    ok = 0
+    intake_left = total
+
+    def _queued() -> None:
+        # The chat moves on once every link of this message is in the queue
+        nonlocal intake_left
+        intake_left -= 1
+        if intake_left == 0:
+            release_chat_order()
+
+    async def _one(url: str) -> bool:
+        nonlocal done, ok
+        try:
+            success = await submit_link(ctx, message=message, url=url, user_id=user_id, on_queued=_queued)
+        except Exception:
+            logging.getLogger("bot").exception("submit_link_failed user=%s url=%s", user_id, url)
+            success = False
+        done += 1
+        ok += int(success)
+        if on_progress is not None:
+            try:
+                await on_progress(done, ok, total)
+            except Exception:
+                logging.getLogger("bot").debug("progress_update_failed", exc_info=True)
+        return success
+
+    if admitted is None or admitted >= total:
+        return list(await asyncio.gather(*(_one(u) for u in urls)))
+    tasks: List[asyncio.Task] = []
+    try:
+        for idx, url in enumerate(urls):
+            if idx >= admitted:
+                await wait_link_token(ctx, user_id)
+            tasks.append(asyncio.create_task(_one(url)))
+        return list(await asyncio.gather(*tasks))
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
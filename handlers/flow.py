@@ -1,31 +1,393 @@
 from __future__ import annotations
 
+import asyncio
 import io
-from typing import List
+import logging
+import time
+from typing import Any, List, Sequence, Tuple
 
 import aiohttp
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 
+from bot.canonical import content_key
+from bot.config import page_size_for
 from bot.context import BotContext
 from bot.downloader_client import DownloaderClient, TooLargeError
-from bot.media_utils import is_image, is_video, iter_medias, pick_caption, summarize_result
+from bot.lanes import TRANSCODE, TRANSFER
+from bot.image_tools import IMAGE_SOURCE_MAX_BYTES, TELEGRAM_PHOTO_URL_MAX_BYTES, recompress_image_async, recompression_available
+from bot.media_cache import download_cached
+from bot.memory import BudgetExhausted, buffer_cost
+from bot.overload import LINKS_ONLY
+from bot.media_utils import MediaItem, choose_best_video, partitions, pick_caption
+from bot.sendqueue import MESSAGE
+from bot.state import CarouselState
 from bot.ui import build_summary_keyboard
+from bot.upload_strategy import BYTES, HEDGE, host_key
+from handlers.utils import spawn_background
 
 
-async def send_result_flow(ctx: BotContext, *, platform: str, message, result: dict, req_id: str, user_id: int, api: DownloaderClient, original_url: str) -> None:
-    import logging
+class StatusMessage:
+    """The "Sedang memproses..." reply, sent in the background.
 
+    Processing never waits for it. A text-only outcome edits it into the
+    final reply instead of sending another message; otherwise it is deleted
+    once the result has been delivered.
+    """
+
+    def __init__(self, message, text: str) -> None:
+        self._message = message
+        self._task = spawn_background(message.reply_text(text))
+        self.consumed = False
+
+    async def _get(self):
+        try:
+            return await self._task
+        except Exception:
+            return None
+
+    async def edit(self, text: str) -> None:
+        msg = await self._get()
+        if msg is not None and not self.consumed:
+            await msg.edit_text(text)
+
+    async def reply(self, text: str, reply_markup=None):
+        if not self.consumed:
+            msg = await self._get()
+            if msg is not None:
+                try:
+                    # A final answer, not a progress update: schedule it like a message
+                    edited = await msg.edit_text(text, reply_markup=reply_markup, rate_limit_args={"priority": MESSAGE})
+                    self.consumed = True
+                    return edited
+                except Exception:
+                    logging.getLogger("bot").debug("status_edit_failed", exc_info=True)
+        return await self._message.reply_text(text, reply_markup=reply_markup)
+
+    async def cleanup(self) -> None:
+        if self.consumed:
+            return
+        msg = await self._get()
+        if msg is not None:
+            try:
+                await msg.delete()
+            except Exception:
+                pass
+
+
+async def reply_text(message, status: StatusMessage | None, text: str, reply_markup=None):
+    """Send a text-only reply, reusing the status message when there is one."""
+    if status is not None:
+        return await status.reply(text, reply_markup=reply_markup)
+    return await message.reply_text(text, reply_markup=reply_markup)
+
+
+def remember_sent(ctx: BotContext, key: str | None, sent: Any) -> None:
+    """Record file_ids of sent media so inline mode can reuse them."""
+    if not key:
+        return
+    for msg in sent if isinstance(sent, (list, tuple)) else (sent,):
+        if msg is None:
+            continue
+        if getattr(msg, "video", None):
+            ctx.file_ids.add(key, "video", msg.video.file_id)
+        elif getattr(msg, "photo", None):
+            ctx.file_ids.add(key, "photo", msg.photo[-1].file_id)
+        elif getattr(msg, "audio", None):
+            ctx.file_ids.add(key, "audio", msg.audio.file_id)
+
+
+def _recompression_enabled(ctx: BotContext) -> bool:
+    return ctx.settings.image_recompress_enabled and recompression_available()
+
+
+async def _prepare_photo(ctx: BotContext, api: DownloaderClient, session: aiohttp.ClientSession, m: MediaItem, *, idx: int, req_id: str, force: bool) -> Any:
+    url = m.url
+    size = m.data_size
+    if size is None:
+        size = await api.head_size(session, url)
+    if not force and (size is None or size <= TELEGRAM_PHOTO_URL_MAX_BYTES):
+        return url
+
+    logger = logging.getLogger("bot")
+    s = ctx.settings
+    # Photos are capped well below max_upload_bytes, and so is what an
+    # unknown size reserves: a 10-slide retry must not drain the budget
+    limit = min(s.max_upload_bytes, IMAGE_SOURCE_MAX_BYTES)
+    if size is not None and size > limit:
+        return url
+    try:
+        # The source bytes only live until recompression; the JPEG is capped at photo_target_bytes
+        async with ctx.memory.reserve(buffer_cost(size, limit)):
+            async with ctx.lanes.run(TRANSFER):
+                data = await download_cached(ctx.media_cache, api, session, url, limit)
+            async with ctx.lanes.run(TRANSCODE):
+                out = await recompress_image_async(data, max_dimension=s.photo_max_dimension, target_bytes=s.photo_target_bytes)
+    except Exception:
+        logger.warning("image_recompress_failed id=%s idx=%s", req_id, idx, exc_info=True)
+        return url
+    logger.info("image_recompressed id=%s idx=%s from=%s to=%s", req_id, idx, len(data), len(out))
+    bio = io.BytesIO(out)
+    bio.name = f"photo_{idx}.jpg"
+    return bio
+
+
+async def prepare_photos(ctx: BotContext, api: DownloaderClient, medias: Sequence[MediaItem], *, req_id: str, start: int = 1, force: bool = False) -> List[Any]:
+    """Return a photo input (URL or recompressed JPEG) for each image media.
+
+    Only images whose ``data_size`` or HEAD size exceeds Telegram's photo URL
+    limit are downloaded and recompressed (in the process pool), unless
+    ``force`` is set after Telegram already rejected them.
+    """
+    if not _recompression_enabled(ctx):
+        return [m.url for m in medias]
+    if ctx.overload.links_only:
+        ctx.overload.count_shed(LINKS_ONLY)
+        return [m.url for m in medias]
+    async with ctx.http.client() as session:
+        return list(
+            await asyncio.gather(
+                *(
+                    _prepare_photo(ctx, api, session, m, idx=idx, req_id=req_id, force=force)
+                    for idx, m in enumerate(medias, start=start)
+                )
+            )
+        )
+
+
+# Platforms whose carousels are sent as albums; the rest one photo per message
+_ALBUM_PLATFORMS = ("tiktok", "facebook", "instagram", "threads")
+
+
+def is_album(platform: str, count: int) -> bool:
+    return platform in _ALBUM_PLATFORMS and count > 1
+
+
+def _build_media_group(photos: List[Any], author, title, *, first: bool) -> List[InputMediaPhoto]:
+    media_group = []
+    for idx, photo in enumerate(photos):
+        if first and idx == 0:
+            media_group.append(InputMediaPhoto(media=photo, caption=f"🖼️ {pick_caption(author, title)}"))
+        else:
+            media_group.append(InputMediaPhoto(media=photo))
+    return media_group
+
+
+async def send_image_page(
+    ctx: BotContext,
+    api: DownloaderClient,
+    message,
+    medias: Sequence[MediaItem],
+    *,
+    start: int,
+    count: int,
+    album: bool,
+    author,
+    title,
+    key: str | None,
+    req_id: str,
+    stop_on_failure: bool = False,
+) -> int:
+    """Send ``medias[start:start + count]`` in reply to ``message``.
+
+    Albums go out in groups of 10 (captioned only on the very first group),
+    other platforms one photo per message. A rejected group or photo is
+    retried once recompressed when recompression is available. Returns how
+    many images from ``start`` went out before the first failure; with
+    ``stop_on_failure`` nothing after that failure is sent.
+    """
+    logger = logging.getLogger("bot")
+    page = list(medias[start : start + count])
+    photos = await prepare_photos(ctx, api, page, req_id=req_id, start=start + 1)
+    delivered: int | None = None
+    if album:
+        for offset in range(0, len(page), 10):
+            g_start = start + offset
+            group = photos[offset : offset + 10]
+            try:
+                sent = await message.reply_media_group(media=_build_media_group(group, author, title, first=g_start == 0))
+                remember_sent(ctx, key, sent)
+                continue
+            except Exception:
+                logger.exception("send_image_group_failed id=%s group=%s", req_id, g_start // 10 + 1)
+            if _recompression_enabled(ctx):
+                # Telegram rejected something in the album; retry once with every slide recompressed
+                retry = await prepare_photos(ctx, api, page[offset : offset + 10], req_id=req_id, start=g_start + 1, force=True)
+                try:
+                    sent = await message.reply_media_group(media=_build_media_group(retry, author, title, first=g_start == 0))
+                    remember_sent(ctx, key, sent)
+                    continue
+                except Exception:
+                    logger.exception("send_image_group_retry_failed id=%s group=%s", req_id, g_start // 10 + 1)
+            if delivered is None:
+                delivered = offset
+            if stop_on_failure:
+                break
+        return len(page) if delivered is None else delivered
+    for offset, (m, photo) in enumerate(zip(page, photos)):
+        idx = start + offset + 1
+        try:
+            remember_sent(ctx, key, await message.reply_photo(photo=photo))
+            continue
+        except Exception:
+            logger.exception("send_image_failed idx=%s", idx)
+        if isinstance(photo, str) and _recompression_enabled(ctx):
+            retry = await prepare_photos(ctx, api, [m], req_id=req_id, start=idx, force=True)
+            if not isinstance(retry[0], str):
+                try:
+                    remember_sent(ctx, key, await message.reply_photo(photo=retry[0]))
+                    continue
+                except Exception:
+                    logger.exception("send_image_retry_failed idx=%s", idx)
+        if delivered is None:
+            delivered = offset
+        if stop_on_failure:
+            break
+    return len(page) if delivered is None else delivered
+
+
+async def send_more_button(message, state: CarouselState | None, token: str) -> None:
+    """The "more" prompt under a partially sent carousel."""
+    if state is None or not state.remaining:
+        return
+    await message.reply_text(
+        f"🖼️ {state.next_index} dari {len(state.medias)} gambar sudah dikirim.",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(text=f"Lainnya ({state.remaining} tersisa)", callback_data=f"more:{token}")]]),
+    )
+
+
+async def _fetch_video_bytes(ctx: BotContext, api: DownloaderClient, best: MediaItem, size: int | None) -> Tuple[int, bytes]:
+    """Reserve memory for and download ``best``; returns ``(reserved, data)``.
+
+    Runs in the caller's TRANSFER slot. The caller owns the reservation and
+    releases it once the upload is done.
+    """
+    reserved = await ctx.memory.acquire(buffer_cost(size or best.data_size, ctx.settings.max_upload_bytes))
+    try:
+        async with ctx.http.client() as session:
+            data = await download_cached(ctx.media_cache, api, session, best.url, ctx.settings.max_upload_bytes)
+    except BaseException:
+        ctx.memory.release(reserved)
+        raise
+    return reserved, data
+
+
+async def _hedge_video_bytes(ctx: BotContext, api: DownloaderClient, best: MediaItem) -> Tuple[int, bytes]:
+    """The hedged download next to a URL send, in a TRANSFER slot of its own."""
+    async with ctx.lanes.run(TRANSFER):
+        return await _fetch_video_bytes(ctx, api, best, None)
+
+
+async def _upload_video_bytes(ctx: BotContext, message, best: MediaItem, reserved: int, data: bytes, *, caption: str, kb, req_id: str):
+    try:
+        bio = io.BytesIO(data)
+        bio.name = best.filename or f"video_{req_id}.mp4"
+        return await message.reply_video(video=bio, caption=caption or None, supports_streaming=True, reply_markup=kb)
+    finally:
+        ctx.memory.release(reserved)
+
+
+def _drop_prefetch(ctx: BotContext, task: asyncio.Task) -> None:
+    if not task.done():
+        # The task releases its own reservation when cancelled
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        ctx.memory.release(task.result()[0])
+
+
+async def _send_video_link(message, url: str, text: str) -> None:
+    await message.reply_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(text="Buka di Browser", url=url)]]))
+
+
+async def _send_video_bytes(ctx: BotContext, api: DownloaderClient, message, best: MediaItem, *, caption: str, kb, key: str, req_id: str, prefetch: asyncio.Task | None) -> bool:
+    """Download-and-upload path, reusing the hedged prefetch when there is one."""
+    logger = logging.getLogger("bot")
+    if ctx.overload.links_only:
+        # Overloaded: no download + re-upload, the link is enough
+        ctx.overload.count_shed(LINKS_ONLY)
+        if prefetch is not None:
+            _drop_prefetch(ctx, prefetch)
+        await _send_video_link(message, best.url, "Server sedang sibuk. Mengirim tautan video saja.")
+        return False
+    # The TRANSFER slot covers the upload as well as the download, so the
+    # lane bounds concurrent transfers in both directions
+    try:
+        if prefetch is not None:
+            # The hedge downloaded in its own slot; waiting for it inside one would hold two
+            reserved, data = await prefetch
+            ctx.uploads.hedges_used += 1
+            async with ctx.lanes.run(TRANSFER):
+                sent = await _upload_video_bytes(ctx, message, best, reserved, data, caption=caption, kb=kb, req_id=req_id)
+        else:
+            async with ctx.lanes.run(TRANSFER):
+                size = best.data_size
+                if size is None:
+                    async with ctx.http.client() as session:
+                        size = await api.head_size(session, best.url)
+                if size is not None and size > ctx.settings.max_upload_bytes:
+                    await _send_video_link(message, best.url, f"Ukuran video terlalu besar untuk diupload ({size} bytes). Mengirim tautan saja.")
+                    return False
+                reserved, data = await _fetch_video_bytes(ctx, api, best, size)
+                sent = await _upload_video_bytes(ctx, message, best, reserved, data, caption=caption, kb=kb, req_id=req_id)
+        del data
+    except TooLargeError as e:
+        await _send_video_link(message, best.url, f"Ukuran video terlalu besar untuk diupload ({e.size} bytes).")
+        return False
+    except BudgetExhausted:
+        logger.warning("video_fallback_memory_busy id=%s", req_id)
+        await _send_video_link(message, best.url, "Server sedang sibuk memproses banyak file. Mengirim tautan saja.")
+        return False
+    remember_sent(ctx, key, sent)
+    return True
+
+
+async def _send_video(ctx: BotContext, api: DownloaderClient, message, best: MediaItem, *, caption: str, kb, key: str, req_id: str) -> bool:
+    """Deliver ``best`` by URL or by bytes, as the learned upload strategy predicts.
+
+    A URL-send that Telegram is known to fail for this host and size is
+    skipped; an uncertain one runs while the bytes are prefetched, so the
+    fallback does not start from zero.
+    """
+    logger = logging.getLogger("bot")
+    strategy = ctx.uploads.choose(best.url, best.data_size)
+    prefetch = None
+    if strategy == HEDGE and not ctx.overload.links_only:
+        prefetch = asyncio.create_task(_hedge_video_bytes(ctx, api, best))
+    if strategy != BYTES:
+        try:
+            sent = await message.reply_video(video=best.url, caption=caption or None, supports_streaming=True, reply_markup=kb)
+        except Exception:
+            logger.exception("send_best_video_failed_post")
+            ctx.uploads.record(best.url, best.data_size, ok=False)
+        else:
+            ctx.uploads.record(best.url, best.data_size, ok=True)
+            if prefetch is not None:
+                _drop_prefetch(ctx, prefetch)
+            remember_sent(ctx, key, sent)
+            return True
+    else:
+        logger.info("send_video_url_skipped id=%s host=%s", req_id, host_key(best.url))
+    # Fallback: download into memory then upload
+    try:
+        return await _send_video_bytes(ctx, api, message, best, caption=caption, kb=kb, key=key, req_id=req_id, prefetch=prefetch)
+    except Exception:
+        logger.exception("send_best_video_fallback_download_failed id=%s", req_id)
+        return False
+
+
+async def send_result_flow(ctx: BotContext, *, platform: str, message, result: dict, req_id: str, user_id: int, api: DownloaderClient, original_url: str, status: StatusMessage | None = None) -> bool:
     logger = logging.getLogger("bot")
 
     author = result.get("author")
     title = result.get("title")
-    videos, images, audios = summarize_result(result)
+    parts = partitions(result)
+    videos, images, audios = len(parts.videos), len(parts.images), len(parts.audios)
 
     if videos + images + audios == 0:
-        await message.reply_text("Tidak ditemukan media.")
-        return
+        await reply_text(message, status, "Tidak ditemukan media.")
+        return False
 
     caption_text = pick_caption(author, title)
+    key = content_key(original_url)
 
     logger.info(
         "request_success id=%s user=%s url=%s videos=%s images=%s audios=%s",
@@ -40,95 +402,53 @@ async def send_result_flow(ctx: BotContext, *, platform: str, message, result: d
     # Build keyboard
     kb = None
     try:
-        kb = build_summary_keyboard(ctx, result, user_id=user_id, chat_id=message.chat_id, message_id=None)
+        kb = build_summary_keyboard(ctx, result, user_id=user_id, chat_id=message.chat_id, key=key, message_id=None)
     except Exception:
         logger.exception("failed_build_keyboard")
 
     # Decide flows based on medias
-    videos_list = [m for _, m in iter_medias(result) if is_video(m)]
-    image_medias = [m for _, m in iter_medias(result) if is_image(m)]
+    image_medias = parts.images
 
     video_sent = False
     # Prefer video if available
     try:
-        if videos_list:
-            from bot.media_utils import choose_best_video
-
-            best = choose_best_video(videos_list)
+        if parts.videos:
+            best = choose_best_video(parts.videos)
             if best:
-                best_video_url = best.get("url") or best.get("download_url") or ""
-                try:
-                    await message.reply_video(
-                        video=best_video_url,
-                        caption=caption_text or None,
-                        supports_streaming=True,
-                        reply_markup=kb,
-                    )
-                    video_sent = True
-                except Exception:
-                    logger.exception("send_best_video_failed_post")
-                    # Fallback: download into memory then upload
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            size = await api.head_size(session, best_video_url)
-                            if size is not None and size > ctx.settings.max_upload_bytes:
-                                await message.reply_text(
-                                    f"Ukuran video terlalu besar untuk diupload ({size} bytes). Mengirim tautan saja.",
-                                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(text="Buka di Browser", url=best_video_url)]]),
-                                )
-                            else:
-                                try:
-                                    data = await api.download_to_bytes(session, best_video_url, ctx.settings.max_upload_bytes)
-                                except TooLargeError as e:
-                                    await message.reply_text(
-                                        f"Ukuran video terlalu besar untuk diupload ({e.size} bytes).",
-                                        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(text="Buka di Browser", url=best_video_url)]]),
-                                    )
-                                else:
-                                    bio = io.BytesIO(data)
-                                    filename = (best.get("filename") or f"video_{req_id}.mp4")
-                                    bio.name = filename
-                                    await message.reply_video(
-                                        video=bio,
-                                        caption=caption_text or None,
-                                        supports_streaming=True,
-                                        reply_markup=kb,
-                                    )
-                                    video_sent = True
-                    except Exception:
-                        logger.exception("send_best_video_fallback_download_failed id=%s", req_id)
+                video_sent = await _send_video(ctx, api, message, best, caption=caption_text, kb=kb, key=key, req_id=req_id)
     except Exception:
         logger.exception("send_best_video_failed")
 
-    # Images: TikTok groups as album, others sequential
+    # Images: the first page now, the rest behind a "more" button
+    more_token = None
     if image_medias:
-        if platform in ("tiktok", "facebook", "instagram", "threads") and len(image_medias) > 1:
-            try:
-                groups = [image_medias[i : i + 10] for i in range(0, len(image_medias), 10)]
-                for g_idx, group in enumerate(groups):
-                    media_group = []
-                    for idx_in_group, m in enumerate(group):
-                        if g_idx == 0 and idx_in_group == 0:
-                            cap = f"🖼️ {pick_caption(author, title)}"
-                            media_group.append(InputMediaPhoto(media=m.get("url"), caption=cap))
-                        else:
-                            media_group.append(InputMediaPhoto(media=m.get("url")))
-                    await message.reply_media_group(media=media_group)
-            except Exception:
-                logger.exception("send_image_group_failed")
-        else:
-            for idx, m in enumerate(image_medias, start=1):
-                try:
-                    await message.reply_photo(photo=m.get("url"))
-                except Exception:
-                    logger.exception("send_image_failed idx=%s", idx)
+        page = page_size_for(ctx.settings, platform) or len(image_medias)
+        await send_image_page(
+            ctx, api, message, image_medias, start=0, count=page, album=is_album(platform, len(image_medias)),
+            author=author, title=title, key=key, req_id=req_id,
+        )
+        if len(image_medias) > page:
+            state = CarouselState(
+                user_id=user_id,
+                chat_id=message.chat_id,
+                platform=platform,
+                medias=list(image_medias),
+                author=author,
+                title=title,
+                content_key=key,
+                next_index=page,
+                created_at=time.time(),
+            )
+            more_token = ctx.carousels.new_token(state)
 
-    # If no video was sent, send caption + buttons after images
+    # If no video was sent, send caption + buttons after images. Without
+    # images this is a text-only result, so the status message becomes it.
     if not video_sent:
+        final_status = None if image_medias else status
         if caption_text:
-            if kb:
-                await message.reply_text(caption_text, reply_markup=kb)
-            else:
-                await message.reply_text(caption_text)
+            await reply_text(message, final_status, caption_text, reply_markup=kb)
         elif kb:
-            await message.reply_text(".", reply_markup=kb)
+            await reply_text(message, final_status, ".", reply_markup=kb)
+    if more_token is not None:
+        await send_more_button(message, ctx.carousels.get(more_token), more_token)
+    return True
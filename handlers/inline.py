@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, List
+
+from telegram import (
+    InlineQueryResultArticle,
+    InlineQueryResultAudio,
+    InlineQueryResultCachedAudio,
+    InlineQueryResultCachedPhoto,
+    InlineQueryResultCachedVideo,
+    InlineQueryResultPhoto,
+    InlineQueryResultVideo,
+    InputTextMessageContent,
+    Update,
+)
+from telegram.ext import ContextTypes, InlineQueryHandler
+
+from bot.canonical import canonicalize, extract_supported_urls
+from bot.context import BotContext
+from bot.media_utils import choose_best_video, partitions, pick_caption
+from handlers.dispatch import admit_links, resolve_link
+
+# Telegram accepts at most 50 results per answer
+_MAX_RESULTS = 50
+
+
+def _cached_results(entries: List[tuple[str, str]], caption: str) -> List[Any]:
+    results: List[Any] = []
+    for idx, (kind, file_id) in enumerate(entries):
+        rid = f"c{idx}"
+        if kind == "video":
+            results.append(InlineQueryResultCachedVideo(id=rid, video_file_id=file_id, title=caption, caption=caption))
+        elif kind == "photo":
+            results.append(InlineQueryResultCachedPhoto(id=rid, photo_file_id=file_id))
+        elif kind == "audio":
+            results.append(InlineQueryResultCachedAudio(id=rid, audio_file_id=file_id))
+    return results
+
+
+def _url_results(result: Dict[str, Any], original_url: str) -> List[Any]:
+    parts = partitions(result)
+    caption = pick_caption(result.get("author"), result.get("title"))
+    thumb = result.get("thumbnail") or result.get("thumb")
+    results: List[Any] = []
+
+    best = choose_best_video(parts.videos)
+    if best and best.url and isinstance(thumb, str) and thumb.startswith("http"):
+        results.append(
+            InlineQueryResultVideo(
+                id="v0",
+                video_url=best.url,
+                mime_type="video/mp4",
+                thumbnail_url=thumb,
+                title=caption,
+                caption=caption,
+            )
+        )
+    for idx, m in enumerate((m for m in parts.images if m.url), start=1):
+        results.append(InlineQueryResultPhoto(id=f"p{idx}", photo_url=m.url, thumbnail_url=m.url))
+    for idx, m in enumerate((m for m in parts.audios if m.url), start=1):
+        results.append(InlineQueryResultAudio(id=f"a{idx}", audio_url=m.url, title=result.get("title") or f"Audio {idx}"))
+
+    if not results:
+        results.append(
+            InlineQueryResultArticle(
+                id="link",
+                title=caption,
+                input_message_content=InputTextMessageContent(original_url),
+                url=original_url,
+            )
+        )
+    return results
+
+
+async def _on_inline_query(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    iq = update.inline_query
+    if not iq:
+        return
+    logger = logging.getLogger("bot")
+    s = ctx.settings
+
+    urls = extract_supported_urls(iq.query)
+    if not urls:
+        await iq.answer([], cache_time=5)
+        return
+    url = urls[0]
+    c = canonicalize(url)
+    cached = ctx.file_ids.get(c.key) if c else []
+    if cached:
+        known = ctx.results.get(c.key)
+        caption = pick_caption(known.get("author"), known.get("title")) if known else "AIO Downloader"
+        await iq.answer(_cached_results(cached, caption)[:_MAX_RESULTS], cache_time=s.inline_cache_time)
+        return
+
+    req_id = uuid.uuid4().hex[:12]
+    user_id = iq.from_user.id if iq.from_user else 0
+    if (c is None or ctx.results.get(c.key) is None) and not admit_links(ctx, user_id, 1)[0]:
+        # Throttled: typing does not get to hammer the downloader API
+        await iq.answer([], cache_time=5)
+        return
+    # Shield the resolve so a missed deadline still warms the result cache
+    # for the next keystroke instead of discarding the upstream call.
+    resolve = asyncio.ensure_future(resolve_link(ctx, url=url, user_id=user_id, platform=c.platform if c else None, req_id=req_id))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(resolve), timeout=s.inline_deadline_seconds)
+    except asyncio.TimeoutError:
+        logger.info("inline_deadline_exceeded id=%s url=%s deadline=%ss", req_id, url, s.inline_deadline_seconds)
+        resolve.add_done_callback(lambda t: t.cancelled() or t.exception())
+        await iq.answer([], cache_time=1)
+        return
+    except Exception as e:
+        logger.warning("inline_resolve_failed id=%s url=%s error=%s", req_id, url, str(e))
+        await iq.answer([], cache_time=5)
+        return
+
+    await iq.answer(_url_results(result, url)[:_MAX_RESULTS], cache_time=s.inline_cache_time)
+
+
+def inline_query_handler(ctx: BotContext) -> InlineQueryHandler:
+    return InlineQueryHandler(lambda u, c: _on_inline_query(ctx, u, c))
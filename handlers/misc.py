@@ -7,6 +7,8 @@ from telegram import Update
 from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
 
 from bot.context import BotContext
+from bot.lanes import INTERACTIVE
+from processors.registry import stats_snapshot
 
 
 def _format_seconds(secs: float) -> str:
@@ -25,7 +27,12 @@ def _format_seconds(secs: float) -> str:
     return " ".join(parts)
 
 
-async def on_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def on_help(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async with ctx.lanes.run(INTERACTIVE):
+        await _on_help(update, context)
+
+
+async def _on_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.callback_query:
         await update.callback_query.answer()
         target = update.callback_query.message
@@ -35,7 +42,8 @@ async def on_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     text = (
         "🤝 Bantuan\n"
-        "- Kirim URL dari platform yang didukung\n"
+        "- Kirim URL dari platform yang didukung (boleh beberapa link sekaligus)\n"
+        "- /batch + daftar URL atau file .txt untuk memproses banyak link\n"
         "- Bot akan menyiapkan media/tombol unduh\n"
         "- YouTube: bot kirim tombol kualitas (tanpa upload video)\n"
         "- Jika ukuran melebihi batas upload, bot mem‑post tautan\n"
@@ -44,6 +52,11 @@ async def on_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def on_runtime(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async with ctx.lanes.run(INTERACTIVE):
+        await _on_runtime(ctx, update, context)
+
+
+async def _on_runtime(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.callback_query:
         await update.callback_query.answer()
         target = update.callback_query.message
@@ -59,20 +72,112 @@ async def on_runtime(ctx: BotContext, update: Update, context: ContextTypes.DEFA
         f"- Uptime: {uptime}\n"
         f"- Concurrency/user: {s.max_concurrent_per_user}\n"
         f"- Max upload: {mb:.0f} MB\n"
+        "\n⚙️ Lanes (jalan/antri, rata-rata/maks tunggu)\n"
+    )
+    for name, st in ctx.lanes.snapshot().items():
+        text += (
+            f"- {name}: {st['running']}/{st['workers']} jalan, {st['waiting']} antri, "
+            f"tunggu {st['avg_wait'] * 1000:.0f}/{st['max_wait'] * 1000:.0f} ms\n"
+        )
+    pipelines = stats_snapshot()
+    if pipelines:
+        text += "\n🌐 Downloader API (request, gagal, fallback, rata-rata)\n"
+        for name, st in pipelines.items():
+            text += f"- {name}: {st['requests']}, {st['failures']} gagal, {st['fallbacks']} fallback, {st['avg_latency'] * 1000:.0f} ms\n"
+    if ctx.updates is not None:
+        u = ctx.updates.snapshot()
+        text += (
+            "\n📨 Update\n"
+            f"- Aktif/menunggu: {u['active']}/{u['concurrency']} aktif, {u['waiting']} menunggu ({u['chats']} chat)\n"
+            f"- Diproses: {u['processed']}, tunggu {u['avg_wait'] * 1000:.0f}/{u['max_wait'] * 1000:.0f} ms, "
+            f"durasi rata-rata {u['avg_run']:.1f} s\n"
+        )
+    if ctx.sender is not None:
+        sq = ctx.sender.snapshot()
+        q = sq["queued"]
+        text += (
+            "\n📮 Antrean kirim Telegram\n"
+            f"- Menunggu: {q['result']} hasil, {q['message']} pesan, {q['cosmetic']} edit/reaksi\n"
+            f"- Terkirim: {sq['sent']}, tunggu {sq['avg_wait'] * 1000:.0f}/{sq['max_wait'] * 1000:.0f} ms, "
+            f"{sq['coalesced']} edit digabung, RetryAfter {sq['retry_afters']}x\n"
+        )
+    if ctx.watchdog is not None:
+        wd = ctx.watchdog.snapshot()
+        text += (
+            "\n⏲️ Lag event loop\n"
+            f"- p50/p99/maks: {wd['p50'] * 1000:.0f}/{wd['p99'] * 1000:.0f}/{wd['max'] * 1000:.0f} ms, "
+            f"macet {wd['stalls']}x (> {ctx.watchdog.threshold * 1000:.0f} ms)\n"
+        )
+        for site, count in wd["sites"][:3]:
+            text += f"- {count}x {site}\n"
+    text += f"\n🚧 Batas kecepatan: {ctx.rate_limits.throttled} permintaan dibatasi, {len(ctx.rate_limits)} user aktif\n"
+    ov = ctx.overload.snapshot()
+    text += f"\n🚦 Beban: {ov['name']}"
+    if ov["level"]:
+        text += f" (pemicu {ov['cause']}, sejak {_format_seconds(ov['since'])})"
+    sig = ov["signals"]
+    text += (
+        f"\n- Antrean {sig.get('queue', 0) * 100:.0f}%, lag loop {sig.get('loop_lag', 0) * 1000:.0f} ms, "
+        f"memori {sig.get('memory', 0) * 100:.0f}%, error upstream {sig.get('error_rate', 0) * 100:.0f}%\n"
+        f"- Dialihkan ke tautan: {ov['shed']['links_only']}, probe dilewati: {ov['shed']['no_probe']}, "
+        f"link ditolak: {ov['shed']['reject']}\n"
+    )
+    up = ctx.uploads.snapshot()
+    d = up["decisions"]
+    text += (
+        "\n📤 Strategi upload video\n"
+        f"- URL dulu: {d['url']}, langsung unggah: {d['bytes']}, paralel: {d['hedge']} (prefetch terpakai {up['hedges_used']})\n"
+    )
+    if up["blocked"]:
+        text += f"- Host yang gagal diambil Telegram: {', '.join(up['blocked'][:5])}\n"
+    mem = ctx.memory.snapshot()
+    text += (
+        "\n🧠 Memori\n"
+        f"- Buffer media: {mem['reserved'] / 1048576:.0f}/{mem['limit'] / 1048576:.0f} MB dipesan "
+        f"(puncak {mem['peak_reserved'] / 1048576:.0f} MB), {mem['waiting']} menunggu, {mem['exhausted']} dialihkan ke tautan\n"
     )
+    if mem["rss"] is not None:
+        rss = f"- RSS proses: {mem['rss'] / 1048576:.0f} MB"
+        if mem["container_limit"]:
+            rss += f" dari batas container {mem['container_limit'] / 1048576:.0f} MB"
+        text += rss + "\n"
+    if ctx.media_cache is not None:
+        mc = ctx.media_cache.snapshot()
+        text += (
+            "\n💾 Cache media\n"
+            f"- Hit ratio: {mc['hit_ratio'] * 100:.0f}% ({mc['hits']} hit, {mc['misses']} miss)\n"
+            f"- Hemat unduhan: {mc['bytes_saved'] / 1048576:.1f} MB\n"
+            f"- Terpakai: {mc['total_bytes'] / 1048576:.0f}/{mc['max_bytes'] / 1048576:.0f} MB\n"
+        )
+    if ctx.prefetch is not None:
+        pf = ctx.prefetch.snapshot()
+        text += (
+            "\n🎵 Prefetch MP3\n"
+            f"- Hit ratio: {pf['hit_ratio'] * 100:.0f}% ({pf['hits']} siap, {pf['inflight_hits']} sedang diunduh, {pf['misses']} miss, {pf['bypassed']} di antaranya masih antre lane)\n"
+            f"- Dimulai {pf['started']}/{pf['offered']}, dilewati {pf['skipped']}, gagal {pf['failed']}\n"
+            f"- Terpakai {pf['used_bytes'] / 1048576:.1f} MB, terbuang {pf['wasted_bytes'] / 1048576:.1f} MB, ditahan {pf['held_bytes'] / 1048576:.1f} MB\n"
+        )
+    if ctx.jobs is not None:
+        q = ctx.jobs
+        text += (
+            "\n📥 Antrean job\n"
+            f"- Antri/jalan: {q.depth()}/{q.max_pending}\n"
+            f"- Selesai: {q.completed} berhasil, {q.failed} gagal\n"
+            f"- Dilanjutkan setelah restart: {q.recovered}\n"
+        )
     await target.reply_text(text)
 
 
-def help_callback_handler() -> CallbackQueryHandler:
-    return CallbackQueryHandler(lambda u, c: on_help(u, c), pattern=r"^help$")
+def help_callback_handler(ctx: BotContext) -> CallbackQueryHandler:
+    return CallbackQueryHandler(lambda u, c: on_help(ctx, u, c), pattern=r"^help$")
 
 
 def runtime_callback_handler(ctx: BotContext) -> CallbackQueryHandler:
     return CallbackQueryHandler(lambda u, c: on_runtime(ctx, u, c), pattern=r"^runtime$")
 
 
-def help_command_handler() -> CommandHandler:
-    return CommandHandler("help", on_help)
+def help_command_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("help", lambda u, c: on_help(ctx, u, c))
 
 
 def runtime_command_handler(ctx: BotContext) -> CommandHandler:
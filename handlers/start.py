@@ -3,10 +3,17 @@ from __future__ import annotations
 from telegram.ext import CommandHandler, ContextTypes
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 
+from bot.context import BotContext
+from bot.lanes import INTERACTIVE
 from bot.platforms import sample_urls_text
 
 
-async def _start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def _start(ctx: BotContext, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async with ctx.lanes.run(INTERACTIVE):
+        await _send_welcome(update)
+
+
+async def _send_welcome(update: Update):
     if not update.message:
         return
     msg = []
@@ -35,5 +42,5 @@ async def _start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("\n".join(msg), reply_markup=kb)
 
 
-def start_handler() -> CommandHandler:
-    return CommandHandler("start", _start)
+def start_handler(ctx: BotContext) -> CommandHandler:
+    return CommandHandler("start", lambda u, c: _start(ctx, u, c))
@@ -1,20 +1,28 @@
 from __future__ import annotations
 
 import uuid
-import random
+from typing import List
+
 from telegram.ext import ContextTypes, MessageHandler, filters
-from telegram import ReactionTypeEmoji
-import logging
+from telegram import MessageEntity
 
+from bot.canonical import extract_supported_urls
 from bot.context import BotContext
 from bot.platforms import detect_platform, sample_urls_text
-from processors.generic import process_generic
-from processors.douyin import process_douyin
-from processors.tiktok import process_tiktok
-from processors.instagram import process_instagram
-from processors.facebook import process_facebook
-from processors.threads import process_threads
-from processors.youtube import process_youtube
+from handlers.dispatch import admit_links, process_links, submit_link
+from handlers.flow import StatusMessage
+from handlers.utils import add_reaction, spawn_background
+
+
+def message_urls(message) -> List[str]:
+    """All supported URLs in a message: Telegram url/text_link entities first, then free text."""
+    entity_urls: List[str] = []
+    for source, entities in ((message.text, message.parse_entities), (message.caption, message.parse_caption_entities)):
+        if not source:
+            continue
+        for entity, value in entities([MessageEntity.URL, MessageEntity.TEXT_LINK]).items():
+            entity_urls.append(entity.url if entity.type == MessageEntity.TEXT_LINK and entity.url else value)
+    return extract_supported_urls(message.text or message.caption or "", entity_urls)
 
 
 def text_handler(ctx: BotContext) -> MessageHandler:
@@ -23,59 +31,43 @@ def text_handler(ctx: BotContext) -> MessageHandler:
         if not message or not message.text:
             return
 
-        text = message.text.strip()
-        platform = detect_platform(text)
-        if not platform:
+        urls = message_urls(message)
+        if not urls:
             await message.reply_text("URL tidak valid atau tidak didukung.\n" + sample_urls_text())
             return
 
-        req_id = uuid.uuid4().hex[:12]
-        # React to user's message with a conservative emoji set; try a few in case some are disallowed
-        reactions = ["👍", "❤️", "🔥", "🎉", "👏", "😮", "😢"]
-        try:
-            pool = reactions[:]
-            random.shuffle(pool)
-            reacted = False
-            for emoji in pool:
-                try:
-                    ok = await context.bot.set_message_reaction(
-                        chat_id=message.chat_id,
-                        message_id=message.message_id,
-                        reaction=[ReactionTypeEmoji(emoji=emoji)],
-                    )
-                    if ok:
-                        reacted = True
-                        break
-                except Exception:
-                    continue
-            if not reacted:
-                logging.getLogger("bot").warning("Could not add reaction (all emojis failed) chat=%s msg=%s", message.chat_id, message.message_id)
-        except Exception:
-            logging.getLogger("bot").warning("Failed to add reaction", exc_info=True)
-        processing_msg = await message.reply_text(f"Sedang memproses link kamu dari {platform.upper()}...")
-
         user_id = message.from_user.id if message.from_user else 0
-        sem = ctx.semaphores.for_user(user_id)
-        async with sem:
+        allowed, note = admit_links(ctx, user_id, len(urls))
+        if note:
+            await message.reply_text(note)
+        if not allowed:
+            return
+        urls = urls[:allowed]
+
+        # Reaction and status message run in the background so they never
+        # delay the upstream fetch, which starts as soon as a worker takes the job.
+        spawn_background(add_reaction(ctx, context.bot, message))
+        if len(urls) == 1:
+            platform = detect_platform(urls[0])
+            status = StatusMessage(message, f"Sedang memproses link kamu dari {platform.upper()}...")
             try:
-                if platform == "douyin":
-                    await process_douyin(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                elif platform == "tiktok":
-                    await process_tiktok(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                elif platform == "instagram":
-                    await process_instagram(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                elif platform == "facebook":
-                    await process_facebook(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                elif platform == "threads":
-                    await process_threads(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                elif platform == "youtube":
-                    await process_youtube(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
-                else:
-                    await process_generic(ctx, platform=platform, message=message, url=text, req_id=req_id, user_id=user_id)
+                await submit_link(ctx, message=message, url=urls[0], user_id=user_id, platform=platform, req_id=uuid.uuid4().hex[:12], status=status)
             finally:
-                try:
-                    await processing_msg.delete()
-                except Exception:
-                    pass
+                await status.cleanup()
+            return
+
+        # Several links: one combined progress message, links run concurrently
+        status = StatusMessage(message, f"Sedang memproses {len(urls)} link...")
+
+        async def _progress(done: int, ok: int, total: int) -> None:
+            if done < total:
+                await status.edit(f"Sedang memproses {total} link... ({done}/{total} selesai)")
+
+        try:
+            await process_links(ctx, message=message, urls=urls, user_id=user_id, on_progress=_progress)
+        finally:
+            await status.cleanup()
 
+    # Runs under the chat-ordered update processor: other chats proceed
+    # concurrently; this chat's next message starts once these links are queued.
     return MessageHandler(filters.TEXT & ~filters.COMMAND, _handle)
@@ -1,65 +1,53 @@
 from __future__ import annotations
 
-import os
-from typing import Any
+import logging
+import random
 
-import aiohttp
-from tenacity import RetryError
+from telegram import ReactionTypeEmoji
+from telegram.constants import ChatType
 
 from bot.context import BotContext
-from bot.downloader_client import DownloaderClient, DownloaderError
+# Shared with processors/, which must not import the handlers package
+from bot.endpoints import build_api, get_base_url_for, get_param_names  # noqa: F401
+from bot.tasks import spawn_background  # noqa: F401
 
 
-def get_base_url_for(ctx: BotContext, platform_name: str) -> str:
-    # Prefer YAML-configured per-platform endpoint if present
-    plat = (platform_name or "").lower()
-    if ctx.settings.endpoints_per_platform.get(plat):
-        return ctx.settings.endpoints_per_platform[plat]
-    return ctx.settings.downloader_api_base_url
+# Conservative emoji set for the "seen it" reaction on user messages
+REACTION_EMOJIS = ("👍", "❤️", "🔥", "🎉", "👏", "😮", "😢")
 
 
-def get_param_names(platform_name: str) -> tuple[str, str]:
-    up = platform_name.upper()
-    url_param = os.getenv(f"DOWNLOADER_URL_PARAM_NAME_{up}") or os.getenv("DOWNLOADER_URL_PARAM_NAME") or "url"
-    key_param = os.getenv(f"DOWNLOADER_APIKEY_PARAM_NAME_{up}") or os.getenv("DOWNLOADER_APIKEY_PARAM_NAME") or "apikey"
-    return url_param, key_param
-
-
-def build_api(ctx: BotContext, platform_name: str) -> DownloaderClient:
-    url_param, key_param = get_param_names(platform_name)
-    return DownloaderClient(
-        base_url=get_base_url_for(ctx, platform_name),
-        api_key=ctx.settings.downloader_api_key,
-        connect_timeout=ctx.settings.http_connect_timeout,
-        read_timeout=ctx.settings.http_read_timeout,
-        total_timeout=ctx.settings.http_total_timeout,
-        url_param_name=url_param,
-        apikey_param_name=key_param,
-    )
-
-
-async def fetch_with_redirect(ctx: BotContext, api: DownloaderClient, session: aiohttp.ClientSession, *, req_id: str, user_id: int, url: str, platform: str) -> dict[str, Any]:
-    import logging
+async def add_reaction(ctx: BotContext, bot, message) -> None:
+    """Best-effort reaction on the user's message with a single Bot API call.
 
+    The chat's allowed reactions are looked up once and cached, instead of
+    trying emojis one after another until one sticks.
+    """
     logger = logging.getLogger("bot")
-    logger.info(
-        "request_start id=%s user=%s url=%s platform=%s endpoint=%s url_param=%s key_param=%s",
-        req_id,
-        user_id,
-        url,
-        platform,
-        api.base_url,
-        api.url_param_name,
-        api.apikey_param_name,
-    )
-    resolved = await api.resolve_redirects(session, url)
-    if resolved != url:
-        logger.info("url_resolved id=%s from=%s to=%s", req_id, url, resolved)
+    chat_id = message.chat_id
+    known, allowed = ctx.reactions.get(chat_id)
+    if not known:
+        if message.chat.type == ChatType.PRIVATE:
+            allowed = None
+        else:
+            try:
+                chat = await bot.get_chat(chat_id)
+            except Exception:
+                logger.warning("Failed to read available reactions chat=%s", chat_id, exc_info=True)
+                return
+            available = getattr(chat, "available_reactions", None)
+            allowed = None if available is None else tuple(r.emoji for r in available if getattr(r, "emoji", None))
+        ctx.reactions.put(chat_id, allowed)
+
+    pool = [e for e in REACTION_EMOJIS if allowed is None or e in allowed]
+    if not pool:
+        return
     try:
-        data = await api.fetch(session, resolved)
-        return data
-    except RetryError as e:
-        cause = e.last_attempt.exception() if e.last_attempt else None
-        if isinstance(cause, DownloaderError):
-            raise cause
-        raise DownloaderError("Downloader failed after retries") from e
+        await bot.set_message_reaction(
+            chat_id=chat_id,
+            message_id=message.message_id,
+            reaction=[ReactionTypeEmoji(emoji=random.choice(pool))],
+        )
+    except Exception:
+        # Reactions are unusable here after all; stop trying until the cache expires
+        ctx.reactions.put(chat_id, ())
+        logger.warning("Could not add reaction chat=%s msg=%s", chat_id, message.message_id, exc_info=True)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import aiohttp
+from tenacity import AsyncRetrying, retry_if_exception_type, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from bot.context import BotContext
+from bot.downloader_client import DownloaderClient, DownloaderError
+from bot.media_normalizer import normalize_result
+from bot.overload import NO_PROBE
+from bot.pipelines import PipelineSettings, pipeline_for
+from bot.platforms import SUPPORTED_PLATFORMS
+from bot.endpoints import get_base_url_for, get_param_names
+from bot.tasks import spawn_background
+
+Mapper = Callable[[Dict[str, Any], str], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class ProcessorSpec:
+    """A platform's processor, declared by name so its module loads lazily.
+
+    ``mapper`` maps a raw downloader response that lacks a usable ``result``
+    into the normalized schema. ``resolver`` replaces the shared pipeline
+    entirely and ``sender`` replaces the default delivery flow; all three
+    name attributes of ``module``.
+    """
+
+    name: str
+    module: Optional[str] = None
+    mapper: Optional[str] = None
+    resolver: Optional[str] = None
+    sender: Optional[str] = None
+
+    @property
+    def hosts(self) -> Tuple[str, ...]:
+        return tuple(SUPPORTED_PLATFORMS.get(self.name, ()))
+
+    def _attr(self, attr: Optional[str]) -> Any:
+        if not (self.module and attr):
+            return None
+        return getattr(importlib.import_module(self.module), attr)
+
+    @property
+    def mapper_fn(self) -> Optional[Mapper]:
+        return self._attr(self.mapper)
+
+    @property
+    def resolver_fn(self) -> Optional[Callable[..., Awaitable[Dict[str, Any]]]]:
+        return self._attr(self.resolver)
+
+    @property
+    def sender_fn(self) -> Optional[Callable[..., Awaitable[bool]]]:
+        return self._attr(self.sender)
+
+
+GENERIC = ProcessorSpec("generic")
+
+PROCESSORS: Dict[str, ProcessorSpec] = {
+    spec.name: spec
+    for spec in (
+        ProcessorSpec("tiktok", module="processors.tiktok", mapper="_build_tiktok_result"),
+        ProcessorSpec("instagram", module="processors.instagram", mapper="_build_instagram_result"),
+        ProcessorSpec("facebook", module="processors.facebook", mapper="_build_facebook_result"),
+        ProcessorSpec("douyin", module="processors.douyin", resolver="resolve_douyin"),
+        ProcessorSpec("youtube", module="processors.youtube", sender="send_youtube"),
+        ProcessorSpec("threads"),
+    )
+}
+
+
+def get_processor(platform: Optional[str]) -> ProcessorSpec:
+    return PROCESSORS.get(platform or "", GENERIC)
+
+
+class _ClientStatusError(DownloaderError):
+    """Non-5xx HTTP status: retrying the same endpoint will not help."""
+
+
+@dataclass
+class PipelineStats:
+    requests: int = 0
+    failures: int = 0
+    fallbacks: int = 0
+    total_latency: float = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+        }
+
+
+class _Limit:
+    """Concurrency cap for one platform that a reload resizes in place.
+
+    Calls already running keep counting against the new size, so a changed
+    ``concurrency`` never lets old and new callers exceed it together.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def resize(self, size: int) -> None:
+        self.size = size
+        self._wake()
+
+    def _wake(self) -> None:
+        free = self.size - self.active
+        while free > 0 and self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
+
+    async def acquire(self) -> None:
+        while self.active >= self.size:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # Woken but gone: hand the slot to the next waiter
+                    self._wake()
+                raise
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+
+STATS: Dict[str, PipelineStats] = {}
+_LIMITS: Dict[str, _Limit] = {}
+
+
+def _limit(platform: str, pipeline: PipelineSettings) -> Optional[_Limit]:
+    if pipeline.concurrency <= 0:
+        return None
+    limit = _LIMITS.get(platform)
+    if limit is None:
+        limit = _LIMITS[platform] = _Limit(pipeline.concurrency)
+    elif limit.size != pipeline.concurrency:
+        limit.resize(pipeline.concurrency)
+    return limit
+
+
+def _client(ctx: BotContext, platform: str, pipeline: PipelineSettings, base_url: str) -> DownloaderClient:
+    url_param, key_param = get_param_names(platform)
+    return DownloaderClient(
+        base_url=base_url,
+        api_key=ctx.settings.downloader_api_key,
+        connect_timeout=pipeline.connect_timeout,
+        read_timeout=pipeline.read_timeout,
+        total_timeout=pipeline.total_timeout,
+        url_param_name=url_param,
+        apikey_param_name=key_param,
+    )
+
+
+async def _get_json(session: aiohttp.ClientSession, api: DownloaderClient, url: str, pipeline: PipelineSettings) -> Dict[str, Any]:
+    params = {api.url_param_name: url}
+    if api.api_key:
+        params[api.apikey_param_name] = api.api_key
+    timeout = aiohttp.ClientTimeout(total=pipeline.total_timeout, connect=pipeline.connect_timeout, sock_read=pipeline.read_timeout)
+    try:
+        async with session.get(api.base_url, params=params, timeout=timeout) as resp:
+            if resp.status >= 500:
+                raise DownloaderError(f"Server error: {resp.status}")
+            if resp.status != 200:
+                text = await resp.text()
+                raise _ClientStatusError(f"Status {resp.status}: {text[:200]}")
+            data = await resp.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        raise DownloaderError(f"Request failed: {e.__class__.__name__}: {e}") from e
+    if not isinstance(data, dict) or not data:
+        raise DownloaderError("Empty response from downloader")
+    # Backends flag failure under either key
+    if data.get("success") is False or data.get("status") is False:
+        raise DownloaderError("Downloader returned unsuccess status")
+    return data
+
+
+async def fetch_json(
+    ctx: BotContext,
+    *,
+    platform: str,
+    url: str,
+    req_id: str,
+    user_id: int,
+    endpoint: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Call the downloader API for ``url`` through the platform's pipeline.
+
+    Applies the pipeline's redirect resolution, concurrency limit, timeouts
+    and retries, then moves on to the fallback endpoints. ``endpoint``
+    overrides the primary endpoint. Raises DownloaderError when every
+    endpoint failed.
+    """
+    logger = logging.getLogger("bot")
+    pipeline = pipeline_for(ctx.settings.pipelines, platform)
+    endpoints = [endpoint or get_base_url_for(ctx, platform), *pipeline.fallback_endpoints]
+    stats = STATS.setdefault(platform, PipelineStats())
+    sem = _limit(platform, pipeline)
+    started = time.monotonic()
+    last_error: Optional[DownloaderError] = None
+    if sem is not None:
+        await sem.acquire()
+    try:
+        async with ctx.http.client() as session:
+            resolved = url
+            probe = pipeline.resolve_redirects
+            if probe and ctx.overload.skip_probes:
+                # Under heavy overload the origin probe is skipped; the API follows short links itself
+                ctx.overload.count_shed(NO_PROBE)
+                probe = False
+            if probe:
+                resolved = await _client(ctx, platform, pipeline, endpoints[0]).resolve_redirects(session, url)
+                if resolved != url:
+                    logger.info("url_resolved id=%s from=%s to=%s", req_id, url, resolved)
+            for idx, base_url in enumerate(endpoints):
+                api = _client(ctx, platform, pipeline, base_url)
+                logger.info(
+                    "request_start id=%s user=%s url=%s platform=%s endpoint=%s url_param=%s key_param=%s",
+                    req_id,
+                    user_id,
+                    url,
+                    platform,
+                    api.base_url,
+                    api.url_param_name,
+                    api.apikey_param_name,
+                )
+                if idx:
+                    stats.fallbacks += 1
+                try:
+                    async for attempt in AsyncRetrying(
+                        stop=stop_after_attempt(pipeline.retries),
+                        wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
+                        retry=retry_if_exception_type(DownloaderError) & retry_if_not_exception_type(_ClientStatusError),
+                        reraise=True,
+                    ):
+                        with attempt:
+                            sent_at = time.monotonic()
+                            data = await _get_json(session, api, resolved, pipeline)
+                    if ctx.recorder is not None:
+                        spawn_background(
+                            ctx.recorder.record(
+                                platform=platform,
+                                url=url,
+                                resolved=resolved,
+                                endpoint=api.base_url,
+                                status=200,
+                                latency=time.monotonic() - sent_at,
+                                response=data,
+                            )
+                        )
+                    return data
+                except DownloaderError as e:
+                    last_error = e
+                    logger.warning("endpoint_failed id=%s platform=%s endpoint=%s error=%s", req_id, platform, api.base_url, str(e))
+        stats.failures += 1
+        raise last_error or DownloaderError("No downloader endpoint configured")
+    finally:
+        if sem is not None:
+            sem.release()
+        stats.requests += 1
+        stats.total_latency += time.monotonic() - started
+
+
+async def resolve_with_pipeline(ctx: BotContext, spec: ProcessorSpec, *, platform: str, url: str, req_id: str, user_id: int) -> Dict[str, Any]:
+    """Fetch through the pipeline and normalize."""
+    data = await fetch_json(ctx, platform=platform, url=url, req_id=req_id, user_id=user_id)
+    return normalize_response(spec, data, platform=platform, url=url)
+
+
+def normalize_response(spec: ProcessorSpec, data: Dict[str, Any], *, platform: str, url: str) -> Dict[str, Any]:
+    """Normalize a raw downloader response; the processor's mapper covers
+    responses without a usable ``result``."""
+    mapper = spec.mapper_fn
+    raw_result = data.get("result")
+    if isinstance(raw_result, dict):
+        result = normalize_result(raw_result, platform)
+        if result["medias"] or mapper is None:
+            return result
+    if mapper is None:
+        raise DownloaderError("Invalid response: missing result")
+    return normalize_result(mapper(data, url), platform)
+
+
+async def resolve(ctx: BotContext, *, platform: str, url: str, req_id: str, user_id: int) -> Dict[str, Any]:
+    spec = get_processor(platform)
+    resolver = spec.resolver_fn
+    if resolver is not None:
+        return await resolver(ctx, platform=platform, url=url, req_id=req_id, user_id=user_id)
+    return await resolve_with_pipeline(ctx, spec, platform=platform, url=url, req_id=req_id, user_id=user_id)
+
+
+def upstream_totals() -> Tuple[int, int]:
+    """(requests, failures) across every platform, for the overload monitor."""
+    return sum(st.requests for st in STATS.values()), sum(st.failures for st in STATS.values())
+
+
+def stats_snapshot() -> Dict[str, Dict[str, float]]:
+    return {name: st.snapshot() for name, st in sorted(STATS.items())}
@@ -1,79 +1,157 @@
 from __future__ import annotations
 
+import io
 import logging
-from typing import Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import aiohttp
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from bot.canonical import content_key
 from bot.context import BotContext
-from bot.media_normalizer import normalize_result
-from bot.media_utils import is_video, pick_caption
-from handlers.utils import build_api, fetch_with_redirect
+from bot.downloader_client import DownloaderClient, DownloaderError
+from bot.media_utils import MediaItem, MediaPartitions, partitions, pick_caption
+from bot.lanes import TRANSCODE, TRANSFER
+from bot.memory import BudgetExhausted, buffer_cost
+from bot.muxer import ffmpeg_available, mux_to_bytes
+from bot.overload import LINKS_ONLY
+from handlers.flow import StatusMessage, remember_sent, reply_text
+from bot.endpoints import build_api
 
 
-def _extract_resolution(m: Dict) -> int:
-    q = (m.get("quality") or "").lower()
-    # Common patterns like "mp4 (1080p)" or "webm (720p)"
-    import re
+def _is_mp4_family(m: MediaItem) -> bool:
+    mime = m.mime_type or ""
+    return mime.startswith(("video/mp4", "audio/mp4")) or "avc1" in mime or "mp4a" in mime or m.extension in {"mp4", "m4a"}
 
-    mobj = re.search(r"(\d{3,4})p", q)
-    if mobj:
-        try:
-            return int(mobj.group(1))
-        except Exception:
-            pass
-    # fallback from width/height if present
-    for key in ("height", "Height"):
-        try:
-            h = int(m.get(key))
-            if 100 <= h <= 5000:
-                return h
-        except Exception:
-            continue
-    return 0
 
+def _pick_mux_pair(parts: MediaPartitions, max_height: int, max_bytes: int) -> Optional[Tuple[int, MediaItem, MediaItem]]:
+    """Pick the best (video-only, audio-only) pair worth muxing.
 
-async def process_youtube(ctx: BotContext, *, platform: str, message, url: str, req_id: str, user_id: int) -> None:
+    Returns None when a muxed stream of the same or better resolution already
+    exists, or when no pair fits ``max_bytes`` (unknown sizes are allowed;
+    the muxer enforces the cap on the output).
     """
-    YouTube-specific processor.
-    - Do NOT upload video to Telegram.
+    audios = [m for m in parts.audios if m.is_http]
+    if not audios:
+        return None
+    # MP4/AAC first (clean -c copy into MP4), then the biggest stream as a bitrate proxy
+    audio = min(audios, key=lambda m: (0 if _is_mp4_family(m) else 1, -(m.data_size or 0)))
+
+    best_muxed = 0
+    video_only: List[Tuple[int, MediaItem]] = []
+    for m in parts.videos:
+        if not m.is_http:
+            continue
+        res = m.resolution
+        if res <= 0 or res > max_height:
+            continue
+        if m.has_audio:
+            best_muxed = max(best_muxed, res)
+        else:
+            video_only.append((res, m))
+
+    video_only.sort(key=lambda rm: (-rm[0], 0 if _is_mp4_family(rm[1]) else 1, rm[1].data_size or 0))
+    audio_size = audio.data_size or 0
+    for res, m in video_only:
+        if res <= best_muxed:
+            break
+        video_size = m.data_size
+        if video_size is not None and video_size + audio_size > max_bytes:
+            continue
+        return res, m, audio
+    return None
+
+
+async def _try_send_muxed(ctx: BotContext, api: DownloaderClient, *, message, parts: MediaPartitions, caption: str, reply_markup, req_id: str, original_url: str) -> bool:
+    s = ctx.settings
+    if not s.youtube_mux_enabled:
+        return False
+    if not ffmpeg_available(s.ffmpeg_path):
+        logging.getLogger("bot").warning("youtube_mux_skipped id=%s reason=ffmpeg_not_found path=%s", req_id, s.ffmpeg_path)
+        return False
+    pair = _pick_mux_pair(parts, s.youtube_mux_max_height, s.max_upload_bytes)
+    if not pair:
+        return False
+    if ctx.overload.links_only:
+        # Overloaded: the quality buttons are sent instead of a muxed upload
+        ctx.overload.count_shed(LINKS_ONLY)
+        return False
+
+    logger = logging.getLogger("bot")
+    res, video, audio = pair
+    logger.info("youtube_mux_start id=%s res=%sp", req_id, res)
+    started = time.monotonic()
+    expected = video.data_size + audio.data_size if video.data_size and audio.data_size else None
+    try:
+        # Held until the upload finishes: the muxed bytes stay in memory until then
+        async with ctx.memory.reserve(buffer_cost(expected, s.max_upload_bytes)):
+            try:
+                async with ctx.lanes.run(TRANSCODE), ctx.http.client() as session:
+                    data = await mux_to_bytes(
+                        api,
+                        session,
+                        video_url=video.url,
+                        audio_url=audio.url,
+                        max_bytes=s.max_upload_bytes,
+                        ffmpeg_path=s.ffmpeg_path,
+                        memory_limit_bytes=s.mux_memory_limit_bytes,
+                        cpu_seconds=s.mux_cpu_seconds,
+                        timeout=s.http_total_timeout,
+                    )
+            except DownloaderError as e:
+                logger.warning("youtube_mux_failed id=%s res=%sp error=%s", req_id, res, str(e))
+                return False
+            except Exception:
+                logger.exception("youtube_mux_failed id=%s res=%sp", req_id, res)
+                return False
+            logger.info("youtube_mux_done id=%s res=%sp bytes=%s elapsed=%.2fs", req_id, res, len(data), time.monotonic() - started)
+
+            bio = io.BytesIO(data)
+            bio.name = f"youtube_{res}p_{req_id}.mp4"
+            try:
+                async with ctx.lanes.run(TRANSFER):
+                    sent = await message.reply_video(video=bio, caption=caption, supports_streaming=True, reply_markup=reply_markup)
+            except Exception:
+                logger.exception("youtube_mux_upload_failed id=%s", req_id)
+                return False
+    except BudgetExhausted:
+        # Fall back to the quality buttons rather than queueing behind other uploads
+        logger.warning("youtube_mux_skipped id=%s reason=memory_budget", req_id)
+        return False
+    remember_sent(ctx, content_key(original_url), sent)
+    return True
+
+
+async def send_youtube(ctx: BotContext, *, platform: str, message, result: Dict[str, Any], req_id: str, user_id: int, original_url: str, status: StatusMessage | None = None) -> bool:
+    """
+    YouTube-specific delivery.
     - Send a compact inline keyboard with direct links per quality (limited set).
+    - With YOUTUBE_MUX_ENABLED, mux the best video-only + audio streams and
+      upload the result when it fits; the keyboard is attached to the video.
     """
     logger = logging.getLogger("bot")
     api = build_api(ctx, platform)
-    try:
-        async with aiohttp.ClientSession() as session:
-            data = await fetch_with_redirect(ctx, api, session, req_id=req_id, user_id=user_id, url=url, platform=platform)
-    except Exception:
-        logger.exception("youtube_unexpected id=%s user=%s url=%s", req_id, user_id, url)
-        await message.reply_text("Terjadi kesalahan saat memproses tautan.")
-        return
-
-    raw_result = data.get("result") or {}
-    result = normalize_result(raw_result, platform)
 
     # Build a small set of quality buttons
-    medias = result.get("medias") or []
-    videos = [m for m in medias if is_video(m) and isinstance(m.get("url"), str) and m.get("url").startswith("http")]
+    parts = partitions(result)
 
     # Group by resolution with preference for muxed (has_audio True)
-    by_res: Dict[int, Dict] = {}
-    for m in videos:
-        res = _extract_resolution(m)
-        if res <= 0:
+    by_res: Dict[int, MediaItem] = {}
+    for m in parts.videos:
+        res = m.resolution
+        if res <= 0 or not m.is_http:
             continue
         existing = by_res.get(res)
         if not existing:
             by_res[res] = m
         else:
             # Prefer muxed over video-only
-            if (m.get("has_audio") and not existing.get("has_audio")):
+            if m.has_audio and not existing.has_audio:
                 by_res[res] = m
 
     # Desired order of resolutions
     prefer = [2160, 1440, 1080, 720, 480, 360]
-    ordered: List[Tuple[int, Dict]] = []
+    ordered: List[Tuple[int, MediaItem]] = []
     for r in prefer:
         if r in by_res:
             ordered.append((r, by_res[r]))
@@ -86,7 +164,7 @@ async def process_youtube(ctx: BotContext, *, platform: str, message, url: str,
     current: List[InlineKeyboardButton] = []
     for res, m in ordered:
         label = f"{res}p"
-        btn = InlineKeyboardButton(text=label, url=m.get("url"))
+        btn = InlineKeyboardButton(text=label, url=m.url)
         current.append(btn)
         if len(current) == 3:
             rows.append(current)
@@ -99,11 +177,14 @@ async def process_youtube(ctx: BotContext, *, platform: str, message, url: str,
         rows.append([InlineKeyboardButton(text="Buka Konten Asli", url=result["url"])])
 
     if not rows:
-        await message.reply_text("Tidak ditemukan varian kualitas video.")
-        return
+        await reply_text(message, status, "Tidak ditemukan varian kualitas video.")
+        return False
 
     title = result.get("title")
     author = result.get("author")
+    if await _try_send_muxed(ctx, api, message=message, parts=parts, caption=pick_caption(author, title), reply_markup=InlineKeyboardMarkup(rows), req_id=req_id, original_url=original_url):
+        return True
+
     caption = f"Pilih kualitas untuk diunduh (YouTube):\n{pick_caption(author, title)}"
 
     # Send thumbnail image if available, otherwise text
@@ -112,10 +193,11 @@ async def process_youtube(ctx: BotContext, *, platform: str, message, url: str,
         if isinstance(thumb, str) and thumb.startswith("http"):
             await message.reply_photo(photo=thumb, caption=caption, reply_markup=InlineKeyboardMarkup(rows))
         else:
-            await message.reply_text(caption, reply_markup=InlineKeyboardMarkup(rows))
+            await reply_text(message, status, caption, reply_markup=InlineKeyboardMarkup(rows))
     except Exception:
         logger.exception("youtube_send_result_failed id=%s", req_id)
         try:
             await message.reply_text(caption)
         except Exception:
-            pass
+            return False
+    return True